@@ -3,6 +3,7 @@ from typing import Optional
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 import os
+import uuid
 
 load_dotenv()
 
@@ -24,6 +25,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 10080)))
     
     to_encode.update({"exp": expire})
+    # Identificador único para poder revocar el token individualmente
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     return jwt.encode(
         to_encode, 
         os.getenv("SECRET_KEY"), 
@@ -54,4 +57,52 @@ def verify_token(token: str, raise_exception: bool = False) -> Optional[dict]:
     except JWTError as e:
         if raise_exception:
             raise e
-        return None 
\ No newline at end of file
+        return None 
+
+def refresh_tokens_enabled() -> bool:
+    """Indica si se emiten tokens de refresco junto a accesos de vida corta (REFRESH_TOKENS_ENABLED)"""
+    return os.getenv("REFRESH_TOKENS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+def short_access_token_lifetime() -> timedelta:
+    """Duración de los tokens de acceso cuando hay tokens de refresco"""
+    return timedelta(minutes=int(os.getenv("SHORT_ACCESS_TOKEN_EXPIRE_MINUTES", 15)))
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Crea un token de refresco (typ=refresh) con los datos proporcionados
+    
+    Args:
+        data (dict): Datos a codificar en el token (al menos 'sub')
+        expires_delta (Optional[timedelta]): Tiempo de expiración opcional
+        
+    Returns:
+        str: Token JWT de refresco
+    """
+    if expires_delta is None:
+        expires_delta = timedelta(days=int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30)))
+    return create_access_token({**data, "typ": "refresh"}, expires_delta)
+
+def identity_claims_enabled() -> bool:
+    """Indica si los tokens se emiten con claims de identidad (JWT_IDENTITY_CLAIMS)"""
+    return os.getenv("JWT_IDENTITY_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+def create_identity_token(user: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Crea un token JWT que incluye la identidad del usuario además del email
+    
+    Args:
+        user (dict): Documento del usuario (necesita _id y email)
+        expires_delta (Optional[timedelta]): Tiempo de expiración opcional
+        
+    Returns:
+        str: Token JWT con los claims sub, uid, username y epoch
+    """
+    return create_access_token(
+        data={
+            "sub": user["email"],
+            "uid": str(user["_id"]),
+            "username": user.get("username"),
+            "epoch": user.get("token_epoch", 0),
+        },
+        expires_delta=expires_delta
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+
+class PasswordWorkerPool:
+    """
+    Ejecuta el hash y la verificación bcrypt en un pool de hilos acotado para no
+    bloquear el event loop.
+
+    bcrypt libera el GIL, así que los hilos trabajan en paralelo de verdad. Si el
+    número de operaciones en curso más las encoladas supera max_workers + max_queue,
+    la petición se rechaza con 503 en lugar de acumular latencia.
+    """
+
+    def __init__(self, crypt_context: CryptContext, max_workers: int = 4, max_queue: int = 32):
+        self.crypt_context = crypt_context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._metrics_lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    async def hash(self, password: str) -> str:
+        """Genera el hash bcrypt de una contraseña"""
+        return await self._submit(self.crypt_context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """Verifica una contraseña contra su hash bcrypt"""
+        return await self._submit(self.crypt_context.verify, password, password_hash)
+
+    async def _submit(self, func, *args):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            with self._metrics_lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+
+        self._in_flight += 1
+        enqueued_at = time.perf_counter()
+
+        def run():
+            self._record_queue_wait(time.perf_counter() - enqueued_at)
+            return func(*args)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, run)
+        finally:
+            self._in_flight -= 1
+
+    def _record_queue_wait(self, wait: float) -> None:
+        with self._metrics_lock:
+            self.completed += 1
+            self.total_queue_wait += wait
+            if wait > self.max_queue_wait:
+                self.max_queue_wait = wait
+
+    def stats(self) -> dict:
+        """Métricas del pool: ocupación, rechazos y tiempo de espera en cola"""
+        with self._metrics_lock:
+            avg_wait = self.total_queue_wait / self.completed if self.completed else 0.0
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_queue_wait_ms": round(avg_wait * 1000, 3),
+                "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+            }
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+password_pool = PasswordWorkerPool(
+    pwd_context,
+    max_workers=int(os.getenv("PASSWORD_POOL_WORKERS", 4)),
+    max_queue=int(os.getenv("PASSWORD_POOL_MAX_QUEUE", 32)),
+)
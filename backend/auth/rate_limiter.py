@@ -0,0 +1,189 @@
+import logging
+import math
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryBucketBackend:
+    """Backend de cubetas en memoria del proceso (un worker)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: dict = {}
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> tuple[bool, float]:
+        """Consume un token de la cubeta. Devuelve (permitido, segundos hasta el siguiente token)"""
+        now = time.monotonic()
+        tokens, updated_at, _ = self._buckets.get(key, (capacity, now, 0.0))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        # Se guarda cuándo estará llena cada cubeta: las hay de distinta configuración
+        self._buckets[key] = (tokens, now, capacity / refill_per_second)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+
+        retry_after = 0.0 if allowed else (1 - tokens) / refill_per_second
+        return allowed, retry_after
+
+    def _prune(self, now: float) -> None:
+        # Una cubeta que ya se habría rellenado por completo equivale a no tenerla
+        self._buckets = {
+            key: value for key, value in self._buckets.items()
+            if now - value[1] < value[2]
+        }
+        # Si todas siguen en uso (p. ej. una ráfaga desde muchas IPs o emails) se
+        # descartan las usadas hace más tiempo hasta quedar en el 90% del tope, para
+        # no repetir la limpieza con cada clave nueva
+        excess = len(self._buckets) - self.max_keys
+        if excess > 0:
+            excess += self.max_keys // 10
+            oldest = sorted(self._buckets, key=lambda key: self._buckets[key][1])[:excess]
+            for key in oldest:
+                del self._buckets[key]
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class RedisBucketBackend:
+    """
+    Backend compartido entre workers sobre cualquier servidor compatible con Redis
+    (Redis, Valkey, KeyDB...). La recarga y el consumo se hacen de forma atómica
+    con un script Lua.
+    """
+
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, client, prefix: str = "obdy:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> tuple[bool, float]:
+        allowed, tokens = await self.client.eval(
+            self.SCRIPT, 1, self.prefix + key, capacity, refill_per_second, time.time()
+        )
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (1 - tokens) / refill_per_second
+        return bool(allowed), retry_after
+
+    def clear(self) -> None:
+        # El estado compartido caduca solo en el servidor
+        pass
+
+
+class TokenBucket:
+    """Límite de tipo token bucket: 'capacity' peticiones de ráfaga y 'per_minute' sostenidas"""
+
+    def __init__(self, backend, scope: str, capacity: float, per_minute: float):
+        self.backend = backend
+        self.scope = scope
+        self.capacity = capacity
+        self.refill_per_second = per_minute / 60.0
+        self.rejected = 0
+
+    async def take(self, identifier: str) -> tuple[bool, float]:
+        allowed, retry_after = await self.backend.take(
+            f"{self.scope}:{identifier}", self.capacity, self.refill_per_second
+        )
+        if not allowed:
+            self.rejected += 1
+        return allowed, retry_after
+
+
+class AuthRateLimiter:
+    """
+    Control de admisión para /auth/login y /auth/register.
+
+    Se aplica antes de cualquier consulta a Mongo o trabajo bcrypt, con una cubeta
+    por IP y otra por email, de forma que una ráfaga de credential stuffing no
+    consume CPU del resto de la API.
+    """
+
+    def __init__(self, backend, ip_capacity: float, ip_per_minute: float,
+                 email_capacity: float, email_per_minute: float,
+                 trust_proxy_headers: bool = False):
+        self.backend = backend
+        self.trust_proxy_headers = trust_proxy_headers
+        self.ip_bucket = TokenBucket(backend, "ip", ip_capacity, ip_per_minute)
+        self.email_bucket = TokenBucket(backend, "email", email_capacity, email_per_minute)
+
+    def client_ip(self, request: Request) -> str:
+        if self.trust_proxy_headers:
+            forwarded_for = request.headers.get("x-forwarded-for")
+            if forwarded_for:
+                return forwarded_for.split(",")[0].strip()
+        return request.client.host if request.client else "desconocida"
+
+    async def check(self, request: Request, email: Optional[str] = None) -> None:
+        """Lanza 429 si la IP o el email han agotado su cubeta"""
+        checks = [(self.ip_bucket, self.client_ip(request))]
+        if email:
+            checks.append((self.email_bucket, email.strip().lower()))
+
+        for bucket, identifier in checks:
+            allowed, retry_after = await bucket.take(identifier)
+            if not allowed:
+                logger.warning(f"Petición de autenticación rechazada por límite de {bucket.scope}: {identifier}")
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados intentos, inténtalo de nuevo más tarde",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+    def reset(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Peticiones rechazadas por ámbito"""
+        return {
+            "backend": type(self.backend).__name__,
+            "rejected_ip": self.ip_bucket.rejected,
+            "rejected_email": self.email_bucket.rejected,
+        }
+
+
+def _build_backend():
+    """Usa un servidor compatible con Redis si RATE_LIMIT_REDIS_URL está definida"""
+    redis_url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if redis_url:
+        try:
+            import redis.asyncio as redis_asyncio
+            return RedisBucketBackend(redis_asyncio.from_url(redis_url))
+        except ImportError:
+            logger.warning("RATE_LIMIT_REDIS_URL definida pero el paquete 'redis' no está instalado; usando memoria local")
+    return InMemoryBucketBackend()
+
+
+auth_rate_limiter = AuthRateLimiter(
+    _build_backend(),
+    ip_capacity=float(os.getenv("AUTH_RATE_LIMIT_IP_BURST", 20)),
+    ip_per_minute=float(os.getenv("AUTH_RATE_LIMIT_IP_PER_MINUTE", 20)),
+    email_capacity=float(os.getenv("AUTH_RATE_LIMIT_EMAIL_BURST", 5)),
+    email_per_minute=float(os.getenv("AUTH_RATE_LIMIT_EMAIL_PER_MINUTE", 5)),
+    trust_proxy_headers=os.getenv("TRUST_PROXY_HEADERS", "false").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Solape al leer las revocaciones nuevas: cubre la diferencia de reloj entre procesos
+# y las escrituras que se confirman después de haber tomado su revoked_at
+REFRESH_OVERLAP = timedelta(seconds=30)
+
+
+class BloomFilter:
+    """Filtro de Bloom compacto sobre un bytearray con doble hashing (blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.size_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationFilter:
+    """
+    Registro de JTIs revocados (tokens de refresco y de acceso).
+
+    La fuente de verdad es la colección 'revoked_tokens'; en memoria se mantiene un
+    filtro de Bloom. Un token cuyo JTI no está en el filtro seguro que no está
+    revocado, así que la validación normal nunca consulta Mongo; solo los positivos
+    (revocados o falsos positivos) se confirman contra la colección.
+
+    El filtro se construye entero al arrancar y cada rebuild_seconds (para olvidar
+    los tokens caducados). Entre medias, cada refresh_seconds se le añaden en una
+    tarea en segundo plano, sin hacer esperar a la petición, solo las revocaciones
+    con revoked_at posterior a la última lectura. Como mucho hay una lectura en
+    curso a la vez.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001, refresh_seconds: float = 60.0,
+                 rebuild_seconds: float = 3600.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._filter = BloomFilter(capacity, error_rate)
+        self._filter_capacity = capacity
+        self._built_at: Optional[float] = None
+        self._rebuilt_at: Optional[float] = None
+        self._since: Optional[datetime] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.filter_positives = 0
+        self.false_positives = 0
+
+    async def rebuild(self, database) -> None:
+        """Reconstruye el filtro con los JTIs revocados que aún no han caducado"""
+        started = datetime.utcnow()
+        jtis = []
+        cursor = database.revoked_tokens.find({"expires_at": {"$gt": started}}, {"jti": 1})
+        async for document in cursor:
+            jtis.append(document["jti"])
+
+        capacity = max(self.capacity, len(jtis) * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+
+        self._filter = bloom
+        self._filter_capacity = capacity
+        self._since = started
+        self._built_at = self._rebuilt_at = time.monotonic()
+        self.rebuilds += 1
+        logger.info(f"Filtro de revocación reconstruido con {len(jtis)} tokens")
+
+    async def refresh(self, database) -> None:
+        """Añade al filtro las revocaciones desde la última lectura, o lo reconstruye si toca"""
+        if (
+            self._since is None
+            or time.monotonic() - self._rebuilt_at > self.rebuild_seconds
+            or self._filter.count >= self._filter_capacity
+        ):
+            await self.rebuild(database)
+            return
+
+        started = datetime.utcnow()
+        cursor = database.revoked_tokens.find({"revoked_at": {"$gt": self._since - REFRESH_OVERLAP}}, {"jti": 1})
+        async for document in cursor:
+            if document["jti"] not in self._filter:
+                self._filter.add(document["jti"])
+        self._since = started
+        self._built_at = time.monotonic()
+        self.refreshes += 1
+
+    async def _refresh_in_background(self, database) -> None:
+        try:
+            await self.refresh(database)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.error(f"No se pudo actualizar el filtro de revocación: {e}")
+
+    def _start_refresh(self, database) -> asyncio.Task:
+        """Lanza la actualización del filtro si no hay ya una en curso en este event loop"""
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.ensure_future(self._refresh_in_background(database))
+        return task
+
+    async def revoke(self, database, jti: str, expires_at: datetime) -> bool:
+        """
+        Revoca un JTI hasta su fecha de expiración.
+
+        Returns:
+            bool: True si lo ha revocado esta llamada, False si ya estaba revocado. Es
+            la comprobación atómica para consumir un token de un solo uso
+        """
+        try:
+            result = await database.revoked_tokens.update_one(
+                {"jti": jti},
+                {"$setOnInsert": {"jti": jti, "expires_at": expires_at, "revoked_at": datetime.utcnow()}},
+                upsert=True
+            )
+            inserted = result.upserted_id is not None
+        except DuplicateKeyError:
+            # Dos upserts simultáneos: el índice único deja pasar solo uno
+            inserted = False
+        self._filter.add(jti)
+        return inserted
+
+    async def is_revoked(self, database, jti: str) -> bool:
+        """Comprueba si un JTI está revocado consultando Mongo solo ante un positivo del filtro"""
+        if self._built_at is None:
+            # Todavía no hay filtro: todas las peticiones esperan a la misma construcción
+            await self._start_refresh(database)
+        elif time.monotonic() - self._built_at > self.refresh_seconds:
+            self._start_refresh(database)
+
+        # Sin filtro (la construcción falló) se consulta directamente la colección
+        if self._built_at is not None and jti not in self._filter:
+            return False
+
+        self.filter_positives += 1
+        revoked = await database.revoked_tokens.find_one({"jti": jti}, {"_id": 1}) is not None
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    def reset(self) -> None:
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._filter_capacity = self.capacity
+        self._built_at = self._rebuilt_at = None
+        self._since = None
+        self._refresh_task = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._filter.count,
+            "size_bytes": len(self._filter.bits),
+            "hash_count": self._filter.hash_count,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "filter_positives": self.filter_positives,
+            "false_positives": self.false_positives,
+        }
+
+
+revocation_filter = RevocationFilter(
+    capacity=int(os.getenv("REVOCATION_FILTER_CAPACITY", 100_000)),
+    error_rate=float(os.getenv("REVOCATION_FILTER_ERROR_RATE", 0.001)),
+    refresh_seconds=float(os.getenv("REVOCATION_FILTER_REFRESH_SECONDS", 60)),
+    rebuild_seconds=float(os.getenv("REVOCATION_FILTER_REBUILD_SECONDS", 3600)),
+)
@@ -0,0 +1,59 @@
+import os
+import time
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+
+class TokenEpochTable:
+    """
+    Tabla en memoria con la época de tokens de cada usuario.
+
+    Los tokens con claims de identidad llevan la época vigente al emitirse; para
+    revocarlos basta con incrementar 'token_epoch' en el documento del usuario.
+    Solo se guardan los usuarios con época > 0 (los que alguna vez revocaron), de
+    modo que la tabla es pequeña y se recarga periódicamente desde Mongo para ver
+    los cambios hechos por otros workers.
+    """
+
+    def __init__(self, refresh_seconds: float = 30.0):
+        self.refresh_seconds = refresh_seconds
+        self._epochs: dict = {}
+        self._loaded_at: Optional[float] = None
+
+    async def load(self, database) -> None:
+        """Carga (o recarga) las épocas no nulas desde la colección de usuarios"""
+        epochs = {}
+        cursor = database.users.find({"token_epoch": {"$gt": 0}}, {"token_epoch": 1})
+        async for user in cursor:
+            epochs[str(user["_id"])] = user["token_epoch"]
+        self._epochs = epochs
+        self._loaded_at = time.monotonic()
+
+    async def current(self, database, user_id: str) -> int:
+        """Devuelve la época vigente de un usuario (0 si nunca se ha revocado)"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            await self.load(database)
+        return self._epochs.get(str(user_id), 0)
+
+    async def bump(self, database, user_id: str) -> int:
+        """Incrementa la época de un usuario, invalidando sus tokens anteriores"""
+        user = await database.users.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"token_epoch": 1}},
+            projection={"token_epoch": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        epoch = user.get("token_epoch", 0) if user else 0
+        self._epochs[str(user_id)] = epoch
+        return epoch
+
+    def clear(self) -> None:
+        self._epochs.clear()
+        self._loaded_at = None
+
+
+token_epochs = TokenEpochTable(
+    refresh_seconds=float(os.getenv("TOKEN_EPOCH_REFRESH_SECONDS", 30)),
+)
@@ -0,0 +1,101 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class UserContextCache:
+    """
+    Caché LRU acotada con TTL de los contextos de usuario resueltos por
+    get_current_user_data, indexada por el 'sub' del token.
+
+    Evita un find_one sobre 'users' en cada petición autenticada. Las entradas
+    caducan tras ttl_seconds y, cuando se supera max_size, se descarta la menos
+    usada recientemente.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._subjects_by_user_id: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, subject: str) -> Optional[dict]:
+        """Devuelve una copia del contexto cacheado o None si no existe o ha caducado"""
+        entry = self._entries.get(subject)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            self._remove(subject)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        # Copia superficial para que los handlers no modifiquen la entrada cacheada
+        return dict(user)
+
+    def set(self, subject: str, user: dict) -> None:
+        """Guarda el contexto resuelto de un usuario"""
+        if self.max_size <= 0:
+            return
+
+        if subject in self._entries:
+            self._remove(subject)
+
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, dict(user))
+        if user.get("id"):
+            self._subjects_by_user_id[str(user["id"])] = subject
+
+        while len(self._entries) > self.max_size:
+            oldest_subject = next(iter(self._entries))
+            self._remove(oldest_subject)
+            self.evictions += 1
+
+    def invalidate(self, subject: str) -> None:
+        """Elimina la entrada asociada a un 'sub' de token"""
+        self._remove(subject)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Elimina la entrada de un usuario por su ID (útil si ha cambiado el email)"""
+        subject = self._subjects_by_user_id.get(str(user_id))
+        if subject is not None:
+            self._remove(subject)
+
+    def clear(self) -> None:
+        """Vacía la caché sin reiniciar los contadores"""
+        self._entries.clear()
+        self._subjects_by_user_id.clear()
+
+    def stats(self) -> dict:
+        """Contadores para dimensionar la caché"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _remove(self, subject: str) -> None:
+        entry = self._entries.pop(subject, None)
+        if entry is None:
+            return
+        user_id = entry[1].get("id")
+        if user_id is not None and self._subjects_by_user_id.get(str(user_id)) == subject:
+            del self._subjects_by_user_id[str(user_id)]
+
+
+user_cache = UserContextCache(
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", 1024)),
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", 60)),
+)
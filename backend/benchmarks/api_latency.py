@@ -0,0 +1,41 @@
+"""
+Latencia de los endpoints de lectura más usados sobre el backend en memoria.
+
+Uso (desde backend/):
+    python -m benchmarks.api_latency [--repeat 50] [--trips 50] [--gps-points 100]
+"""
+import argparse
+
+from benchmarks.common import offline_client, print_table, register_user, seed_dataset, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latencia de endpoints con datos sintéticos")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--vehicles", type=int, default=3)
+    parser.add_argument("--trips", type=int, default=50, help="Viajes por vehículo")
+    parser.add_argument("--gps-points", type=int, default=100, help="Puntos GPS por viaje")
+    args = parser.parse_args()
+
+    with offline_client() as client:
+        headers, user_id = register_user(client)
+        vehicle_ids = seed_dataset(user_id, args.vehicles, args.trips, args.gps_points)
+
+        cases = {
+            "GET /vehicles": lambda: client.get("/vehicles", headers=headers),
+            "GET /vehicles/{id}": lambda: client.get(f"/vehicles/{vehicle_ids[0]}", headers=headers),
+            "GET /trips?limit=50": lambda: client.get("/trips", params={"limit": 50}, headers=headers),
+            "GET /trips/vehicle/{id}/stats": lambda: client.get(f"/trips/vehicle/{vehicle_ids[0]}/stats", headers=headers),
+            "GET /users/me": lambda: client.get("/users/me", headers=headers),
+        }
+        rows = []
+        for name, call in cases.items():
+            response = call()
+            response.raise_for_status()
+            rows.append((name, time_calls(call, repeat=args.repeat)))
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
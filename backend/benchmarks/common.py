@@ -0,0 +1,133 @@
+"""
+Utilidades compartidas por los benchmarks: cliente de la API sobre el backend en
+memoria (sin MongoDB ni red), datos sintéticos y medición de latencias.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+BENCHMARK_DATABASE_URL = "memory://benchmarks/obdy"
+
+
+def offline_client(database_url: str = BENCHMARK_DATABASE_URL):
+    """TestClient de la app apuntando al backend en memoria"""
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    from fastapi.testclient import TestClient
+    from database import db
+    from main import app
+
+    # Cada petición del TestClient se registraría con nivel INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    db.database_url = database_url
+    db.client = None
+    return TestClient(app)
+
+
+def register_user(client, suffix: str = "bench") -> tuple[dict, str]:
+    """Registra un usuario y devuelve (cabeceras de autorización, user_id)"""
+    response = client.post(
+        "/auth/register",
+        json={"username": f"bench_{suffix}", "email": f"bench_{suffix}@example.com", "password": "password123"},
+    )
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user_id = client.get("/users/me", headers=headers).json()["id"]
+    return headers, user_id
+
+
+def seed_dataset(user_id: str, vehicles: int = 3, trips_per_vehicle: int = 50,
+                 gps_points_per_trip: int = 100, maintenance_records: int = 5) -> list:
+    """
+    Inserta directamente en la base de datos vehículos con mantenimientos y viajes
+    con puntos GPS. Devuelve los IDs de los vehículos creados.
+    """
+    from database import db
+
+    async def insert():
+        owner = ObjectId(user_id)
+        now = datetime.utcnow()
+        vehicle_ids = []
+        for v in range(vehicles):
+            vehicle_id = ObjectId()
+            vehicle_ids.append(str(vehicle_id))
+            await db.db.vehicles.insert_one({
+                "_id": vehicle_id,
+                "user_id": owner,
+                "brand": "Toyota",
+                "model": f"Modelo {v}",
+                "year": 2020,
+                "licensePlate": f"{1000 + v}BCD",
+                "current_kilometers": 50000.0,
+                "maintenance_records": [
+                    {
+                        "_id": ObjectId(),
+                        "type": f"Mantenimiento {m}",
+                        "last_change_km": 40000,
+                        "recommended_interval_km": 15000,
+                        "next_change_km": 55000,
+                        "last_change_date": now,
+                        "notes": None,
+                        "km_since_last_change": 10000.0,
+                    }
+                    for m in range(maintenance_records)
+                ],
+                "pdf_manual_grid_fs_id": None,
+                "logo": None,
+                "last_itv_date": None,
+                "next_itv_date": None,
+                "created_at": now,
+                "updated_at": now,
+            })
+            for t in range(trips_per_vehicle):
+                start = now - timedelta(hours=t + 1)
+                await db.db.trips.insert_one({
+                    "_id": ObjectId(),
+                    "user_id": owner,
+                    "vehicle_id": vehicle_id,
+                    "start_time": start,
+                    "end_time": start + timedelta(minutes=30),
+                    "distance_in_km": 12.5,
+                    "fuel_consumption_liters": 0.9,
+                    "average_speed_kmh": 45.0,
+                    "duration_seconds": 1800,
+                    "is_active": False,
+                    "gps_points": [
+                        {"latitude": 40.0 + p / 1000, "longitude": -3.7, "timestamp": start + timedelta(seconds=p)}
+                        for p in range(gps_points_per_trip)
+                    ],
+                    "created_at": start,
+                    "updated_at": start,
+                })
+        return vehicle_ids
+
+    return asyncio.run(insert())
+
+
+def time_calls(func, repeat: int = 50, warmup: int = 5) -> dict:
+    """Ejecuta func repetidamente y devuelve la latencia en ms (media, p50, p95)"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def print_table(rows: list) -> None:
+    """Imprime filas (nombre, {'mean', 'p50', 'p95'}) alineadas"""
+    print(f"{'caso':<40} {'media ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, stats in rows:
+        print(f"{name:<40} {stats['mean']:>9.2f} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
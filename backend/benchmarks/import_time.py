@@ -0,0 +1,68 @@
+"""
+Mide el tiempo de importación de main y de cada router en un intérprete nuevo,
+que es lo que paga un arranque en frío en Vercel.
+
+Uso (desde backend/):
+    python -m benchmarks.import_time [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "main",
+    "routers.auth",
+    "routers.users",
+    "routers.vehicles",
+    "routers.chats",
+    "routers.trips",
+    "routers.fuel",
+    "routers.health",
+    "routers.logos",
+]
+
+# Dependencias que no deben cargarse hasta que un endpoint las necesite
+HEAVY_MODULES = ["pymupdf", "fitz", "deep_translator", "bs4", "requests", "httpx", "PIL"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"ms": elapsed * 1000, "heavy": heavy}}))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> dict:
+    """Importa un módulo en un subproceso y devuelve el tiempo y las dependencias pesadas cargadas"""
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("ALGORITHM", "HS256")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tiempo de importación por router")
+    parser.add_argument("--repeat", type=int, default=5, help="Ejecuciones por módulo")
+    args = parser.parse_args()
+
+    print(f"{'módulo':<20} {'mediana ms':>10} {'mín ms':>8}  dependencias pesadas")
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        times = [run["ms"] for run in runs]
+        heavy = ", ".join(runs[-1]["heavy"]) or "-"
+        print(f"{module:<20} {statistics.median(times):>10.1f} {min(times):>8.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Coste de serializar a JSON las respuestas más grandes de la API: un listado de
+5.000 gasolineras y 20 viajes con sus puntos GPS.
+
+Compara el camino clásico de FastAPI (jsonable_encoder + json estándar), el de las
+rutas con response_model (validación + dump_json de pydantic) y FastJSONResponse
+sobre los documentos tal cual salen de MongoDB (ObjectId y datetime sin convertir).
+
+Uso (desde backend/):
+    python -m benchmarks.json_encoding [--repeat 20] [--stations 5000] [--trips 20] [--gps-points 500]
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.common import print_table, time_calls
+from schemas.fuel import FuelStationList
+from schemas.trip import TripResponse
+from utils.json_response import FastJSONResponse
+
+
+def station_payload(count: int) -> dict:
+    """Listado de gasolineras con la forma que devuelve /fuel/stations/nearby"""
+    now = datetime.utcnow()
+    return {
+        "stations": [
+            {
+                "id": str(10000 + i),
+                "name": f"Estación {i}",
+                "brand": "REPSOL",
+                "latitude": 40.0 + i / 10000,
+                "longitude": -3.7 - i / 10000,
+                "address": f"Calle Mayor {i}",
+                "city": "Madrid",
+                "province": "Madrid",
+                "postal_code": "28001",
+                "prices": {"gasolina95": 1.659, "gasolina98": 1.799, "diesel": 1.559, "glp": 0.999},
+                "schedule": "L-D: 24H",
+                "is_favorite": i % 50 == 0,
+                "last_updated": now,
+                "distance": i / 100,
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def trip_documents(count: int, gps_points: int) -> list:
+    """Viajes tal y como están guardados en MongoDB"""
+    now = datetime.utcnow()
+    user_id, vehicle_id = ObjectId(), ObjectId()
+    trips = []
+    for t in range(count):
+        start = now - timedelta(hours=t + 1)
+        trips.append({
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "vehicle_id": vehicle_id,
+            "start_time": start,
+            "end_time": start + timedelta(minutes=30),
+            "distance_in_km": 12.5,
+            "fuel_consumption_liters": 0.9,
+            "average_speed_kmh": 45.0,
+            "duration_seconds": 1800,
+            "is_active": False,
+            "gps_points": [
+                {"latitude": 40.0 + p / 1000, "longitude": -3.7, "timestamp": start + timedelta(seconds=p)}
+                for p in range(gps_points)
+            ],
+            "created_at": start,
+            "updated_at": start,
+        })
+    return trips
+
+
+def trip_payload(documents: list) -> list:
+    """Los mismos viajes con los IDs ya convertidos, como los construye el router"""
+    return [
+        {**{k: v for k, v in doc.items() if k != "_id"},
+         "id": str(doc["_id"]), "user_id": str(doc["user_id"]), "vehicle_id": str(doc["vehicle_id"])}
+        for doc in documents
+    ]
+
+
+def encode_cases(name: str, adapter: TypeAdapter, payload, documents) -> dict:
+    models = adapter.validate_python(payload)
+    return {
+        f"{name}: jsonable_encoder + json": lambda: JSONResponse(jsonable_encoder(models)).body,
+        f"{name}: pydantic dump_json": lambda: adapter.dump_json(adapter.validate_python(payload), by_alias=True),
+        f"{name}: FastJSONResponse": lambda: FastJSONResponse(documents).body,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tiempo de serialización JSON de respuestas grandes")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--trips", type=int, default=20)
+    parser.add_argument("--gps-points", type=int, default=500, help="Puntos GPS por viaje")
+    args = parser.parse_args()
+
+    stations = station_payload(args.stations)
+    trips = trip_documents(args.trips, args.gps_points)
+
+    cases = {}
+    cases.update(encode_cases(f"{args.stations} gasolineras", TypeAdapter(FuelStationList), stations, stations))
+    cases.update(encode_cases(f"{args.trips} viajes", TypeAdapter(List[TripResponse]), trip_payload(trips), trips))
+
+    rows = [(name, time_calls(call, repeat=args.repeat, warmup=2)) for name, call in cases.items()]
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Tamaño del texto que se envía al modelo en maintenance-ai según el modo de
+extracción, sobre un manual sintético con índice y una tabla de mantenimiento
+con líneas, rodeada de cientos de páginas que mencionan aceite, frenos, km/h...
+
+Uso (desde backend/):
+    python -m benchmarks.maintenance_prompt [--pages 300]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from utils.manual_text import _extract_maintenance_sections, format_maintenance_tables, select_candidate_pages
+from utils.pdf_pool import PdfExtractionPool
+
+SCHEDULE = [
+    ["Operación", "Intervalo", "Tiempo"],
+    ["Aceite del motor y filtro", "15 000 km", "12 meses"],
+    ["Filtro de aire", "30 000 km", "24 meses"],
+    ["Filtro de habitáculo", "15 000 km", "12 meses"],
+    ["Bujías", "60 000 km", "48 meses"],
+    ["Líquido de frenos", "-", "24 meses"],
+    ["Correa de distribución", "120 000 km", "96 meses"],
+    ["Refrigerante", "90 000 km", "60 meses"],
+]
+
+_FILLER = [
+    "Compruebe periódicamente la presión de los neumáticos en frío.",
+    "No supere los 120 km/h con la rueda de repuesto montada.",
+    "El testigo de aceite se enciende si el nivel es demasiado bajo.",
+    "Ajuste los retrovisores antes de iniciar la marcha.",
+    "Pise el pedal de freno para desactivar el control de crucero.",
+    "Limpie el sensor de lluvia con un paño suave.",
+    "El sistema de infoentretenimiento admite audio por Bluetooth.",
+    "Consulte a su servicio oficial si la batería se descarga con frecuencia.",
+]
+
+
+def _draw_table(page, rows, top: float = 90) -> None:
+    columns = [50, 280, 400, 520]
+    height = 20
+    for r, row in enumerate(rows):
+        for c, cell in enumerate(row):
+            page.insert_text((columns[c] + 4, top + r * height + 14), cell, fontsize=10)
+    for r in range(len(rows) + 1):
+        page.draw_line((columns[0], top + r * height), (columns[-1], top + r * height))
+    for x in columns:
+        page.draw_line((x, top), (x, top + len(rows) * height))
+
+
+def synthetic_manual_pdf(pages: int = 300, schedule_page: int = None) -> bytes:
+    """Manual con índice; la tabla de mantenimiento está en schedule_page (desde 1)"""
+    import pymupdf as fitz
+
+    schedule_page = schedule_page or pages - 20
+    document = fitz.open()
+    for number in range(1, pages + 1):
+        page = document.new_page()
+        if number == schedule_page:
+            page.insert_text((50, 60), "PROGRAMA DE MANTENIMIENTO", fontsize=14)
+            _draw_table(page, SCHEDULE)
+            continue
+        y = 50
+        for line in range(40):
+            page.insert_text((50, y), f"{_FILLER[(number + line) % len(_FILLER)]} ({number}.{line})", fontsize=9)
+            y += 17
+    document.set_toc([
+        [1, "Introducción", 1],
+        [1, "Conducción", 5],
+        [1, "Mantenimiento", schedule_page],
+        [1, "Datos técnicos", min(pages, schedule_page + 5)],
+    ])
+    data = document.tobytes(garbage=3, deflate=True)
+    document.close()
+    return data
+
+
+async def run(pages: int) -> None:
+    pool = PdfExtractionPool(max_workers=0)
+    pdf = synthetic_manual_pdf(pages)
+
+    started = time.perf_counter()
+    page_texts, toc = await pool.extract_pages(pdf)
+    text = "".join(page + "\n" for page in page_texts)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sections = _extract_maintenance_sections(text)
+    text_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    candidates = select_candidate_pages(page_texts, toc)
+    tables = format_maintenance_tables(await pool.extract_tables(pdf, candidates), page_texts)
+    tables_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Manual sintético: {pages} páginas; páginas candidatas: {[n + 1 for n in candidates]}\n")
+    print(f"{'texto enviado al modelo':<32} {'caracteres':>11} {'ms':>8}")
+    print(f"{'texto completo':<32} {len(text):>11}")
+    print(f"{'secciones (modo sections)':<32} {len(sections):>11} {text_ms:>8.0f}")
+    print(f"{'tablas (modo tables)':<32} {len(tables):>11} {tables_ms:>8.0f}")
+    print(f"\nReducción del prompt: x{len(sections) / max(1, len(tables)):.0f}\n")
+    print(tables)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tamaño del prompt de maintenance-ai por modo de extracción")
+    parser.add_argument("--pages", type=int, default=300)
+    asyncio.run(run(parser.parse_args().pages))
+
+
+if __name__ == "__main__":
+    main()
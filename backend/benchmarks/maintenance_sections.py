@@ -0,0 +1,133 @@
+"""
+Coste de _extract_maintenance_sections sobre un manual sintético grande.
+
+Compara la implementación anterior (lista de ~100 palabras clave y cinco regex
+recorridas línea a línea, con un print por cada línea de mantenimiento) con el
+emparejador precompilado, y comprueba que la salida es idéntica.
+
+Uso (desde backend/):
+    python -m benchmarks.maintenance_sections [--lines 50000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import re
+
+from benchmarks.common import print_table, time_calls
+from utils.manual_text import (
+    MAINTENANCE_KEYWORDS,
+    NUMBER_PATTERNS,
+    SECTION_HEADER_KEYWORDS,
+    _extract_maintenance_sections,
+)
+
+_FILLER = [
+    "Ajuste la posición del asiento antes de iniciar la marcha.",
+    "The infotainment system supports Bluetooth audio streaming.",
+    "Consulte a su concesionario para más información.",
+    "Abroche siempre el cinturón de seguridad",
+    "Pulse el botón durante dos segundos para activar la función.",
+    "INDICADORES Y TESTIGOS DEL CUADRO DE INSTRUMENTOS",
+    "Los airbags se despliegan en caso de colisión frontal grave.",
+    "",
+]
+
+_MAINTENANCE = [
+    "PROGRAMA DE MANTENIMIENTO",
+    "Aceite del motor | cada 15 000 km | 12 meses",
+    "Filtro de aire\t30000 km\t24 meses",
+    "Sustituir las pastillas de freno cuando el espesor sea inferior a 2 mm",
+    "Replace the spark plugs every 60000 km",
+    "Nota: en condiciones severas reduzca los intervalos a la mitad.",
+]
+
+
+def synthetic_manual(lines: int) -> str:
+    """Texto de manual: sobre todo relleno, con una tabla de mantenimiento cada 400 líneas"""
+    output = []
+    for number in range(lines):
+        if number % 400 < len(_MAINTENANCE):
+            output.append(_MAINTENANCE[number % 400])
+        else:
+            output.append(f"{_FILLER[number % len(_FILLER)]} (pág. {number // 45 + 1})" if number % 8 else "")
+    return "\n".join(output)
+
+
+def legacy_extract(text: str) -> str:
+    """Implementación anterior, tal cual, para comparar tiempo y salida"""
+
+    def is_header(line: str) -> bool:
+        keywords = list(SECTION_HEADER_KEYWORDS)
+        line_lower = line.lower()
+        return any(keyword in line_lower for keyword in keywords)
+
+    def is_related(line: str) -> bool:
+        keywords = list(MAINTENANCE_KEYWORDS)
+        patterns = list(NUMBER_PATTERNS)
+        line_lower = line.lower()
+        if any(keyword in line_lower for keyword in keywords):
+            return True
+        return any(re.search(pattern, line_lower) for pattern in patterns)
+
+    maintenance_lines, section_content, context_lines = [], [], []
+    in_section = False
+    for i, line in enumerate(text.split('\n')):
+        current_line = line.strip()
+        if not current_line:
+            if section_content:
+                section_content.append("")
+            continue
+        if is_header(current_line):
+            print(f"Encontrada sección de mantenimiento en línea {i+1}: {current_line[:50]}...")
+            in_section = True
+            if context_lines:
+                section_content.extend(context_lines)
+            section_content = [current_line]
+            context_lines = []
+            continue
+        if in_section:
+            if is_related(current_line) or re.search(r'[|\t]', current_line):
+                section_content.append(current_line)
+            elif current_line.isupper() and len(current_line.split()) > 3:
+                if section_content:
+                    maintenance_lines.extend(section_content)
+                    section_content = []
+                in_section = False
+            else:
+                section_content.append(current_line)
+        elif is_related(current_line):
+            print(f"Encontrada línea de mantenimiento fuera de sección en línea {i+1}: {current_line[:50]}...")
+            maintenance_lines.append(current_line)
+        else:
+            context_lines.append(current_line)
+            if len(context_lines) > 3:
+                context_lines.pop(0)
+    if section_content:
+        maintenance_lines.extend(section_content)
+    return '\n'.join(maintenance_lines)
+
+
+def quiet(func, text: str):
+    """Ejecuta func descartando lo que escribe en stdout"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extracción de secciones de mantenimiento")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = synthetic_manual(args.lines)
+    assert quiet(legacy_extract, text) == quiet(_extract_maintenance_sections, text), "La salida ha cambiado"
+
+    print(f"Manual sintético: {args.lines} líneas, {len(text) / 1024:.0f} KB\n")
+    print_table([
+        ("anterior (palabra a palabra)", time_calls(lambda: quiet(legacy_extract, text), repeat=args.repeat, warmup=1)),
+        ("emparejador precompilado", time_calls(lambda: quiet(_extract_maintenance_sections, text), repeat=args.repeat, warmup=1)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Extracción de texto de un manual sintético de varios cientos de páginas.
+
+Compara la extracción secuencial que hacía la ruta (PyMuPDF en el propio event
+loop) con el pool de procesos que reparte el documento en rangos de páginas.
+Además del tiempo total mide el retraso máximo del event loop mientras se extrae,
+que es lo que notan el resto de peticiones del worker.
+
+Uso (desde backend/):
+    python -m benchmarks.pdf_extraction [--pages 500] [--repeat 3] [--workers 4] [--pages-per-task 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from utils.pdf_pool import PdfExtractionPool
+
+
+def synthetic_manual(pages: int, lines_per_page: int = 45) -> bytes:
+    """PDF con texto en cada página y una tabla de mantenimiento cada 20 páginas"""
+    import pymupdf as fitz
+
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        y = 40
+        for line in range(lines_per_page):
+            if number % 20 == 0 and line < 10:
+                text = f"Filtro de aceite | cada {(line + 1) * 5000} km | {(line + 1) * 6} meses"
+            else:
+                text = f"Capítulo {number // 10 + 1}. Instrucciones de uso del vehículo, línea {line} de la página {number + 1}"
+            page.insert_text((40, y), text, fontsize=9)
+            y += 16
+    data = document.tobytes(garbage=3, deflate=True)
+    document.close()
+    return data
+
+
+async def measure(extract, repeat: int) -> dict:
+    """Tiempo de cada extracción y retraso máximo del event loop (latido cada 5 ms)"""
+    durations, lags = [], []
+    for _ in range(repeat):
+        max_lag = 0.0
+        running = True
+
+        async def heartbeat():
+            nonlocal max_lag
+            while running:
+                expected = time.perf_counter() + 0.005
+                await asyncio.sleep(0.005)
+                max_lag = max(max_lag, time.perf_counter() - expected)
+
+        ticker = asyncio.ensure_future(heartbeat())
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        await extract()
+        durations.append((time.perf_counter() - started) * 1000)
+        running = False
+        await ticker
+        lags.append(max_lag * 1000)
+    return {"mean": statistics.fmean(durations), "best": min(durations), "lag": max(lags)}
+
+
+async def run(args) -> None:
+    pdf = synthetic_manual(args.pages)
+    print(f"PDF sintético: {args.pages} páginas, {len(pdf) / 1024:.0f} KB, {os.cpu_count()} CPU\n")
+
+    async def inline():
+        # Lo que hacía la ruta: PyMuPDF directamente dentro de la corrutina
+        import pymupdf as fitz
+
+        with fitz.open(stream=pdf, filetype="pdf") as doc:
+            return "".join(page.get_text() + "\n" for page in doc), len(doc)
+
+    thread_pool = PdfExtractionPool(max_workers=0)
+    process_pool = PdfExtractionPool(max_workers=args.workers, pages_per_task=args.pages_per_task)
+    # Arranca los procesos antes de medir (en producción viven todo el proceso)
+    await process_pool.extract_text(synthetic_manual(1))
+
+    expected = await inline()
+    assert await process_pool.extract_text(pdf) == expected
+
+    cases = [
+        ("en el event loop (antes)", inline),
+        ("hilo (max_workers=0)", lambda: thread_pool.extract_text(pdf)),
+        (f"pool de {args.workers} procesos", lambda: process_pool.extract_text(pdf)),
+    ]
+    print(f"{'caso':<28} {'media ms':>9} {'mejor ms':>9} {'bloqueo loop ms':>16}")
+    for name, extract in cases:
+        stats = await measure(extract, args.repeat)
+        print(f"{name:<28} {stats['mean']:>9.1f} {stats['best']:>9.1f} {stats['lag']:>16.1f}")
+    process_pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extracción de texto de un PDF grande")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--pages-per-task", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
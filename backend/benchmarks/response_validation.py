@@ -0,0 +1,109 @@
+"""
+Coste por elemento de validar y serializar las respuestas de los listados.
+
+"antes" reproduce lo que hacían las rutas: construir los objetos de la respuesta
+(FuelStationResponse(**station) por estación en /fuel) y dejar que FastAPI los
+volviera a validar contra el response_model antes de serializarlos. "después" usa
+el ResponseSerializer de cada router: precompilado y validando una sola vez, o sin
+validar en el caso de los viajes (modo de confianza).
+
+Uso (desde backend/):
+    python -m benchmarks.response_validation [--repeat 20] [--items 1000]
+"""
+import argparse
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from benchmarks.common import time_calls
+from benchmarks.json_encoding import station_payload, trip_documents, trip_payload
+from schemas.fuel import FuelStationList, FuelStationResponse
+from schemas.trip import TripResponse
+from schemas.vehicle import VehicleResponse
+from utils.json_response import ResponseSerializer
+
+
+def vehicle_payload(count: int) -> list:
+    """Vehículos con la forma que construye GET /vehicles"""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(ObjectId()),
+            "userId": str(ObjectId()),
+            "brand": "Toyota",
+            "model": f"Modelo {v}",
+            "year": 2020,
+            "licensePlate": f"{1000 + v}BCD",
+            "current_kilometers": 50000.0,
+            "maintenance_records": [
+                {
+                    "id": str(ObjectId()),
+                    "type": f"Mantenimiento {m}",
+                    "last_change_km": 40000,
+                    "recommended_interval_km": 15000,
+                    "next_change_km": 55000,
+                    "last_change_date": now,
+                    "notes": None,
+                    "km_since_last_change": 10000.0,
+                }
+                for m in range(5)
+            ],
+            "pdf_manual_grid_fs_id": None,
+            "logo": None,
+            "last_itv_date": now,
+            "next_itv_date": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for v in range(count)
+    ]
+
+
+def fastapi_response(adapter: TypeAdapter, content) -> bytes:
+    """Validación + dump_json que hace FastAPI con el response_model de la ruta"""
+    return adapter.dump_json(adapter.validate_python(content), by_alias=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Coste por elemento de la validación de respuestas")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--items", type=int, default=1000, help="Elementos por respuesta")
+    args = parser.parse_args()
+
+    stations = station_payload(args.items)["stations"]
+    trips = trip_payload(trip_documents(args.items, 20))
+    vehicles = vehicle_payload(args.items)
+
+    station_list = TypeAdapter(FuelStationList)
+    trip_list = TypeAdapter(List[TripResponse])
+    vehicle_list = TypeAdapter(List[VehicleResponse])
+    station_serializer = ResponseSerializer(FuelStationList)
+    trip_serializer = ResponseSerializer(List[TripResponse], trusted=True)
+    vehicle_serializer = ResponseSerializer(List[VehicleResponse])
+
+    cases = {
+        "FuelStationResponse": (
+            lambda: fastapi_response(station_list, FuelStationList(stations=[FuelStationResponse(**s) for s in stations])),
+            lambda: station_serializer.dump_json({"stations": stations}),
+        ),
+        "TripResponse": (
+            lambda: fastapi_response(trip_list, trips),
+            lambda: trip_serializer.dump_json(trips),
+        ),
+        "VehicleResponse": (
+            lambda: fastapi_response(vehicle_list, vehicles),
+            lambda: vehicle_serializer.dump_json(vehicles),
+        ),
+    }
+
+    print(f"{'modelo':<22} {'antes µs/elem':>14} {'después µs/elem':>16}")
+    for name, (before, after) in cases.items():
+        before_ms = time_calls(before, repeat=args.repeat, warmup=2)["mean"]
+        after_ms = time_calls(after, repeat=args.repeat, warmup=2)["mean"]
+        print(f"{name:<22} {before_ms * 1000 / args.items:>14.2f} {after_ms * 1000 / args.items:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,28 @@ Formato de respuestas:
    - Función principal (1 oración)
 """
 
+# Prompt de POST /vehicles/{id}/maintenance-ai. Forma parte de la clave de la caché
+# de resultados: hay que incrementar la versión al cambiar el prompt o sus parámetros
+MAINTENANCE_PROMPT_VERSION = 1
+
+MAINTENANCE_SYSTEM_PROMPT = (
+    "Eres un experto en mantenimiento de vehículos. "
+    "DEBES responder ÚNICAMENTE con un array JSON que contenga los mantenimientos con intervalos en kilómetros. "
+    "NO incluyas explicaciones adicionales ni texto fuera del JSON. "
+    "Formato OBLIGATORIO: [{\"type\": \"tipo de mantenimiento\", \"recommended_interval_km\": numero, \"notes\": \"notas adicionales\"}]. "
+    "Reglas ESTRICTAS:\n"
+    "1. SOLO devuelve el array JSON, nada más\n"
+    "2. El campo type debe estar en español\n"
+    "3. recommended_interval_km debe ser un número entero\n"
+    "4. El campo notes debe ser un string con información relevante\n"
+    "5. Si no hay intervalos en km, devuelve []\n"
+    "6. NO uses comillas simples, SOLO dobles\n"
+    "7. NO incluyas espacios entre los dos puntos\n"
+    "Ejemplo correcto: [{\"type\":\"cambio de aceite\",\"recommended_interval_km\":10000,\"notes\":\"Cambiar el aceite del motor y el filtro\"}]"
+)
+
+MAINTENANCE_USER_PROMPT = "Extrae y devuelve SOLO el array JSON con los mantenimientos que tienen intervalos en kilómetros:\n\n{text}"
+
 def get_formatted_messages(chat_messages: list) -> list:
     """Formatea los mensajes del chat incluyendo el prompt del sistema"""
     formatted_messages = [
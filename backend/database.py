@@ -1,12 +1,41 @@
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
-from pymongo.uri_parser import parse_uri
+from storage import create_client, database_name_from_url, gridfs_bucket, is_memory_url
+from utils.pool_metrics import pool_metrics
+from utils.command_metrics import command_metrics
 
 load_dotenv()
 
+# Opciones del cliente configurables por entorno (solo se pasan las definidas;
+# el resto usa los valores por defecto de pymongo)
+POOL_SETTINGS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+}
+
+
+def client_options() -> dict:
+    """Construye las opciones del pool, timeouts y compresión a partir del entorno"""
+    options = {}
+    for option, env_name in POOL_SETTINGS.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = int(value)
+
+    # Ej.: MONGO_COMPRESSORS=zstd,snappy,zlib (zstd y snappy requieren sus paquetes)
+    compressors = os.getenv("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
 class Database:
-    client: AsyncIOMotorClient = None
+    client = None
     database_url = os.getenv("DATABASE_URL")
     db = None
 
@@ -15,9 +44,16 @@ class Database:
             raise ValueError("DATABASE_URL no está definida en el entorno.")
         try:
             print(f"[DB Connector] Intentando conectar a: {self.database_url}")
-            self.client = AsyncIOMotorClient(self.database_url)
+            options = {}
+            event_listeners = [command_metrics]
+            if not is_memory_url(self.database_url):
+                options = client_options()
+                if options:
+                    print(f"[DB Connector] Opciones del cliente: {options}")
+                event_listeners.append(pool_metrics)
+            self.client = create_client(self.database_url, event_listeners=event_listeners, **options)
             
-            db_name = parse_uri(self.database_url).get('database')
+            db_name = database_name_from_url(self.database_url)
             if not db_name:
                 raise ValueError(f"No se especificó el nombre de la base de datos en la URL: {self.database_url}")
                 
@@ -28,6 +64,10 @@ class Database:
             self.client = None
             self.db = None
 
+    def gridfs_bucket(self, bucket_name: str = "fs"):
+        """Bucket GridFS de la base de datos actual (Motor o memoria)"""
+        return gridfs_bucket(self.db, bucket_name)
+
     def close_database_connection(self):
         if self.client:
             current_db_name = self.db.name if self.db is not None else "N/A"
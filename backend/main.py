@@ -1,8 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import db
-from routers import auth, users, vehicles, chats, trips, fuel
+from routers import auth, users, vehicles, chats, trips, fuel, health, logos
+from auth.revocation import revocation_filter
+from migrations import run_migrations
+from utils.command_metrics import QueryMonitorMiddleware, route_query_metrics
+from utils.pdf_pool import pdf_pool
+from utils.llm_client import llm_client
+from utils.maintenance_jobs import maintenance_jobs
 import logging
+import os
 
 app = FastAPI(
     title="OBD Scanner API",
@@ -23,6 +30,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comandos de MongoDB por ruta (ver GET /health/queries)
+app.add_middleware(QueryMonitorMiddleware, metrics=route_query_metrics)
+
 # Incluir routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(users.router, prefix="/users", tags=["users"])
@@ -30,6 +40,8 @@ app.include_router(vehicles.router, prefix="/vehicles", tags=["vehicles"])
 app.include_router(chats.router, prefix="/chats", tags=["chats"])
 app.include_router(trips.router, prefix="/trips", tags=["trips"])
 app.include_router(fuel.router, prefix="/fuel", tags=["fuel"])
+app.include_router(health.router, prefix="/health", tags=["health"])
+app.include_router(logos.router, prefix="/logos", tags=["logos"])
 
 @app.on_event("startup")
 async def startup_db_client():
@@ -37,13 +49,35 @@ async def startup_db_client():
         db.connect_to_database()
     except Exception as e:
         logging.error(f"Error al conectar a la base de datos: {e}")
+    try:
+        # Solo los índices pendientes: las migraciones de datos se aplican con 'python -m migrations'
+        if db.db is not None and os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+            await run_migrations(db.db, include_data=False)
+    except Exception as e:
+        logging.error(f"Error al aplicar las migraciones: {e}")
+    try:
+        if db.db is not None:
+            await revocation_filter.rebuild(db.db)
+    except Exception as e:
+        logging.error(f"Error al reconstruir el filtro de revocación: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Antes de cerrar la base de datos: los trabajos cancelados se guardan como fallidos
+    try:
+        await maintenance_jobs.shutdown()
+    except Exception as e:
+        logging.error(f"Error al detener los trabajos de maintenance-ai: {e}")
     try:
         db.close_database_connection()
     except Exception as e:
         logging.error(f"Error al cerrar la conexión de base de datos: {e}")
+    # Procesos de extracción de PDF (solo existen si se ha analizado algún manual)
+    pdf_pool.shutdown()
+    try:
+        await llm_client.close()
+    except Exception as e:
+        logging.error(f"Error al cerrar el cliente del LLM: {e}")
 
 @app.get("/")
 async def root():
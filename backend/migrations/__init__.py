@@ -0,0 +1,2 @@
+from .duplicates import DuplicateKeysError, unique_index_conflicts
+from .runner import MIGRATIONS, run_migrations, report_collscans, create_declared_indexes
@@ -0,0 +1,55 @@
+"""
+Ejecuta las migraciones pendientes desde la línea de comandos:
+
+    python -m migrations            # aplica las migraciones pendientes (también las de
+                                    # datos, que la API no aplica al arrancar)
+    python -m migrations --status   # muestra las versiones aplicadas y las claves
+                                    # repetidas que impiden crear índices únicos
+    python -m migrations --report   # lista las consultas calientes que hacen COLLSCAN
+"""
+import argparse
+import asyncio
+import json
+
+from database import db
+from migrations.duplicates import unique_index_conflicts
+from migrations.runner import MIGRATIONS, applied_versions, report_collscans, run_migrations
+
+
+async def main(args) -> None:
+    db.connect_to_database()
+    if db.db is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    try:
+        if args.status:
+            done = await applied_versions(db.db)
+            for migration in MIGRATIONS:
+                mark = "x" if migration.version in done else " "
+                kind = " (datos)" if migration.data else ""
+                print(f"[{mark}] {migration.version}: {migration.description}{kind}")
+            conflicts = await unique_index_conflicts(db.db)
+            for name, duplicates in conflicts.items():
+                print(f"ERROR: claves repetidas en el índice único {name}:")
+                for duplicate in duplicates:
+                    print(f"  {duplicate['key']} -> {[str(_id) for _id in duplicate['ids']]}")
+            if conflicts:
+                raise SystemExit("Hay claves repetidas que impiden crear índices únicos")
+            return
+
+        applied = await run_migrations(db.db)
+        print(f"Migraciones aplicadas: {applied or 'ninguna (al día o en curso en otro proceso)'}")
+
+        if args.report:
+            collscans = await report_collscans(db.db)
+            print(json.dumps(collscans, indent=2, ensure_ascii=False, default=str))
+            if not collscans:
+                print("Ninguna consulta caliente hace COLLSCAN")
+    finally:
+        db.close_database_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones e índices de la base de datos")
+    parser.add_argument("--status", action="store_true", help="Muestra las migraciones aplicadas")
+    parser.add_argument("--report", action="store_true", help="Informa de las consultas que harían COLLSCAN")
+    asyncio.run(main(parser.parse_args()))
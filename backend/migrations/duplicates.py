@@ -0,0 +1,81 @@
+import logging
+from typing import Dict, List
+
+from migrations.indexes import INDEXES
+
+logger = logging.getLogger(__name__)
+
+# Índices únicos cuyas claves repetidas se resuelven borrando las copias (se queda
+# el documento más antiguo). En el resto (p. ej. dos usuarios con el mismo email,
+# cada uno con sus vehículos) hay que decidir a mano qué documento se conserva
+DEDUPLICABLE_INDEXES = {"favorite_stations_user_station_unique"}
+
+
+class DuplicateKeysError(Exception):
+    """Hay documentos repetidos que impiden crear índices únicos"""
+
+    def __init__(self, conflicts: Dict[str, List[dict]]):
+        self.conflicts = conflicts
+        details = "; ".join(
+            f"{name}: {', '.join(str(duplicate['key']) for duplicate in duplicates)}"
+            for name, duplicates in conflicts.items()
+        )
+        super().__init__(f"Claves repetidas que impiden crear índices únicos, hay que resolverlas a mano ({details})")
+
+
+async def find_duplicate_keys(database, collection_name: str, index) -> List[dict]:
+    """
+    Claves repetidas en la colección para un índice único declarado.
+
+    Returns:
+        List[dict]: collection, key (valores de los campos del índice) e ids de los
+        documentos que la comparten, del más antiguo al más reciente
+    """
+    spec = index.document
+    pipeline = [
+        {"$match": spec.get("partialFilterExpression", {})},
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": {field: f"${field}" for field in spec["key"]},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    groups = await database[collection_name].aggregate(pipeline).to_list(None)
+    return [{"collection": collection_name, "key": group["_id"], "ids": group["ids"]} for group in groups]
+
+
+async def unique_index_conflicts(database) -> Dict[str, List[dict]]:
+    """Claves repetidas de cada índice único declarado en migrations.indexes que las tenga"""
+    conflicts = {}
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            if not index.document.get("unique"):
+                continue
+            duplicates = await find_duplicate_keys(database, collection_name, index)
+            if duplicates:
+                conflicts[index.document["name"]] = duplicates
+    return conflicts
+
+
+async def resolve_duplicate_keys(database) -> None:
+    """
+    Prepara la creación de los índices únicos: borra las copias de los índices
+    deduplicables y falla con las claves repetidas del resto.
+
+    Raises:
+        DuplicateKeysError: Si quedan claves repetidas que hay que resolver a mano
+    """
+    pending = {}
+    for name, duplicates in (await unique_index_conflicts(database)).items():
+        if name not in DEDUPLICABLE_INDEXES:
+            pending[name] = duplicates
+            continue
+        removed = 0
+        for duplicate in duplicates:
+            result = await database[duplicate["collection"]].delete_many({"_id": {"$in": duplicate["ids"][1:]}})
+            removed += result.deleted_count
+        logger.warning(f"Índice {name}: {removed} documentos repetidos borrados en {len(duplicates)} claves")
+    if pending:
+        raise DuplicateKeysError(pending)
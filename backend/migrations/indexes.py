@@ -0,0 +1,105 @@
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Índices declarados por colección. Las consultas por {_id, user_id} de vehículos
+# y viajes ya se resuelven con el índice único de _id, así que no se duplican.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="users_email_unique", unique=True),
+        IndexModel(
+            [("token_epoch", ASCENDING)],
+            name="users_token_epoch_revoked",
+            partialFilterExpression={"token_epoch": {"$gt": 0}},
+        ),
+    ],
+    "vehicles": [
+        IndexModel([("user_id", ASCENDING), ("licensePlate", ASCENDING)], name="vehicles_user_plate"),
+    ],
+    "trips": [
+        IndexModel(
+            [("user_id", ASCENDING), ("vehicle_id", ASCENDING), ("start_time", DESCENDING)],
+            name="trips_user_vehicle_start",
+        ),
+        IndexModel([("user_id", ASCENDING), ("start_time", DESCENDING)], name="trips_user_start"),
+        IndexModel(
+            [("user_id", ASCENDING)],
+            name="trips_active_by_user",
+            partialFilterExpression={"is_active": True},
+        ),
+    ],
+    "chats": [
+        IndexModel([("userId", ASCENDING), ("vehicleId", ASCENDING)], name="chats_user_vehicle"),
+    ],
+    "favorite_stations": [
+        IndexModel(
+            [("user_id", ASCENDING), ("station_id", ASCENDING)],
+            name="favorite_stations_user_station_unique",
+            unique=True,
+        ),
+    ],
+    "logos": [
+        IndexModel([("brands", ASCENDING)], name="logos_brands"),
+    ],
+    "manuals": [
+        IndexModel([("file_id", ASCENDING)], name="manuals_file_id_unique", unique=True),
+    ],
+    "maintenance_ai_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="maintenance_ai_cache_ttl", expireAfterSeconds=0),
+    ],
+    "maintenance_jobs": [
+        IndexModel(
+            [("active_key", ASCENDING)],
+            name="maintenance_jobs_active_unique",
+            unique=True,
+            partialFilterExpression={"active_key": {"$exists": True}},
+        ),
+        IndexModel([("expires_at", ASCENDING)], name="maintenance_jobs_ttl", expireAfterSeconds=0),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="maintenance_jobs_status_created"),
+    ],
+    "revoked_tokens": [
+        IndexModel([("jti", ASCENDING)], name="revoked_tokens_jti_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="revoked_tokens_ttl", expireAfterSeconds=0),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_tokens_revoked_at"),
+    ],
+}
+
+# Consultas calientes de los routers, con valores de ejemplo, para comprobar con
+# explain que ninguna termina en COLLSCAN.
+_SAMPLE_ID = ObjectId()
+_SAMPLE_DATE = datetime(2024, 1, 1)
+
+HOT_QUERIES = [
+    {"name": "auth.get_current_user_data", "collection": "users", "filter": {"email": "usuario@example.com"}},
+    {"name": "auth.token_epochs", "collection": "users", "filter": {"token_epoch": {"$gt": 0}}},
+    {"name": "vehicles.get_vehicle", "collection": "vehicles", "filter": {"_id": _SAMPLE_ID, "user_id": _SAMPLE_ID}},
+    {"name": "vehicles.get_user_vehicles", "collection": "vehicles", "filter": {"user_id": _SAMPLE_ID}},
+    {"name": "vehicles.create_vehicle", "collection": "vehicles", "filter": {"licensePlate": "1234ABC", "user_id": _SAMPLE_ID}},
+    {
+        "name": "trips.get_user_trips",
+        "collection": "trips",
+        "filter": {"user_id": _SAMPLE_ID},
+        "sort": {"start_time": -1},
+    },
+    {
+        "name": "trips.get_user_trips (vehículo)",
+        "collection": "trips",
+        "filter": {"user_id": _SAMPLE_ID, "vehicle_id": _SAMPLE_ID},
+        "sort": {"start_time": -1},
+    },
+    {"name": "trips.get_active_trip", "collection": "trips", "filter": {"user_id": _SAMPLE_ID, "is_active": True}},
+    {"name": "chats.create_or_retrieve_chat", "collection": "chats", "filter": {"userId": _SAMPLE_ID, "vehicleId": _SAMPLE_ID}},
+    {"name": "fuel.get_processed_stations", "collection": "favorite_stations", "filter": {"user_id": _SAMPLE_ID}},
+    {"name": "fuel.add_favorite_station", "collection": "favorite_stations", "filter": {"user_id": _SAMPLE_ID, "station_id": "1111"}},
+    {"name": "vehicles.release_manual", "collection": "manuals", "filter": {"file_id": _SAMPLE_ID}},
+    {"name": "vehicles.maintenance_ai_jobs", "collection": "maintenance_jobs", "filter": {"active_key": "0" * 64}},
+    {
+        "name": "maintenance_worker.claim_next",
+        "collection": "maintenance_jobs",
+        "filter": {"status": "queued"},
+        "sort": {"created_at": 1},
+    },
+    {"name": "auth.revocation_filter", "collection": "revoked_tokens", "filter": {"jti": "0" * 32}},
+    {"name": "auth.revocation_filter.refresh", "collection": "revoked_tokens", "filter": {"revoked_at": {"$gt": _SAMPLE_DATE}}},
+]
@@ -0,0 +1,40 @@
+import logging
+
+from migrations.indexes import INDEXES
+from utils.logo_store import LOGOS_COLLECTION, generate_thumbnails, save_base64_logo
+
+logger = logging.getLogger(__name__)
+
+
+async def dedupe_inline_logos(database) -> None:
+    """
+    Mueve los logos en base64 guardados dentro de cada vehículo a la colección de
+    logos (una copia por contenido) y deja en el vehículo solo su hash.
+    """
+    await database[LOGOS_COLLECTION].create_indexes(INDEXES[LOGOS_COLLECTION])
+
+    moved = invalid = 0
+    cursor = database.vehicles.find({"logo": {"$exists": True}}, {"brand": 1, "logo": 1})
+    async for vehicle in cursor:
+        digest = await save_base64_logo(database, vehicle.get("logo"), vehicle.get("brand"))
+        update = {"$unset": {"logo": ""}}
+        if digest:
+            update["$set"] = {"logo_hash": digest}
+            moved += 1
+        elif vehicle.get("logo"):
+            invalid += 1
+            logger.warning(f"Logo inválido en el vehículo {vehicle['_id']}; se elimina")
+        await database.vehicles.update_one({"_id": vehicle["_id"]}, update)
+
+    stored = await database[LOGOS_COLLECTION].count_documents({})
+    logger.info(f"Logos en línea movidos: {moved} vehículos, {stored} logos distintos, {invalid} inválidos")
+
+
+async def generate_missing_thumbnails(database) -> None:
+    """Genera las miniaturas de los logos guardados antes de que existieran"""
+    generated = 0
+    cursor = database[LOGOS_COLLECTION].find({"thumbnails": {"$exists": False}, "variant_of": {"$exists": False}})
+    async for logo in cursor:
+        if await generate_thumbnails(database, logo["_id"], logo["data"]):
+            generated += 1
+    logger.info(f"Miniaturas generadas para {generated} logos")
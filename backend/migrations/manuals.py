@@ -0,0 +1,82 @@
+import logging
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from migrations.indexes import INDEXES
+from storage import gridfs_bucket
+from utils.manual_store import MANUALS_COLLECTION, acquire_manual, hash_grid_out, register_manual
+
+logger = logging.getLogger(__name__)
+
+# Un proceso que se interrumpe a mitad de un vehículo deja su marca; pasado este
+# tiempo otro puede volver a tomarlo
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+async def dedupe_manuals(database) -> None:
+    """
+    Calcula el hash de los manuales ya subidos (un fichero GridFS por vehículo),
+    deja una sola copia de cada PDF en GridFS con su recuento de referencias y
+    apunta todos los vehículos a ella.
+
+    Cada vehículo se marca (pdf_manual_claimed_at) antes de contarle la referencia,
+    de modo que dos ejecuciones a la vez no procesan el mismo vehículo.
+    """
+    await database[MANUALS_COLLECTION].create_indexes(INDEXES[MANUALS_COLLECTION])
+    bucket = gridfs_bucket(database)
+
+    registered = shared = missing = 0
+    cursor = database.vehicles.find(
+        {"pdf_manual_grid_fs_id": {"$exists": True}, "pdf_manual_hash": {"$exists": False}},
+        {"pdf_manual_grid_fs_id": 1}
+    )
+    async for vehicle in cursor:
+        now = datetime.utcnow()
+        claimed = await database.vehicles.update_one(
+            {
+                "_id": vehicle["_id"],
+                "pdf_manual_hash": {"$exists": False},
+                "$or": [
+                    {"pdf_manual_claimed_at": {"$exists": False}},
+                    {"pdf_manual_claimed_at": {"$lt": now - CLAIM_TIMEOUT}},
+                ],
+            },
+            {"$set": {"pdf_manual_claimed_at": now}}
+        )
+        if not claimed.modified_count:
+            # Lo está procesando otra ejecución (o ya lo hizo)
+            continue
+
+        file_id = ObjectId(vehicle["pdf_manual_grid_fs_id"])
+        try:
+            grid_out = await bucket.open_download_stream(file_id)
+        except NoFile:
+            missing += 1
+            logger.warning(f"El manual del vehículo {vehicle['_id']} no existe en GridFS; se quita la referencia")
+            await database.vehicles.update_one(
+                {"_id": vehicle["_id"]},
+                {"$unset": {"pdf_manual_grid_fs_id": "", "pdf_manual_claimed_at": ""}}
+            )
+            continue
+
+        digest = await hash_grid_out(grid_out)
+        manual = await acquire_manual(database, digest)
+        if manual is None:
+            manual = await register_manual(database, bucket, digest, file_id, grid_out.length)
+            registered += 1
+        elif manual["file_id"] != file_id:
+            # Copia repetida de un PDF que ya está guardado
+            await bucket.delete(file_id)
+            shared += 1
+
+        await database.vehicles.update_one(
+            {"_id": vehicle["_id"]},
+            {
+                "$set": {"pdf_manual_grid_fs_id": str(manual["file_id"]), "pdf_manual_hash": digest},
+                "$unset": {"pdf_manual_claimed_at": ""},
+            }
+        )
+
+    logger.info(f"Manuales deduplicados: {registered} distintos, {shared} copias borradas, {missing} inexistentes")
@@ -0,0 +1,163 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from migrations.duplicates import resolve_duplicate_keys
+from migrations.indexes import INDEXES, HOT_QUERIES
+from migrations.logos import dedupe_inline_logos, generate_missing_thumbnails
+from migrations.manuals import dedupe_manuals
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+# Documento de schema_migrations que hace de cerrojo: solo un proceso aplica
+# migraciones a la vez (varios workers o arranques en frío simultáneos)
+LOCK_ID = "lock"
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[object], Awaitable[None]]
+    # Las migraciones de datos no se aplican al arrancar, solo con 'python -m migrations'
+    data: bool = False
+
+
+async def create_declared_indexes(database) -> None:
+    """
+    Crea (de forma idempotente) todos los índices declarados en migrations.indexes.
+
+    Raises:
+        DuplicateKeysError: Si hay claves repetidas que impiden crear un índice único
+    """
+    # Sin esto, un índice único sobre datos repetidos fallaría en cada arranque sin
+    # decir qué documentos lo impiden
+    await resolve_duplicate_keys(database)
+    for collection_name, indexes in INDEXES.items():
+        names = await database[collection_name].create_indexes(indexes)
+        logger.info(f"Índices asegurados en '{collection_name}': {', '.join(names)}")
+
+
+# Lista ordenada de migraciones. Cada versión se aplica una única vez y queda
+# registrada en la colección schema_migrations.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Índices iniciales de todas las colecciones", create_declared_indexes),
+    Migration(2, "Logos de vehículos deduplicados en la colección logos", dedupe_inline_logos, data=True),
+    Migration(3, "Miniaturas normalizadas de los logos existentes", generate_missing_thumbnails, data=True),
+    Migration(4, "Manuales en PDF deduplicados por contenido con recuento de referencias", dedupe_manuals, data=True),
+    Migration(5, "Índice TTL de la caché de resultados de maintenance-ai", create_declared_indexes),
+    Migration(6, "Índices de los trabajos en segundo plano de maintenance-ai", create_declared_indexes),
+    Migration(7, "Índice de la cola de trabajos de maintenance-ai para el worker", create_declared_indexes),
+    Migration(8, "Índice de las revocaciones por fecha para actualizar el filtro", create_declared_indexes),
+]
+
+
+async def applied_versions(database) -> set:
+    cursor = database[MIGRATIONS_COLLECTION].find({}, {"_id": 1})
+    return {document["_id"] async for document in cursor if document["_id"] != LOCK_ID}
+
+
+async def _acquire_lock(database, lease: timedelta) -> Optional[str]:
+    """Toma el cerrojo de migraciones durante lease. None si lo tiene otro proceso"""
+    owner = uuid.uuid4().hex
+    now = datetime.utcnow()
+    lock = {"owner": owner, "expires_at": now + lease}
+    collection = database[MIGRATIONS_COLLECTION]
+    try:
+        await collection.insert_one({"_id": LOCK_ID, **lock})
+        return owner
+    except DuplicateKeyError:
+        # Un proceso que murió con el cerrojo lo libera al caducar
+        taken = await collection.find_one_and_update(
+            {"_id": LOCK_ID, "expires_at": {"$lt": now}},
+            {"$set": lock}
+        )
+        return owner if taken is not None else None
+
+
+async def run_migrations(database, include_data: bool = True,
+                         lease: timedelta = timedelta(minutes=30)) -> List[int]:
+    """
+    Aplica en orden las migraciones pendientes. Si otro proceso las está
+    aplicando, no hace nada.
+
+    Args:
+        include_data: Si es False solo se aplican las migraciones de índices (arranque
+            de la API); las de datos quedan pendientes para 'python -m migrations'
+
+    Returns:
+        List[int]: Versiones aplicadas en esta ejecución
+    """
+    owner = await _acquire_lock(database, lease)
+    if owner is None:
+        logger.info("Otro proceso está aplicando las migraciones; se omiten")
+        return []
+
+    collection = database[MIGRATIONS_COLLECTION]
+    applied = []
+    try:
+        done = await applied_versions(database)
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in done:
+                continue
+            if migration.data and not include_data:
+                logger.warning(
+                    f"Migración de datos {migration.version} pendiente: {migration.description} "
+                    f"(se aplica con 'python -m migrations')"
+                )
+                continue
+            logger.info(f"Aplicando migración {migration.version}: {migration.description}")
+            await migration.apply(database)
+            await collection.update_one(
+                {"_id": migration.version},
+                {"$set": {"description": migration.description, "applied_at": datetime.utcnow()}},
+                upsert=True
+            )
+            applied.append(migration.version)
+            # Renueva el cerrojo entre migraciones largas
+            await collection.update_one(
+                {"_id": LOCK_ID, "owner": owner},
+                {"$set": {"expires_at": datetime.utcnow() + lease}}
+            )
+    finally:
+        await collection.delete_one({"_id": LOCK_ID, "owner": owner})
+    return applied
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Recorre un plan de explain y devuelve todas sus etapas"""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    children = list(plan.get("inputStages", []))
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            children.append(plan[key])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def report_collscans(database) -> List[dict]:
+    """
+    Ejecuta explain sobre las consultas calientes declaradas y devuelve las que
+    siguen resolviéndose con COLLSCAN.
+    """
+    report = []
+    for query in HOT_QUERIES:
+        command = {"find": query["collection"], "filter": query["filter"]}
+        if query.get("sort"):
+            command["sort"] = query["sort"]
+        try:
+            explain = await database.command({"explain": command, "verbosity": "queryPlanner"})
+            stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        except Exception as e:
+            report.append({"query": query["name"], "collection": query["collection"], "error": str(e)})
+            continue
+        if "COLLSCAN" in stages:
+            report.append({"query": query["name"], "collection": query["collection"], "stages": stages})
+    return report
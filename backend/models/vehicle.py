@@ -41,7 +41,7 @@ class Vehicle:
         self.current_kilometers = current_kilometers
         self.maintenance_records = []
         self.pdf_manual_grid_fs_id = None
-        self.logo = None  # Campo para almacenar la imagen del logo
+        self.logo_hash = None  # Hash del logo en la colección logos (GET /logos/{hash})
         self.last_itv_date = None  # Fecha de la última ITV
         self.next_itv_date = None  # Fecha de la próxima ITV
         self.created_at = datetime.utcnow()
@@ -1,17 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Body
+from fastapi import APIRouter, HTTPException, Depends, status, Body, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from typing import Annotated
+from typing import Annotated, Optional
 from datetime import timedelta, datetime
-from passlib.context import CryptContext
 from bson import ObjectId
 
 from database import db
-from schemas.user import UserCreate, UserLogin, UserResponse, Token
-from auth.jwt_handler import create_access_token, verify_token
+from schemas.user import UserCreate, UserLogin, UserResponse, Token, RefreshRequest
+from auth.jwt_handler import (
+    create_access_token,
+    create_identity_token,
+    create_refresh_token,
+    identity_claims_enabled,
+    refresh_tokens_enabled,
+    short_access_token_lifetime,
+    verify_token
+)
+from auth.user_cache import user_cache
+from auth.password_pool import password_pool
+from auth.token_epochs import token_epochs
+from auth.rate_limiter import auth_rate_limiter
+from auth.revocation import revocation_filter
 from models.user import User
+from utils.json_response import FastJSONRoute
 
-router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+router = APIRouter(route_class=FastJSONRoute)
 #oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -21,7 +33,39 @@ async def get_current_user_data(token: str = Depends(oauth2_scheme)):
     """
     try:
         payload = verify_token(token)
-        user = await db.db.users.find_one({"email": payload["sub"]})
+        subject = payload["sub"]
+
+        if payload.get("typ") == "refresh":
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Un token de refresco no sirve como token de acceso"
+            )
+        if payload.get("jti") and await revocation_filter.is_revoked(db.db, payload["jti"]):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token revocado"
+            )
+
+        # Tokens con claims de identidad: el contexto sale del propio token
+        if "uid" in payload:
+            current_epoch = await token_epochs.current(db.db, payload["uid"])
+            if payload.get("epoch", 0) < current_epoch:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token revocado"
+                )
+            return {
+                "_id": ObjectId(payload["uid"]),
+                "id": payload["uid"],
+                "email": subject,
+                "username": payload.get("username"),
+            }
+
+        cached_user = user_cache.get(subject)
+        if cached_user is not None:
+            return cached_user
+
+        user = await db.db.users.find_one({"email": subject})
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -30,6 +74,10 @@ async def get_current_user_data(token: str = Depends(oauth2_scheme)):
         user["id"] = str(user["_id"])
         if "password_hash" not in user:
             print(f"Advertencia: Usuario {user.get('email')} no tiene campo 'password_hash'")
+        # El hash no se cachea: tras un cambio de contraseña, la caché de otro worker
+        # seguiría aceptando la anterior
+        user.pop("password_hash", None)
+        user_cache.set(subject, user)
         return user
     except Exception as e:
         print(f"Error en get_current_user_data: {e}")
@@ -39,9 +87,27 @@ async def get_current_user_data(token: str = Depends(oauth2_scheme)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def _issue_tokens(user: dict) -> dict:
+    """Emite el token de acceso (y el de refresco si están habilitados) en el formato configurado"""
+    lifetime = short_access_token_lifetime() if refresh_tokens_enabled() else None
+    if identity_claims_enabled():
+        access_token = create_identity_token(user, expires_delta=lifetime)
+    else:
+        access_token = create_access_token(data={"sub": user["email"]}, expires_delta=lifetime)
+
+    tokens = {"access_token": access_token, "token_type": "bearer"}
+    if refresh_tokens_enabled():
+        tokens["refresh_token"] = create_refresh_token({
+            "sub": user["email"],
+            "uid": str(user["_id"]),
+            "epoch": user.get("token_epoch", 0),
+        })
+    return tokens
+
 @router.post("/login", response_model=Token)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     """Login de usuario"""
+    await auth_rate_limiter.check(request, form_data.username)
     user = await db.db.users.find_one({"email": form_data.username})
 
     if not user:
@@ -59,7 +125,7 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
             detail="Error interno: configuración de usuario incompleta."
         )
 
-    if not pwd_context.verify(form_data.password, stored_password_hash):
+    if not await password_pool.verify(form_data.password, stored_password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas",
@@ -74,8 +140,7 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
             detail="Error interno: datos de usuario incompletos."
         )
 
-    access_token = create_access_token(data={"sub": user_email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return _issue_tokens(user)
 
 @router.put("/change-password")
 async def change_password(
@@ -84,23 +149,37 @@ async def change_password(
     current_user: dict = Depends(get_current_user_data)
 ):
     """Cambio de contraseña"""
-    current_password_hash = current_user.get("password_hash")
-    if not current_password_hash or not pwd_context.verify(current_password, current_password_hash):
+    # Siempre de la base de datos: el contexto del usuario (cacheado o del token) no lleva el hash
+    stored_user = await db.db.users.find_one(
+        {"_id": ObjectId(current_user["id"])},
+        {"password_hash": 1}
+    )
+    current_password_hash = stored_user.get("password_hash") if stored_user else None
+    if not current_password_hash or not await password_pool.verify(current_password, current_password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Contraseña actual incorrecta"
         )
     
-    hashed_password = pwd_context.hash(new_password)
+    hashed_password = await password_pool.hash(new_password)
     await db.db.users.update_one(
         {"_id": ObjectId(current_user["id"])},
         {"$set": {"password_hash": hashed_password}}
     )
+    user_cache.invalidate_user(current_user["id"])
+
+    # Revocar los tokens de identidad emitidos antes del cambio
+    await token_epochs.bump(db.db, current_user["id"])
     
+    if identity_claims_enabled() or refresh_tokens_enabled():
+        updated_user = await User.find_by_id(db.db, current_user["id"])
+        return {"message": "Contraseña actualizada correctamente", **_issue_tokens(updated_user)}
     return {"message": "Contraseña actualizada correctamente"}
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate):
+async def register(request: Request, user_data: UserCreate):
+    await auth_rate_limiter.check(request, user_data.email)
+
     # Verificar si el usuario ya existe
     existing_user = await User.find_by_email(db.db, user_data.email)
     if existing_user:
@@ -110,7 +189,7 @@ async def register(user_data: UserCreate):
         )
     
     # Crear nuevo usuario usando el modelo
-    hashed_password = pwd_context.hash(user_data.password)
+    hashed_password = await password_pool.hash(user_data.password)
     new_user_dict = {
         "username": user_data.username,
         "email": user_data.email,
@@ -137,7 +216,84 @@ async def register(user_data: UserCreate):
             detail="Error interno al crear el usuario: faltan datos."
         )
 
-    access_token = create_access_token(data={"sub": created_user_email})
-    
-    # Formatear la respuesta para que coincida con UserResponse
-    return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
+    # Formatear la respuesta para que coincida con Token
+    return _issue_tokens(created_user)
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(refresh_data: RefreshRequest):
+    """Renueva el token de acceso a partir de un token de refresco (con rotación)"""
+    if not refresh_tokens_enabled():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Los tokens de refresco no están habilitados"
+        )
+
+    payload = verify_token(refresh_data.refresh_token)
+    if not payload or payload.get("typ") != "refresh" or not payload.get("jti"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de refresco inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if await revocation_filter.is_revoked(db.db, payload["jti"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de refresco revocado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = await User.find_by_email(db.db, payload["sub"])
+    if (
+        not user
+        or str(user["_id"]) != payload.get("uid")
+        or payload.get("epoch", 0) < user.get("token_epoch", 0)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de refresco inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Rotación: el token de refresco usado deja de ser válido. La revocación es la
+    # comprobación atómica: de dos renovaciones simultáneas con el mismo token solo
+    # una lo revoca y recibe tokens nuevos
+    if not await revocation_filter.revoke(db.db, payload["jti"], datetime.utcfromtimestamp(payload["exp"])):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de refresco revocado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _issue_tokens(user)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    refresh_data: Optional[RefreshRequest] = None,
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Revoca el token de acceso actual y, si se envía, el token de refresco. Los
+    tokens emitidos antes de la revocación individual no tienen jti: no se pueden
+    revocar, pero el cierre de sesión no falla por ello.
+    """
+    payload = verify_token(token)
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciales inválidas",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("jti"):
+        await revocation_filter.revoke(db.db, payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+
+    if refresh_data:
+        refresh_payload = verify_token(refresh_data.refresh_token)
+        if (
+            refresh_payload
+            and refresh_payload.get("typ") == "refresh"
+            and refresh_payload.get("sub") == payload.get("sub")
+            and refresh_payload.get("jti")
+        ):
+            await revocation_filter.revoke(
+                db.db, refresh_payload["jti"], datetime.utcfromtimestamp(refresh_payload["exp"])
+            )
\ No newline at end of file
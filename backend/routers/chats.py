@@ -2,8 +2,6 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from bson import ObjectId
 from typing import List
 from datetime import datetime
-import requests
-import json
 import os
 
 from dotenv import load_dotenv
@@ -11,21 +9,13 @@ from database import db
 from schemas.chat import ChatCreate, ChatResponse
 from routers.auth import get_current_user_data
 from config.llm_config import SYSTEM_PROMPT
+from utils.json_response import FastJSONRoute
+from utils.llm_client import CircuitOpenError, LLMError, llm_client
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 load_dotenv()
 
-# ======= CONFIGURACIÓN DE OPENROUTER =======
-
-def build_openrouter_headers():
-    return {
-        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-        "HTTP-Referer": os.getenv('HTTP_REFERER'),
-        "X-Title": os.getenv('X_TITLE'),
-        "Content-Type": "application/json",
-    }
-
 # =========================================================
 # =============== FUNCIÓN PARA LLAMAR A OPENROUTER ========
 # =========================================================
@@ -38,53 +28,47 @@ async def get_llm_response(messages: List[dict]) -> str:
     if not api_key:
         # Error si la clave de API no está configurada
         raise ValueError("La variable de entorno OPENROUTER_API_KEY no está configurada en el servidor.")
-        
-    try:
-        # Asegurar que hay un mensaje 'system'
-        if not any(m["role"] == "system" for m in messages):
-            messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
-
-        # Construir la petición a OpenRouter
-        data = {
-            "model": os.getenv('OPENROUTER_MODEL'),
-            "messages": messages,
-            "temperature": 0.3,  # Temperatura baja para respuestas más deterministas
-            "top_p": 0.3,        # Valor bajo para reducir la creatividad
-            #"max_tokens": 250
-        }
 
-        print("\n=== Enviando solicitud a OpenRouter ===")
-        print(json.dumps(data, indent=2))  # Para depuración
+    # Asegurar que hay un mensaje 'system'
+    if not any(m["role"] == "system" for m in messages):
+        messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
+
+    # Construir la petición a OpenRouter
+    data = {
+        "model": os.getenv('OPENROUTER_MODEL'),
+        "messages": messages,
+        "temperature": 0.3,  # Temperatura baja para respuestas más deterministas
+        "top_p": 0.3,        # Valor bajo para reducir la creatividad
+        #"max_tokens": 250
+    }
 
-        resp = requests.post(
-            os.getenv('OPENROUTER_URL'),
-            headers=build_openrouter_headers(),
-            data=json.dumps(data)
+    try:
+        result = await llm_client.chat_completion(data)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"El asistente no está disponible en este momento: {str(e)}"
+        )
+    except LLMError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Error en la API de OpenRouter: {str(e)}"
         )
 
-        print(f"\n=== Respuesta de OpenRouter (Status: {resp.status_code}) ===")
-        print(resp.text)  # Mostrar la respuesta completa
-
-        if resp.status_code == 200:
-            result = resp.json()
-            # Verificar si el content está vacío pero hay reasoning
-            content = result["choices"][0]["message"]["content"]
-            if content == "" and "reasoning" in result["choices"][0]["message"] and result["choices"][0]["message"]["reasoning"]:
-                # Usar el campo reasoning como contenido de la respuesta
-                content = "Respuesta del asistente: " + result["choices"][0]["message"]["reasoning"]
-                print(f"\n=== Usando campo reasoning como respuesta: {content} ===")
-            return content
-        else:
-            raise HTTPException(
-                status_code=resp.status_code,
-                detail=f"Error en la API de OpenRouter: {resp.text}"
-            )
-
-    except Exception as e:
+    try:
+        message = result["choices"][0]["message"]
+    except (KeyError, IndexError, TypeError):
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Error inesperado en la comunicación con OpenRouter: {str(e)}"
+            detail="Error en la API de OpenRouter: respuesta sin 'choices'"
         )
+    content = message.get("content") or ""
+    # Verificar si el content está vacío pero hay reasoning
+    if content == "" and message.get("reasoning"):
+        # Usar el campo reasoning como contenido de la respuesta
+        content = "Respuesta del asistente: " + message["reasoning"]
+        print(f"\n=== Usando campo reasoning como respuesta: {content} ===")
+    return content
 
 # =================================================================
 # ====================== RUTA PARA CREAR/OBTENER CHAT =============
@@ -4,16 +4,13 @@ from typing import List, Optional, Dict
 from datetime import datetime
 import math
 import random
-import httpx
 import logging
 from pydantic import BaseModel, ValidationError
 import json
 import unicodedata
 import asyncio
-import subprocess
 import sys
 import os
-import traceback
 
 from database import db
 from schemas.fuel import (
@@ -25,8 +22,13 @@ from schemas.fuel import (
 )
 from models.fuel import FuelStation
 from routers.auth import get_current_user_data
+from utils.json_response import FastJSONRoute, ResponseSerializer
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+# Serializadores precompilados: cada estación se valida una sola vez
+STATION_LIST_SERIALIZER = ResponseSerializer(FuelStationList)
+STATION_SEARCH_SERIALIZER = ResponseSerializer(List[FuelStationResponse])
 
 # URL de la API del Ministerio
 MINISTERIO_API_URL = "https://sedeaplicaciones.minetur.gob.es/ServiciosRESTCarburantes/PreciosCarburantes/EstacionesTerrestres/"
@@ -141,6 +143,8 @@ def _save_data_backup(data):
 
 async def _fetch_with_curl():
     """Obtiene datos utilizando curl como sistema alternativo"""
+    import subprocess
+
     try:
         logger.info("Intentando obtener datos con curl")
         
@@ -209,8 +213,10 @@ async def _fetch_all_stations():
     try:
         logger.info("Obteniendo datos de la API del Ministerio")
         
-        # 2. Intentar con httpx
+        # 2. Intentar con httpx (se importa aquí para no cargarlo en el arranque)
         try:
+            import httpx
+
             # Configuración para HTTPX
             httpx_config = {
                 'timeout': httpx.Timeout(120.0, connect=60.0),
@@ -487,13 +493,12 @@ async def get_nearby_stations(
             params.fuel_type
         )
         try:
-            response_stations = [FuelStationResponse(**station_data) for station_data in nearby_stations_data]
+            return STATION_LIST_SERIALIZER.response({"stations": nearby_stations_data})
         except ValidationError as e:
              logger.error(f"Error de validación Pydantic en /nearby para estaciones: {e.json()}")
              problematic_ids = [s.get('id', 'N/A') for s in nearby_stations_data]
              logger.debug(f"IDs de estaciones cercanas que fallaron validación: {problematic_ids}")
              raise HTTPException(status_code=500, detail="Error interno al formatear estaciones cercanas")
-        return FuelStationList(stations=response_stations)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -608,13 +613,12 @@ async def get_favorite_stations(current_user: dict = Depends(get_current_user_da
         all_processed_stations = await _get_processed_stations(user_id)
         favorite_stations_data = [s for s in all_processed_stations if s.get("is_favorite", False)]
         try:
-             response_stations = [FuelStationResponse(**station_data) for station_data in favorite_stations_data]
+             return STATION_LIST_SERIALIZER.response({"stations": favorite_stations_data})
         except ValidationError as e:
              logger.error(f"Error de validación Pydantic en /favorites para estaciones: {e.json()}")
              problematic_ids = [s.get('id', 'N/A') for s in favorite_stations_data]
              logger.debug(f"IDs de estaciones favoritas que fallaron validación: {problematic_ids}")
              raise HTTPException(status_code=500, detail="Error interno al formatear estaciones favoritas")
-        return FuelStationList(stations=response_stations)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -735,14 +739,14 @@ async def search_stations(query: str, current_user: dict = Depends(get_current_u
                query_lower in s.get('brand', '').lower()
         ]
         try:
-             response_stations = [FuelStationResponse(**station_data) for station_data in matching_stations_data]
+             response = STATION_SEARCH_SERIALIZER.response(matching_stations_data)
         except ValidationError as e:
              logger.error(f"Error de validación Pydantic en /search/{query}: {e.json()}")
              problematic_ids = [s.get('id', 'N/A') for s in matching_stations_data]
              logger.debug(f"IDs de estaciones en búsqueda que fallaron validación: {problematic_ids}")
              raise HTTPException(status_code=500, detail="Error interno al formatear resultados de búsqueda")
-        logger.info(f"Búsqueda de '{query}': {len(response_stations)} resultados.")
-        return response_stations
+        logger.info(f"Búsqueda de '{query}': {len(matching_stations_data)} resultados.")
+        return response
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from database import db
+from utils.pool_metrics import pool_metrics
+from utils.command_metrics import route_query_metrics
+from auth.user_cache import user_cache
+from auth.password_pool import password_pool
+from auth.rate_limiter import auth_rate_limiter
+from auth.revocation import revocation_filter
+from utils.logo_resolver import logo_resolver
+from utils.pdf_pool import pdf_pool
+from utils.llm_client import llm_client
+from utils.maintenance_cache import maintenance_cache
+from utils.maintenance_jobs import maintenance_jobs
+from utils.json_response import FastJSONRoute
+
+router = APIRouter(route_class=FastJSONRoute)
+
+PING_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PING_TIMEOUT_SECONDS", 2))
+
+
+def require_internal_token(x_internal_token: Optional[str] = Header(None)) -> None:
+    """
+    Las métricas internas (estado de cachés, límites, circuitos y consultas) solo
+    se sirven con la cabecera X-Internal-Token igual a HEALTH_STATS_TOKEN. Sin
+    HEALTH_STATS_TOKEN configurada no se sirven.
+    """
+    expected = os.getenv("HEALTH_STATS_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Métricas internas deshabilitadas")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token.encode(), expected.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token interno inválido")
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Comprueba que la API puede atender peticiones haciendo ping a MongoDB.
+    Responde 503 si la base de datos no está disponible. Las métricas de los
+    componentes están en /health/stats.
+    """
+    ready = db.client is not None
+    if ready:
+        try:
+            await asyncio.wait_for(db.client.admin.command("ping"), timeout=PING_TIMEOUT_SECONDS)
+        except Exception:
+            ready = False
+
+    body = {
+        "status": "ready" if ready else "unavailable",
+        "database": {"status": "ok" if ready else "error"},
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
+@router.get("/stats", dependencies=[Depends(require_internal_token)])
+async def component_stats():
+    """Estado del pool de conexiones y de los componentes en memoria (requiere token interno)"""
+    database = {"status": "ok"}
+    if db.client is None:
+        database = {"status": "error", "detail": "Sin conexión a la base de datos"}
+    else:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.client.admin.command("ping"), timeout=PING_TIMEOUT_SECONDS)
+            database["ping_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        except Exception as e:
+            database = {"status": "error", "detail": f"Ping fallido: {type(e).__name__}"}
+
+    return {
+        "database": database,
+        "pool": pool_metrics.stats(),
+        "user_cache": user_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "rate_limiter": auth_rate_limiter.stats(),
+        "revocation": revocation_filter.stats(),
+        "logo_resolver": logo_resolver.stats(),
+        "pdf_pool": pdf_pool.stats(),
+        "llm": llm_client.stats(),
+        "maintenance_cache": maintenance_cache.stats(),
+        "maintenance_jobs": maintenance_jobs.stats(),
+    }
+
+
+@router.get("/queries", dependencies=[Depends(require_internal_token)])
+async def query_metrics():
+    """
+    Comandos de MongoDB por ruta: número por petición, tiempo en base de datos y
+    peticiones fuera de presupuesto (requiere token interno)
+    """
+    return {
+        "query_budget": route_query_metrics.query_budget,
+        "repeat_threshold": route_query_metrics.repeat_threshold,
+        "routes": route_query_metrics.stats(),
+    }
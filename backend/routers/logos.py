@@ -0,0 +1,58 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+
+from database import db
+from utils.json_response import FastJSONRoute
+from utils.logo_store import LOGO_CACHE_CONTROL, get_logo, is_logo_hash, resolve_variant
+
+router = APIRouter(route_class=FastJSONRoute)
+
+# Los logos son contenido subido por usuarios servido desde el origen de la API: el
+# navegador no debe adivinar el tipo ni ejecutar nada aunque se abran directamente
+LOGO_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; sandbox",
+}
+_RASTER_CONTENT_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110), como corresponde a GET"""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+@router.get("/{logo_hash}", response_class=Response)
+async def get_logo_image(
+    logo_hash: str,
+    request: Request,
+    size: Optional[int] = Query(None, ge=1, le=1024, description="Tamaño en px al que se va a pintar; devuelve la miniatura más cercana"),
+):
+    """
+    Devuelve un logo por su hash. El contenido es inmutable: se sirve con ETag fuerte
+    y Cache-Control de un año, y responde 304 si el cliente ya tiene esa versión.
+    Con size se sirve la miniatura WebP normalizada en lugar del original.
+    No requiere autenticación: son logos de marcas, compartidos por todos los usuarios.
+    """
+    logo_hash = await resolve_variant(db.db, logo_hash, size)
+    etag = f'"{logo_hash}"'
+    headers = {"ETag": etag, "Cache-Control": LOGO_CACHE_CONTROL, **LOGO_SECURITY_HEADERS}
+
+    # El hash identifica el contenido: si el cliente ya lo tiene no hace falta consultar la BD
+    if_none_match = request.headers.get("if-none-match")
+    if is_logo_hash(logo_hash) and if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    logo = await get_logo(db.db, logo_hash)
+    if not logo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Logo no encontrado"
+        )
+
+    # Los logos guardados antes de normalizarlos a PNG pueden no ser imágenes raster
+    content_type = logo.get("content_type")
+    if content_type not in _RASTER_CONTENT_TYPES:
+        content_type = "application/octet-stream"
+    return Response(content=logo["data"], media_type=content_type, headers=headers)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query
 from bson import ObjectId, errors as bson_errors
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -14,9 +14,18 @@ from schemas.trip import (
 )
 from routers.auth import get_current_user_data
 from models.trip import Trip, GpsPoint
+from utils.json_response import FastJSONRoute, ResponseSerializer
+from utils.projections import heavy_fields_projection, select_fields
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+# Serializador del listado sin validación: con muchos puntos GPS validar cada viaje
+# costaba más que leerlo de la base de datos
+TRIP_LIST_SERIALIZER = ResponseSerializer(List[TripResponse], trusted=True)
+
+# Campos que solo se leen de MongoDB si se piden (view=full o fields=)
+TRIP_HEAVY_FIELDS = ("gps_points",)
 
 # Función para obtener la hora actual en España (GMT+2)
 def get_spain_datetime():
@@ -110,9 +119,12 @@ async def create_trip(
 async def get_user_trips(
     vehicle_id: Optional[str] = None,
     limit: int = 20,
+    view: str = Query("full", description="'summary' omite los puntos GPS; 'full' los incluye"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (p. ej. id,start_time,distance_in_km)"),
     current_user: dict = Depends(get_current_user_data)
 ):
     """Obtener todos los viajes del usuario, opcionalmente filtrar por vehículo"""
+    selected = select_fields(view, fields, TripResponse.model_fields, TRIP_HEAVY_FIELDS)
     try:
         # Filtro base: usuario actual
         filter_query = {"user_id": ObjectId(current_user["id"])}
@@ -122,29 +134,34 @@ async def get_user_trips(
             filter_query["vehicle_id"] = ObjectId(vehicle_id)
         
         # Consultar viajes
-        trips_cursor = db.db.trips.find(filter_query).sort("start_time", -1).limit(limit)
+        trips_cursor = db.db.trips.find(
+            filter_query, heavy_fields_projection(selected, TRIP_HEAVY_FIELDS)
+        ).sort("start_time", -1).limit(limit)
         trips = await trips_cursor.to_list(length=limit)
         
-        # Transformar para respuesta
+        # Transformar para respuesta. Se serializa sin validar (TRIP_LIST_SERIALIZER es
+        # de confianza), así que cada campo se convierte aquí al tipo de TripResponse;
+        # los puntos GPS se guardan siempre con latitude/longitude/timestamp ya validados
         result = []
         for trip in trips:
-            result.append({
+            formatted_trip = {
                 "id": str(trip["_id"]),
                 "user_id": str(trip["user_id"]),
                 "vehicle_id": str(trip["vehicle_id"]),
                 "start_time": trip["start_time"],
                 "end_time": trip.get("end_time"),
-                "distance_in_km": trip["distance_in_km"],
-                "fuel_consumption_liters": trip["fuel_consumption_liters"],
-                "average_speed_kmh": trip["average_speed_kmh"],
-                "duration_seconds": trip["duration_seconds"],
-                "is_active": trip["is_active"],
+                "distance_in_km": float(trip["distance_in_km"]),
+                "fuel_consumption_liters": float(trip["fuel_consumption_liters"]),
+                "average_speed_kmh": float(trip["average_speed_kmh"]),
+                "duration_seconds": int(trip["duration_seconds"]),
+                "is_active": bool(trip["is_active"]),
                 "gps_points": trip.get("gps_points", []),
                 "created_at": trip["created_at"],
                 "updated_at": trip["updated_at"]
-            })
+            }
+            result.append({field: value for field, value in formatted_trip.items() if field in selected})
         
-        return result
+        return TRIP_LIST_SERIALIZER.response(result)
         
     except Exception as e:
         raise HTTPException(
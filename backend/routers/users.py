@@ -6,8 +6,11 @@ from database import db
 from schemas.user import UserResponse, UserUpdate
 from routers.auth import get_current_user_data
 from models.user import User
+from auth.user_cache import user_cache
+from auth.token_epochs import token_epochs
+from utils.json_response import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(current_user: dict = Depends(get_current_user_data)):
@@ -73,6 +76,11 @@ async def update_user(
         {"_id": user_object_id_from_path},
         {"$set": update_data}
     )
+    user_cache.invalidate_user(user_id)
+
+    # Un cambio de email invalida los tokens emitidos con el email anterior
+    if "email" in update_data and update_data["email"] != current_user.get("email"):
+        await token_epochs.bump(db.db, user_id)
     
     if result.modified_count == 0:
         existing_user = await db.db.users.find_one({"_id": user_object_id_from_path})
@@ -1,19 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Response
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Response, Query, Request, BackgroundTasks
 from bson import ObjectId
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
-from gridfs import GridFS
-from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 from fastapi.responses import Response
 from pydantic import ValidationError
 import logging
 
-import pymupdf as fitz
-import os
-import requests
-import json
-import re
-from config.llm_config import SYSTEM_PROMPT
 from database import db
 from schemas.vehicle import (
     VehicleCreate, 
@@ -26,13 +18,50 @@ from schemas.vehicle import (
 )
 from routers.auth import get_current_user_data
 from models.vehicle import Vehicle, MaintenanceRecord
-from utils.car_logo_scraper import get_car_logo
-from deep_translator import GoogleTranslator
-import time
+from utils.logo_resolver import logo_resolver
+from utils.maintenance_ai import ManualExtractionError, analyze_manual
+from utils.maintenance_jobs import maintenance_jobs
+from utils.gridfs_streaming import gridfs_response
+from utils.manual_store import release_manual, store_manual
+from utils.manual_text import manual_text_key, prefetch_manual_text
+from utils.json_response import FastJSONRoute, ResponseSerializer
+from utils.projections import heavy_fields_projection, select_fields
+from utils.logo_store import logo_url, logos_as_base64, save_base64_logo
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+# Serializador precompilado del listado: los vehículos se validan una sola vez
+VEHICLE_LIST_SERIALIZER = ResponseSerializer(List[VehicleResponse])
+
+# Campos que solo se leen de MongoDB si se piden (view=full o fields=)
+VEHICLE_HEAVY_FIELDS = ("logo",)
+
+
+def _logo_fields(vehicle: dict, logos: dict) -> dict:
+    """
+    Campos de logo de la respuesta. 'logo' (base64) sale de la colección logos; los
+    vehículos aún sin migrar lo tienen en línea.
+    """
+    digest = vehicle.get("logo_hash")
+    return {
+        "logo": logos.get(digest) if digest else vehicle.get("logo"),
+        "logo_hash": digest,
+        "logo_url": logo_url(digest),
+    }
+
+
+async def _release_previous_manual(fs, vehicle: dict) -> None:
+    """Suelta la referencia al manual que tenía el vehículo antes de sustituirlo"""
+    previous_file_id = vehicle.get("pdf_manual_grid_fs_id")
+    if not previous_file_id:
+        return
+    try:
+        await release_manual(db.db, fs, previous_file_id)
+    except Exception as e:
+        # El vehículo ya apunta al nuevo manual; el anterior queda huérfano
+        logger.warning(f"No se pudo liberar el manual anterior {previous_file_id}: {e}")
 
 @router.post("", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
 async def create_vehicle(
@@ -61,9 +90,9 @@ async def create_vehicle(
     model_sanitized = vehicle_data.model.strip()
     
     try:
-        logo = None
+        logo_hash = None
         try:
-            logo = get_car_logo(brand_sanitized)
+            logo_hash = await logo_resolver.resolve(db.db, brand_sanitized)
         except Exception as e:
             logger.warning(f"Error al obtener el logo para {brand_sanitized}: {str(e)}")
         
@@ -77,9 +106,9 @@ async def create_vehicle(
             current_kilometers=vehicle_data.current_kilometers
         )
         
-        # Convertir a diccionario y AÑADIR el logo
+        # Convertir a diccionario y AÑADIR el hash del logo (la imagen vive en la colección logos)
         vehicle_dict = new_vehicle.model_dump() if hasattr(new_vehicle, 'model_dump') else new_vehicle.__dict__
-        vehicle_dict["logo"] = logo # Añadir/sobrescribir logo aquí
+        vehicle_dict["logo_hash"] = logo_hash
         
         vehicle_dict["maintenance_records"] = [] 
         vehicle_dict["pdf_manual_grid_fs_id"] = None
@@ -96,7 +125,12 @@ async def create_vehicle(
         # Usar **created_vehicle para poblar el modelo de respuesta
         # Esto es más robusto si VehicleResponse tiene los campos adecuados
         try:
-            response_data = VehicleResponse(**{**created_vehicle, "id": str(created_vehicle["_id"]), "userId": str(created_vehicle["user_id"])})
+            response_data = VehicleResponse(**{
+                **created_vehicle,
+                **_logo_fields(created_vehicle, await logos_as_base64(db.db, [logo_hash])),
+                "id": str(created_vehicle["_id"]),
+                "userId": str(created_vehicle["user_id"]),
+            })
         except ValidationError as val_err:
             logger.error(f"Error al validar VehicleResponse: {val_err}")
             raise HTTPException(status_code=500, detail="Error al formatear la respuesta del vehículo creado")
@@ -117,9 +151,20 @@ async def create_vehicle(
         )
 
 @router.get("", response_model=List[VehicleResponse])
-async def get_user_vehicles(current_user: dict = Depends(get_current_user_data)):
+async def get_user_vehicles(
+    view: str = Query("full", description="'summary' omite el logo en base64; 'full' lo incluye"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (p. ej. id,brand,model)"),
+    current_user: dict = Depends(get_current_user_data)
+):
     """Obtener todos los vehículos del usuario"""
-    vehicles = await db.db.vehicles.find({"user_id": ObjectId(current_user["id"])}).to_list(None)
+    selected = select_fields(view, fields, VehicleResponse.model_fields, VEHICLE_HEAVY_FIELDS)
+    vehicles = await db.db.vehicles.find(
+        {"user_id": ObjectId(current_user["id"])},
+        heavy_fields_projection(selected, VEHICLE_HEAVY_FIELDS)
+    ).to_list(None)
+    
+    # Los logos en base64 solo se cargan si se piden, en una única consulta
+    logos = await logos_as_base64(db.db, (v.get("logo_hash") for v in vehicles)) if "logo" in selected else {}
     
     # Formatear los vehículos para la respuesta
     formatted_vehicles = []
@@ -134,7 +179,7 @@ async def get_user_vehicles(current_user: dict = Depends(get_current_user_data))
             "current_kilometers": vehicle.get("current_kilometers", 0.0),
             "maintenance_records": [],
             "pdf_manual_grid_fs_id": str(vehicle["pdf_manual_grid_fs_id"]) if vehicle.get("pdf_manual_grid_fs_id") else None,
-            "logo": vehicle.get("logo"),  # Incluir el logo si existe
+            **_logo_fields(vehicle, logos),
             "last_itv_date": vehicle.get("last_itv_date"),  # Incluir fecha de última ITV
             "next_itv_date": vehicle.get("next_itv_date"),  # Incluir fecha de próxima ITV
             "created_at": vehicle["created_at"],
@@ -159,11 +204,12 @@ async def get_user_vehicles(current_user: dict = Depends(get_current_user_data))
         
         formatted_vehicles.append(formatted_vehicle)
     
-    return formatted_vehicles
+    return VEHICLE_LIST_SERIALIZER.response(formatted_vehicles, include={"__all__": selected})
 
 @router.post("/{vehicle_id}/manual", status_code=status.HTTP_201_CREATED)
 async def upload_vehicle_manual(
     vehicle_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user_data)
 ):
@@ -186,25 +232,13 @@ async def upload_vehicle_manual(
         )
     
     # Crear GridFS bucket
-    fs = AsyncIOMotorGridFSBucket(db.db)
-    
-    # Si ya existe un manual, eliminarlo
-    if "pdf_manual_grid_fs_id" in vehicle:
-        try:
-            await fs.delete(ObjectId(vehicle["pdf_manual_grid_fs_id"]))
-        except Exception:
-            pass
+    fs = db.gridfs_bucket()
     
+    manual = None
     try:
-        # Leer el contenido del archivo
-        contents = await file.read()
-        
-        # Subir nuevo archivo
-        file_id = await fs.upload_from_stream(
-            file.filename,
-            contents,
-            metadata={"vehicle_id": vehicle_id}
-        )
+        # Los PDF idénticos se guardan una sola vez: si ya existe no se vuelve a subir
+        manual = await store_manual(db.db, fs, file, file.filename)
+        file_id = manual["file_id"]
         
         # Actualizar referencia en el vehículo
         result = await db.db.vehicles.update_one(
@@ -212,41 +246,39 @@ async def upload_vehicle_manual(
             {
                 "$set": {
                     "pdf_manual_grid_fs_id": str(file_id),
+                    "pdf_manual_hash": manual["_id"],
                     "updated_at": datetime.utcnow()
                 }
             }
         )
         
         if result.modified_count == 0:
-            # Si no se pudo actualizar el vehículo, eliminar el archivo subido
-            await fs.delete(file_id)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="No se pudo actualizar el vehículo con el nuevo manual"
             )
         
-        # Verificar que el archivo se guardó correctamente
-        vehicle_updated = await db.db.vehicles.find_one({"_id": ObjectId(vehicle_id)})
-        if not vehicle_updated or "pdf_manual_grid_fs_id" not in vehicle_updated:
-            await fs.delete(file_id)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al guardar la referencia del manual"
-            )
-        
-        return {"message": "Manual subido correctamente", "pdf_manual_grid_fs_id": str(file_id)}
-        
     except Exception as e:
-        # Si ocurre algún error, intentar limpiar el archivo si se subió
-        if 'file_id' in locals():
+        # Si ocurre algún error, soltar la referencia al manual si se llegó a guardar
+        if manual is not None:
             try:
-                await fs.delete(file_id)
+                await release_manual(db.db, fs, manual["file_id"])
             except Exception:
                 pass
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al subir el manual: {str(e)}"
         )
+    
+    # El manual anterior se suelta al final por si era el mismo PDF
+    await _release_previous_manual(fs, vehicle)
+    
+    # El texto se extrae ya, tras responder, para que el análisis empiece desde él
+    background_tasks.add_task(prefetch_manual_text, db.db, fs, manual["_id"], file_id)
+    
+    return {"message": "Manual subido correctamente", "pdf_manual_grid_fs_id": str(file_id)}
 
 @router.post("/{vehicle_id}/maintenance", response_model=MaintenanceRecordResponse, status_code=status.HTTP_201_CREATED)
 async def add_maintenance_record(
@@ -356,7 +388,7 @@ async def get_vehicle(
         "current_kilometers": vehicle.get("current_kilometers", 0.0),
         "maintenance_records": maintenance_records,
         "pdf_manual_grid_fs_id": str(vehicle["pdf_manual_grid_fs_id"]) if vehicle.get("pdf_manual_grid_fs_id") else None,
-        "logo": vehicle.get("logo"),
+        **_logo_fields(vehicle, await logos_as_base64(db.db, [vehicle.get("logo_hash")])),
         "last_itv_date": vehicle.get("last_itv_date"),
         "next_itv_date": vehicle.get("next_itv_date"),
         "created_at": vehicle["created_at"],
@@ -396,10 +428,14 @@ async def update_vehicle(
         
         # Si la marca cambia, actualizar el logo
         if vehicle_update.brand != vehicle["brand"]:
-            # Obtener el nuevo logo
-            new_logo = get_car_logo(vehicle_update.brand)
-            if new_logo:
-                update_data["logo"] = new_logo
+            # Obtener el nuevo logo (sin logo, la marca se cambia igualmente)
+            new_logo_hash = None
+            try:
+                new_logo_hash = await logo_resolver.resolve(db.db, vehicle_update.brand)
+            except Exception as e:
+                logger.warning(f"Error al obtener el logo para {vehicle_update.brand}: {str(e)}")
+            if new_logo_hash:
+                update_data["logo_hash"] = new_logo_hash
     
     if vehicle_update.model is not None:
         update_data["model"] = vehicle_update.model
@@ -429,16 +465,26 @@ async def update_vehicle(
     
     # Si se proporcionó el logo manualmente, actualizarlo
     if vehicle_update.logo is not None:
-        update_data["logo"] = vehicle_update.logo
+        manual_logo_hash = await save_base64_logo(db.db, vehicle_update.logo)
+        if not manual_logo_hash:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El logo debe ser una imagen PNG, JPEG, GIF o WebP en base64"
+            )
+        update_data["logo_hash"] = manual_logo_hash
     
     if update_data:
         # Actualizar también la fecha de última actualización
         update_data["updated_at"] = datetime.utcnow()
         
         # Actualizar el vehículo
+        update = {"$set": update_data}
+        if "logo_hash" in update_data and "logo" in vehicle:
+            # El logo en línea de un vehículo sin migrar queda sustituido por el hash
+            update["$unset"] = {"logo": ""}
         result = await db.db.vehicles.update_one(
             {"_id": ObjectId(vehicle_id)},
-            {"$set": update_data}
+            update
         )
         
         if result.modified_count == 0:
@@ -475,7 +521,7 @@ async def update_vehicle(
         "current_kilometers": updated_vehicle.get("current_kilometers", 0.0),
         "maintenance_records": maintenance_records,
         "pdf_manual_grid_fs_id": updated_vehicle.get("pdf_manual_grid_fs_id"),
-        "logo": updated_vehicle.get("logo"),
+        **_logo_fields(updated_vehicle, await logos_as_base64(db.db, [updated_vehicle.get("logo_hash")])),
         "last_itv_date": updated_vehicle.get("last_itv_date"),
         "next_itv_date": updated_vehicle.get("next_itv_date"),
         "created_at": updated_vehicle["created_at"],
@@ -499,11 +545,11 @@ async def delete_vehicle(
             detail="Vehículo no encontrado"
         )
     
-    # Si tiene manual PDF, eliminarlo de GridFS
+    # Si tiene manual PDF, soltar su referencia (se borra de GridFS si era la última)
     if "pdf_manual_grid_fs_id" in vehicle:
-        fs = AsyncIOMotorGridFSBucket(db.db)
+        fs = db.gridfs_bucket()
         try:
-            await fs.delete(ObjectId(vehicle["pdf_manual_grid_fs_id"]))
+            await release_manual(db.db, fs, vehicle["pdf_manual_grid_fs_id"])
         except Exception:
             pass
     
@@ -518,9 +564,13 @@ async def delete_vehicle(
 @router.get("/{vehicle_id}/manual", response_class=Response)
 async def get_vehicle_manual(
     vehicle_id: str,
+    request: Request,
     current_user: dict = Depends(get_current_user_data)
 ):
-    """Obtener manual del vehículo en PDF"""
+    """
+    Obtener manual del vehículo en PDF. Se envía en streaming desde GridFS y admite
+    Range (descarga por partes o reanudación) e If-None-Match.
+    """
     vehicle = await db.db.vehicles.find_one({
         "_id": ObjectId(vehicle_id),
         "user_id": ObjectId(current_user["id"])
@@ -532,14 +582,12 @@ async def get_vehicle_manual(
             detail="Manual no encontrado"
         )
     
-    fs = AsyncIOMotorGridFSBucket(db.db)
+    fs = db.gridfs_bucket()
     try:
         file_data = await fs.open_download_stream(ObjectId(vehicle["pdf_manual_grid_fs_id"]))
-        contents = await file_data.read()
-        return Response(
-            content=contents,
-            media_type="application/pdf"
-        )
+        return gridfs_response(file_data, request, media_type="application/pdf")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -744,15 +792,15 @@ async def delete_manual(
                 detail="No se encontró un manual para este vehículo"
             )
 
-        # Eliminar el archivo de GridFS
-        fs = AsyncIOMotorGridFSBucket(db.db)
-        await fs.delete(ObjectId(vehicle["pdf_manual_grid_fs_id"]))
+        # Soltar la referencia: el fichero solo se borra si ningún otro vehículo lo usa
+        fs = db.gridfs_bucket()
+        await release_manual(db.db, fs, vehicle["pdf_manual_grid_fs_id"])
 
         # Actualizar el documento del vehículo
         result = await db.db.vehicles.update_one(
             {"_id": ObjectId(vehicle_id)},
             {
-                "$unset": {"pdf_manual_grid_fs_id": ""},
+                "$unset": {"pdf_manual_grid_fs_id": "", "pdf_manual_hash": ""},
                 "$set": {"updated_at": datetime.utcnow()}
             }
         )
@@ -772,6 +820,7 @@ async def delete_manual(
 @router.post("/{vehicle_id}/manual/update", status_code=status.HTTP_200_OK)
 async def update_manual(
     vehicle_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user_data)
 ):
@@ -796,45 +845,36 @@ async def update_manual(
                 detail="El archivo debe ser un PDF"
             )
 
-        # Leer el contenido del archivo
-        contents = await file.read()
-
-        # Si existe un manual previo, eliminarlo
-        if "pdf_manual_grid_fs_id" in vehicle:
-            fs = AsyncIOMotorGridFSBucket(db.db)
-            try:
-                await fs.delete(ObjectId(vehicle["pdf_manual_grid_fs_id"]))
-            except Exception:
-                # Si falla la eliminación del archivo anterior, continuamos
-                pass
-
-        # Guardar el nuevo archivo en GridFS
-        fs = AsyncIOMotorGridFSBucket(db.db)
-        grid_fs_file_id = await fs.upload_from_stream(
-            file.filename,
-            contents,
-            metadata={"vehicle_id": vehicle_id}
-        )
+        # Guardar el nuevo archivo (una sola copia por contenido)
+        fs = db.gridfs_bucket()
+        manual = await store_manual(db.db, fs, file, file.filename)
 
         # Actualizar el documento del vehículo con el nuevo ID del archivo
         result = await db.db.vehicles.update_one(
             {"_id": ObjectId(vehicle_id)},
             {
                 "$set": {
-                    "pdf_manual_grid_fs_id": str(grid_fs_file_id),
+                    "pdf_manual_grid_fs_id": str(manual["file_id"]),
+                    "pdf_manual_hash": manual["_id"],
                     "updated_at": datetime.utcnow()
                 }
             }
         )
 
         if result.modified_count == 0:
-            # Si no se pudo actualizar el vehículo, eliminar el archivo subido
-            await fs.delete(grid_fs_file_id)
+            # Si no se pudo actualizar el vehículo, soltar la referencia al nuevo manual
+            await release_manual(db.db, fs, manual["file_id"])
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="No se pudo actualizar el vehículo"
             )
 
+        # Si existía un manual previo, soltar su referencia
+        await _release_previous_manual(fs, vehicle)
+
+        # Extraer el texto del nuevo manual tras responder
+        background_tasks.add_task(prefetch_manual_text, db.db, fs, manual["_id"], manual["file_id"])
+
         return {"message": "Manual actualizado correctamente"}
 
     except HTTPException:
@@ -845,214 +885,43 @@ async def update_manual(
             detail=f"Error al actualizar el manual: {str(e)}"
         )
 
-def build_openrouter_headers():
-    return {
-        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-        "HTTP-Referer": os.getenv('HTTP_REFERER'),
-        "X-Title": os.getenv('X_TITLE'),
-        "Content-Type": "application/json",
-    }
-
-def _is_maintenance_section_header(text: str) -> bool:
-    """Detecta si una línea es un encabezado de sección de mantenimiento"""
-    keywords = [
-        'programa de mantenimiento', 'maintenance schedule',
-        'tabla de mantenimiento', 'maintenance chart',
-        'mantenimiento periódico', 'periodic maintenance',
-        'intervalos de servicio', 'service intervals',
-        'plan de mantenimiento', 'maintenance plan'
-    ]
-    
-    text_lower = text.lower()
-    return any(keyword in text_lower for keyword in keywords)
-
-def _is_maintenance_related(text: str) -> bool:
-    """Determina si una línea de texto está relacionada con mantenimiento"""
-    keywords = [
-        # Términos generales de mantenimiento
-        'mantenimiento', 'maintenance', 'servicio', 'service',
-        'revisión', 'inspection', 'inspección', 'check',
-        'intervalo', 'interval', 'periódico', 'periodic',
-        'programa', 'schedule', 'tabla', 'chart',
-        
-        # Componentes específicos
-        'aceite', 'oil', 'filtro', 'filter', 'frenos', 'brake',
-        'neumáticos', 'tires', 'batería', 'battery',
-        'correa', 'belt', 'líquido', 'fluid',
-        'bujía', 'spark plug', 'embrague', 'clutch',
-        'válvula', 'valve', 'cadena', 'chain',
-        'tubo de escape', 'exhaust', 'silenciador', 'muffler',
-        'dirección', 'steering', 'suspensión', 'suspension',
-        'chasis', 'chassis', 'tuercas', 'nuts', 'tornillos', 'bolts',
-        'horquilla', 'fork',
-        
-        # Intervalos y medidas
-        'cada', 'every', 'km', 'kilómetros', 'kilometers',
-        'meses', 'months', 'años', 'years',
-        
-        # Acciones de mantenimiento
-        'cambiar', 'change', 'reemplazar', 'replace',
-        'ajustar', 'adjust', 'lubricar', 'lubricate',
-        'limpiar', 'clean', 'apretar', 'tighten',
-        'inspeccionar', 'inspect', 'comprobar', 'check'
-    ]
-    
-    # Patrones numéricos seguidos de km o similares
-    number_patterns = [
-        r'\d+\s*(?:km|kilómetros|kilometers|miles)',
-        r'cada\s+\d+',
-        r'every\s+\d+',
-        r'\d+\s*000\s*km',
-        r'\d+\s*(?:meses|months|años|years)'
-    ]
-    
-    text_lower = text.lower()
-    
-    # Verificar palabras clave
-    if any(keyword in text_lower for keyword in keywords):
-        return True
-        
-    # Verificar patrones numéricos
-    if any(re.search(pattern, text_lower) for pattern in number_patterns):
-        return True
-        
-    return False
-
-def _extract_maintenance_sections(text: str) -> str:
-    """Extrae solo las secciones relacionadas con mantenimiento"""
-    lines = text.split('\n')
-    maintenance_lines = []
-    in_maintenance_section = False
-    section_content = []
-    context_lines = []  # Para mantener algunas líneas de contexto
-    
-    print("\nBuscando secciones de mantenimiento...")
-    
-    for i, line in enumerate(lines):
-        current_line = line.strip()
-        
-        # Si la línea está vacía, mantenerla como separador
-        if not current_line:
-            if section_content:
-                section_content.append("")
-            continue
-            
-        # Si encontramos un encabezado de sección de mantenimiento
-        if _is_maintenance_section_header(current_line):
-            print(f"Encontrada sección de mantenimiento en línea {i+1}: {current_line[:50]}...")
-            in_maintenance_section = True
-            if context_lines:  # Incluir líneas de contexto previas
-                section_content.extend(context_lines)
-            section_content = [current_line]
-            context_lines = []
-            continue
-            
-        # Si estamos en una sección de mantenimiento
-        if in_maintenance_section:
-            # Si la línea tiene contenido relacionado con mantenimiento o es una tabla
-            if _is_maintenance_related(current_line) or re.search(r'[|\t]', current_line):
-                section_content.append(current_line)
-            # Si encontramos una línea que parece ser un nuevo encabezado no relacionado
-            elif current_line.isupper() and len(current_line.split()) > 3:
-                if section_content:
-                    maintenance_lines.extend(section_content)
-                    section_content = []
-                in_maintenance_section = False
-            # Si la línea parece ser parte del contenido actual
-            else:
-                section_content.append(current_line)
-        # Si no estamos en una sección pero la línea tiene información de mantenimiento
-        elif _is_maintenance_related(current_line):
-            print(f"Encontrada línea de mantenimiento fuera de sección en línea {i+1}: {current_line[:50]}...")
-            maintenance_lines.append(current_line)
-        else:
-            # Mantener algunas líneas de contexto
-            context_lines.append(current_line)
-            if len(context_lines) > 3:  # Mantener solo las últimas 3 líneas de contexto
-                context_lines.pop(0)
-    
-    # Añadir la última sección si existe
-    if section_content:
-        maintenance_lines.extend(section_content)
-    
-    result = '\n'.join(maintenance_lines)
-    print(f"\nEncontradas {len(maintenance_lines)} líneas relacionadas con mantenimiento")
-    return result
+async def _vehicle_with_manual(vehicle_id: str, current_user: dict) -> dict:
+    """Vehículo del usuario con manual PDF, o 404"""
+    # Verificar que el vehículo existe y pertenece al usuario
+    vehicle = await db.db.vehicles.find_one({
+        "_id": ObjectId(vehicle_id),
+        "user_id": ObjectId(current_user["id"])
+    })
 
-def _clean_json_string(text: str) -> str:
-    """Limpia una cadena JSON malformada"""
-    # Eliminar caracteres de escape innecesarios
-    text = text.replace('\\\"', '"')
-    text = text.replace('\\"', '"')
-    
-    # Eliminar comillas simples si existen
-    text = text.replace("'", '"')
-    
-    # Eliminar espacios en blanco en nombres de propiedades
-    text = re.sub(r'"(\w+)\s*":', r'"\1":', text)
-    
-    # Corregir espacios en valores numéricos
-    text = re.sub(r':\s*(\d+)\s*,', r': \1,', text)
-    
-    # Eliminar caracteres no válidos
-    text = re.sub(r'[^\x20-\x7E]', '', text)
-    
-    return text
+    if not vehicle:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehículo no encontrado"
+        )
 
-def _call_openrouter_with_retry(data: dict, max_retries: int = 3) -> dict:
-    """Llama a OpenRouter con reintentos"""
-    headers = build_openrouter_headers()
-    attempt = 0
-    last_error = None
-    
-    while attempt < max_retries:
-        try:
-            print(f"\nIntento {attempt + 1} de {max_retries}...")
-            response = requests.post(
-                os.getenv('OPENROUTER_URL'),
-                headers=headers,
-                json=data,
-                timeout=90  # Aumentar el timeout a 90 segundos
-            )
-            
-            # Verificar si hay error en la respuesta
-            result = response.json()
-            if "error" in result:
-                error_msg = result["error"].get("message", "Error desconocido de OpenRouter")
-                print(f"Error de OpenRouter: {error_msg}")
-                last_error = error_msg
-                # Si es un error de timeout o del proveedor, reintentar
-                if result["error"].get("code") in [524, 500, 502, 503, 504]:
-                    attempt += 1
-                    if attempt < max_retries:
-                        print("Reintentando en 5 segundos...")
-                        time.sleep(5)
-                        continue
-                else:
-                    # Si es otro tipo de error, fallar inmediatamente
-                    raise Exception(error_msg)
-            else:
-                return result
-                
-        except requests.exceptions.Timeout:
-            print("Timeout en la solicitud")
-            last_error = "Timeout en la solicitud"
-            attempt += 1
-            if attempt < max_retries:
-                print("Reintentando en 5 segundos...")
-                time.sleep(5)
-                continue
-        except Exception as e:
-            print(f"Error inesperado: {str(e)}")
-            last_error = str(e)
-            attempt += 1
-            if attempt < max_retries:
-                print("Reintentando en 5 segundos...")
-                time.sleep(5)
-                continue
-    
-    # Si llegamos aquí, todos los intentos fallaron
-    raise Exception(f"Todos los intentos fallaron. Último error: {last_error}")
+    # Verificar que el vehículo tiene un manual PDF
+    if not vehicle.get("pdf_manual_grid_fs_id"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontró el manual del vehículo"
+        )
+    return vehicle
+
+def _job_response(vehicle_id: str, job: dict) -> dict:
+    response = {
+        "jobId": str(job["_id"]),
+        "vehicleId": vehicle_id,
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == "completed":
+        response.update(job["result"])
+    elif job.get("error"):
+        response["error"] = job["error"]
+    return response
 
 @router.post("/{vehicle_id}/maintenance-ai")
 async def analyze_maintenance_pdf(
@@ -1060,175 +929,22 @@ async def analyze_maintenance_pdf(
     current_user: dict = Depends(get_current_user_data)
 ):
     try:
-        # Verificar que el vehículo existe y pertenece al usuario
-        vehicle = await db.db.vehicles.find_one({
-            "_id": ObjectId(vehicle_id),
-            "user_id": ObjectId(current_user["id"])
-        })
-        
-        if not vehicle:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Vehículo no encontrado"
-            )
-
-        # Verificar que el vehículo tiene un manual PDF
-        if not vehicle.get("pdf_manual_grid_fs_id"):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No se encontró el manual del vehículo"
-            )
-
+        vehicle = await _vehicle_with_manual(vehicle_id, current_user)
         print("Vehículo y manual verificados")
 
-        # Recuperar y procesar el PDF
+        # Texto del manual: se extrae al subirlo y se guarda, así que normalmente
+        # no hace falta descargar ni procesar el PDF
         try:
-            fs = AsyncIOMotorGridFSBucket(db.db)
-            file_data = await fs.open_download_stream(ObjectId(vehicle["pdf_manual_grid_fs_id"]))
-            pdf_bytes = await file_data.read()
-            print("PDF recuperado de GridFS")
-        except Exception as e:
-            print("Error al recuperar el PDF:", str(e))
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error al recuperar el PDF: {str(e)}"
+            result = await analyze_manual(
+                db.db, db.gridfs_bucket(), manual_text_key(vehicle), vehicle["pdf_manual_grid_fs_id"]
             )
-
-        # Extraer y limpiar texto del PDF
-        try:
-            extracted_text = ""
-            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                print(f"Procesando PDF de {len(doc)} páginas")
-                for page in doc:
-                    extracted_text += page.get_text() + "\n"
-            print("Texto extraído del PDF")
-        except Exception as e:
+        except ManualExtractionError as e:
             print("Error al extraer texto del PDF:", str(e))
             raise HTTPException(
                 status_code=500,
                 detail=f"Error al extraer texto del PDF: {str(e)}"
             )
-        
-        # Limpiar el texto
-        cleaned_text = _extract_maintenance_sections(extracted_text)
-
-        # Configurar la solicitud a OpenRouter
-        print("\nPreparando solicitud a OpenRouter")
-        data = {
-            "model": os.getenv('OPENROUTER_MODEL'),
-            "messages": [
-                {
-                    "role": "system",
-                    "content": (
-                        "Eres un experto en mantenimiento de vehículos. "
-                        "DEBES responder ÚNICAMENTE con un array JSON que contenga los mantenimientos con intervalos en kilómetros. "
-                        "NO incluyas explicaciones adicionales ni texto fuera del JSON. "
-                        "Formato OBLIGATORIO: [{\"type\": \"tipo de mantenimiento\", \"recommended_interval_km\": numero, \"notes\": \"notas adicionales\"}]. "
-                        "Reglas ESTRICTAS:\n"
-                        "1. SOLO devuelve el array JSON, nada más\n"
-                        "2. El campo type debe estar en español\n"
-                        "3. recommended_interval_km debe ser un número entero\n"
-                        "4. El campo notes debe ser un string con información relevante\n"
-                        "5. Si no hay intervalos en km, devuelve []\n"
-                        "6. NO uses comillas simples, SOLO dobles\n"
-                        "7. NO incluyas espacios entre los dos puntos\n"
-                        "Ejemplo correcto: [{\"type\":\"cambio de aceite\",\"recommended_interval_km\":10000,\"notes\":\"Cambiar el aceite del motor y el filtro\"}]"
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae y devuelve SOLO el array JSON con los mantenimientos que tienen intervalos en kilómetros:\n\n{cleaned_text}"
-                }
-            ],
-            "temperature": 0.1,
-            "top_p": 0.9,
-            "frequency_penalty": 0.0,
-            "presence_penalty": 0.0
-        }
-
-        # Llamar a OpenRouter con reintentos
-        try:
-            result = _call_openrouter_with_retry(data)
-            print("\nRespuesta de OpenRouter:")
-            print(result)
-        except Exception as e:
-            print(f"Error final en OpenRouter: {str(e)}")
-            return {
-                "vehicleId": vehicle_id,
-                "maintenance_recommendations": [],
-                "error": str(e)
-            }
-
-        # Procesar la respuesta
-        try:
-            if "choices" not in result or not result["choices"]:
-                print("Respuesta no contiene 'choices' o está vacía")
-                return {
-                    "vehicleId": vehicle_id,
-                    "maintenance_recommendations": [],
-                    "error": "Formato de respuesta inválido"
-                }
-            
-            # Obtener el contenido de la respuesta
-            content = result["choices"][0]["message"].get("content", "").strip()
-            print("\nContenido de la respuesta:")
-            print(content)
-            
-            # Intentar encontrar el JSON en la respuesta
-            try:
-                # Primero intentar parsear directamente
-                ai_response = json.loads(content)
-            except json.JSONDecodeError:
-                # Si falla, buscar el array JSON usando regex
-                json_match = re.search(r'\[(.*?)\]', content, re.DOTALL)
-                if json_match:
-                    json_str = f"[{json_match.group(1)}]"
-                    cleaned_json = _clean_json_string(json_str)
-                    print("\nJSON encontrado y limpiado:")
-                    print(cleaned_json)
-                    try:
-                        ai_response = json.loads(cleaned_json)
-                    except json.JSONDecodeError as e:
-                        print(f"Error al parsear JSON limpio: {str(e)}")
-                        ai_response = []
-                else:
-                    print("No se encontró JSON en la respuesta")
-                    ai_response = []
-            
-            # Verificar y limpiar la respuesta
-            cleaned_response = []
-            for item in ai_response:
-                if isinstance(item, dict) and "type" in item and "recommended_interval_km" in item:
-                    try:
-                        interval = int(float(str(item["recommended_interval_km"]).replace(',', '')))
-                        # Capitalizar la primera letra del tipo de mantenimiento
-                        maintenance_type = item["type"].strip()
-                        maintenance_type = maintenance_type[0].upper() + maintenance_type[1:] if maintenance_type else ""
-                        
-                        cleaned_response.append({
-                            "type": maintenance_type,
-                            "recommended_interval_km": interval,
-                            "notes": item.get("notes", "").strip()  # Incluir las notas si existen
-                        })
-                    except (ValueError, TypeError):
-                        print(f"Valor inválido para recommended_interval_km: {item['recommended_interval_km']}")
-                        continue
-            
-            print("\nRespuesta final procesada:")
-            print(json.dumps(cleaned_response, indent=2, ensure_ascii=False))
-            
-            return {
-                "vehicleId": vehicle_id,
-                "maintenance_recommendations": cleaned_response
-            }
-            
-        except Exception as e:
-            print("Error al procesar la respuesta:", str(e))
-            return {
-                "vehicleId": vehicle_id,
-                "maintenance_recommendations": [],
-                "error": f"Error al procesar la respuesta: {str(e)}"
-            }
+        return {"vehicleId": vehicle_id, **result}
 
     except HTTPException:
         raise
@@ -1240,6 +956,54 @@ async def analyze_maintenance_pdf(
             "error": f"Error inesperado: {str(e)}"
         }
 
+@router.post("/{vehicle_id}/maintenance-ai/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_maintenance_ai_job(
+    vehicle_id: str,
+    current_user: dict = Depends(get_current_user_data)
+):
+    """
+    Encola el análisis del manual y responde al momento con el id del trabajo
+    (consultar con GET /vehicles/{id}/maintenance-ai/jobs/{job_id}). Si el mismo
+    manual ya se está analizando, devuelve ese trabajo (coalesced=True).
+
+    En serverless (MAINTENANCE_JOB_MODE=inline, por defecto en Vercel) no hay
+    ejecución en segundo plano: la petición espera al análisis y responde con el
+    trabajo ya terminado.
+    """
+    vehicle = await _vehicle_with_manual(vehicle_id, current_user)
+    try:
+        job, created = await maintenance_jobs.submit(
+            db.db, manual_text_key(vehicle), vehicle["pdf_manual_grid_fs_id"]
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al encolar el análisis del manual: {str(e)}"
+        )
+    return {**_job_response(vehicle_id, job), "coalesced": not created}
+
+@router.get("/{vehicle_id}/maintenance-ai/jobs/{job_id}")
+async def get_maintenance_ai_job(
+    vehicle_id: str,
+    job_id: str,
+    current_user: dict = Depends(get_current_user_data)
+):
+    """Estado, etapa y progreso del trabajo; con status 'completed', también el resultado"""
+    vehicle = await _vehicle_with_manual(vehicle_id, current_user)
+    try:
+        job_object_id = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Formato de ID inválido")
+
+    job = await maintenance_jobs.get(db.db, job_object_id)
+    # Solo se ven los trabajos del manual que tiene ahora el vehículo
+    if job is None or str(job["manual_key"]) != str(manual_text_key(vehicle)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    return _job_response(vehicle_id, job)
+
 @router.post("/{vehicle_id}/maintenance/{maintenance_id}/complete", response_model=MaintenanceRecordResponse)
 async def complete_maintenance(
     vehicle_id: str,
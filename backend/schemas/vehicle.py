@@ -54,7 +54,9 @@ class VehicleResponse(BaseModel):
     current_kilometers: float
     maintenance_records: List[MaintenanceRecordResponse] = []
     pdf_manual_grid_fs_id: Optional[str] = None
-    logo: Optional[str] = None
+    logo: Optional[str] = None  # Base64, se mantiene por compatibilidad; mejor logo_url
+    logo_hash: Optional[str] = None
+    logo_url: Optional[str] = None
     last_itv_date: Optional[datetime] = None
     next_itv_date: Optional[datetime] = None
     created_at: datetime
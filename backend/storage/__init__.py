@@ -0,0 +1,52 @@
+"""
+Backends de almacenamiento detrás de database.db.
+
+- URLs 'mongodb://' o 'mongodb+srv://': Motor contra un servidor MongoDB real.
+- URLs 'memory://servidor/base_de_datos': implementación en memoria del proceso con
+  la misma interfaz asíncrona, pensada para tests y benchmarks sin red.
+"""
+from typing import Optional
+
+from pymongo.uri_parser import parse_uri
+
+from storage.memory import (
+    MemoryClient,
+    MemoryDatabase,
+    MemoryGridFSBucket,
+    is_memory_url,
+    reset_memory_servers,
+)
+
+
+def create_client(url: str, **options):
+    """Crea el cliente adecuado para la URL (en memoria solo se usan los event_listeners)"""
+    if is_memory_url(url):
+        return MemoryClient(url, event_listeners=options.get("event_listeners"))
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(url, **options)
+
+
+def database_name_from_url(url: str) -> Optional[str]:
+    if is_memory_url(url):
+        return MemoryClient(url).default_database_name
+    return parse_uri(url).get("database")
+
+
+def gridfs_bucket(database, bucket_name: str = "fs"):
+    """Bucket GridFS para la base de datos, sea cual sea el backend"""
+    if isinstance(database, MemoryDatabase):
+        return MemoryGridFSBucket(database, bucket_name=bucket_name)
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+    return AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+
+
+__all__ = [
+    "MemoryClient",
+    "MemoryDatabase",
+    "MemoryGridFSBucket",
+    "create_client",
+    "database_name_from_url",
+    "gridfs_bucket",
+    "is_memory_url",
+    "reset_memory_servers",
+]
@@ -0,0 +1,848 @@
+"""
+Backend de almacenamiento en memoria con la misma interfaz asíncrona que Motor
+para el subconjunto que usa la API (colecciones, cursores, agregaciones sencillas,
+índices únicos y GridFS).
+
+Se activa con una URL 'memory://<servidor>/<base de datos>'. Los datos viven en el
+proceso y se comparten entre los clientes que apuntan al mismo servidor, igual que
+varios clientes Motor contra el mismo mongod; cada proceso (o worker de pytest)
+tiene su propio almacén, así que los tests pueden ejecutarse en paralelo.
+"""
+import asyncio
+import functools
+import itertools
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlsplit
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument, monitoring
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from storage.query import (
+    _MISSING, apply_update, clone, equality_fields, freeze, get_path, matches,
+    normalize_sort, project, sort_documents, to_bson,
+)
+
+MEMORY_SCHEME = "memory"
+
+# servidor -> base de datos -> colección -> _CollectionData
+_SERVERS: dict = {}
+
+
+def is_memory_url(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(f"{MEMORY_SCHEME}://")
+
+
+def reset_memory_servers() -> None:
+    """Elimina todos los datos en memoria del proceso"""
+    _SERVERS.clear()
+
+
+def _command(command_name: str):
+    """Publica el método como un comando de MongoDB para los CommandListener del cliente"""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            with self._monitor(command_name):
+                return await method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _CollectionData:
+    """Documentos (por _id, en orden de inserción) e índices de una colección"""
+
+    def __init__(self):
+        self.documents: dict = {}
+        self.indexes: dict = {"_id_": {"key": [("_id", 1)], "v": 2}}
+        # nombre de índice único -> {clave congelada: clave congelada del _id}
+        self.unique_entries: dict = {}
+
+
+# --- Agregaciones ---
+
+def _evaluate(expression, document):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        return {key: _evaluate(value, document) for key, value in expression.items()}
+    return expression
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _accumulate(operator: str, expression, documents: list):
+    if operator == "$sum":
+        values = [_evaluate(expression, d) for d in documents]
+        return sum(v for v in values if _is_number(v))
+    if operator == "$avg":
+        values = [v for v in (_evaluate(expression, d) for d in documents) if _is_number(v)]
+        return sum(values) / len(values) if values else None
+    if operator in ("$min", "$max"):
+        values = [v for v in (_evaluate(expression, d) for d in documents) if v is not None]
+        if not values:
+            return None
+        ordered = sort_documents([{"v": v} for v in values], [("v", 1)])
+        return ordered[0]["v"] if operator == "$min" else ordered[-1]["v"]
+    if operator == "$first":
+        return _evaluate(expression, documents[0]) if documents else None
+    if operator == "$last":
+        return _evaluate(expression, documents[-1]) if documents else None
+    if operator == "$push":
+        return [_evaluate(expression, d) for d in documents]
+    if operator == "$addToSet":
+        result = []
+        for value in (_evaluate(expression, d) for d in documents):
+            if freeze(value) not in {freeze(v) for v in result}:
+                result.append(value)
+        return result
+    raise OperationFailure(f"Acumulador no soportado en $group: {operator}")
+
+
+def _group(documents: list, spec: dict) -> list:
+    groups: dict = {}
+    for document in documents:
+        key = _evaluate(spec["_id"], document)
+        groups.setdefault(freeze(key), (key, []))[1].append(document)
+
+    results = []
+    for key, members in groups.values():
+        result = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (operator, expression), = accumulator.items()
+            result[field] = _accumulate(operator, expression, members)
+        results.append(result)
+    return results
+
+
+def run_pipeline(documents: list, pipeline: list) -> list:
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            documents = [d for d in documents if matches(d, spec)]
+        elif name == "$group":
+            documents = _group(documents, spec)
+        elif name == "$sort":
+            documents = sort_documents(documents, list(spec.items()))
+        elif name == "$skip":
+            documents = documents[spec:]
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$project":
+            documents = [project(d, spec) for d in documents]
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+        elif name == "$unwind":
+            path = (spec["path"] if isinstance(spec, dict) else spec)[1:]
+            unwound = []
+            for document in documents:
+                value = get_path(document, path)
+                for item in value if isinstance(value, list) else []:
+                    copy = clone(document)
+                    copy[path] = item
+                    unwound.append(copy)
+            documents = unwound
+        else:
+            raise OperationFailure(f"Etapa de agregación no soportada: {name}")
+    return documents
+
+
+# --- Cursores ---
+
+class MemoryCursor:
+    """Cursor asíncrono perezoso (find y aggregate) con sort/skip/limit encadenables"""
+
+    def __init__(self, producer, projection=None):
+        self._producer = producer
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[list] = None
+        self._position = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = abs(count)
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def _evaluate(self) -> list:
+        if self._results is None:
+            documents = self._producer()
+            if self._sort:
+                documents = sort_documents(documents, self._sort)
+            if self._skip:
+                documents = documents[self._skip:]
+            if self._limit:
+                documents = documents[:self._limit]
+            self._results = [project(clone(d), self._projection) for d in documents]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        results = self._evaluate()
+        end = len(results) if length is None else min(len(results), self._position + length)
+        batch = results[self._position:end]
+        self._position = end
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        results = self._evaluate()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        self._position += 1
+        return results[self._position - 1]
+
+    async def next(self):
+        return await self.__anext__()
+
+    def close(self) -> None:
+        self._results = []
+
+
+# --- Colecciones ---
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+
+    @property
+    def _data(self) -> _CollectionData:
+        collections = self.database._collections
+        if self.name not in collections:
+            collections[self.name] = _CollectionData()
+        return collections[self.name]
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.database[f"{self.name}.{name}"]
+
+    def __getitem__(self, name: str):
+        return self.database[f"{self.name}.{name}"]
+
+    def _monitor(self, command_name: str):
+        return self.database.client._monitor(self.database.name, {command_name: self.name})
+
+    # --- Lectura ---
+
+    def _candidates(self, query) -> list:
+        """Documentos que cumplen el filtro, usando el _id como atajo si viene por igualdad"""
+        if query is not None and not isinstance(query, dict):
+            query = {"_id": query}
+        query = query or {}
+        data = self._data
+        if "_id" in query and not isinstance(query["_id"], dict):
+            document = data.documents.get(freeze(query["_id"]))
+            return [document] if document is not None and matches(document, query) else []
+        return [document for document in data.documents.values() if matches(document, query)]
+
+    def find(self, filter=None, projection=None, sort=None, skip: int = 0, limit: int = 0, **kwargs):
+        def produce():
+            with self._monitor("find"):
+                return self._candidates(filter)
+
+        cursor = MemoryCursor(produce, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    @_command("find")
+    async def find_one(self, filter=None, projection=None, *args, sort=None, **kwargs):
+        documents = self._candidates(filter)
+        if sort:
+            documents = sort_documents(documents, normalize_sort(sort))
+        if not documents:
+            return None
+        return project(clone(documents[0]), projection)
+
+    @_command("aggregate")
+    async def count_documents(self, filter=None, skip: int = 0, limit: int = 0, **kwargs) -> int:
+        count = max(0, len(self._candidates(filter)) - skip)
+        return min(count, limit) if limit else count
+
+    @_command("count")
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._data.documents)
+
+    @_command("distinct")
+    async def distinct(self, key: str, filter=None, **kwargs) -> list:
+        values = []
+        for document in self._candidates(filter):
+            value = get_path(document, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not _MISSING and freeze(item) not in {freeze(v) for v in values}:
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline: list, **kwargs):
+        def produce():
+            stages = list(pipeline)
+            # Un $match inicial se resuelve antes de copiar los documentos
+            query = stages.pop(0)["$match"] if stages and "$match" in stages[0] else {}
+            with self._monitor("aggregate"):
+                return run_pipeline([clone(d) for d in self._candidates(query)], stages)
+
+        return MemoryCursor(produce)
+
+    # --- Escritura ---
+
+    def _check_unique(self, document: dict, previous_id=None) -> list:
+        """Comprueba los índices únicos y devuelve las claves a registrar"""
+        data = self._data
+        entries = []
+        for name, spec in data.indexes.items():
+            if name not in data.unique_entries:
+                continue
+            partial = spec.get("partialFilterExpression")
+            if partial and not matches(document, partial):
+                continue
+            fields = [field for field, _ in spec["key"]]
+            values = [get_path(document, field) for field in fields]
+            if spec.get("sparse") and all(v is _MISSING for v in values):
+                continue
+            key = freeze([None if v is _MISSING else v for v in values])
+            owner = data.unique_entries[name].get(key)
+            if owner is not None and owner != previous_id:
+                dup = {field: (None if v is _MISSING else v) for field, v in zip(fields, values)}
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.full_name} index: {name} dup key: {dup}",
+                    11000,
+                )
+            entries.append((name, key))
+        return entries
+
+    def _unregister(self, document_id) -> None:
+        for entries in self._data.unique_entries.values():
+            for key in [k for k, owner in entries.items() if owner == document_id]:
+                del entries[key]
+
+    def _store(self, document: dict, previous_id=None) -> None:
+        document_id = freeze(document["_id"])
+        entries = self._check_unique(document, previous_id)
+        if previous_id is not None:
+            self._unregister(previous_id)
+        for name, key in entries:
+            self._data.unique_entries[name][key] = document_id
+        self._data.documents[document_id] = document
+
+    @_command("insert")
+    async def insert_one(self, document: dict, *args, **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    @_command("insert")
+    async def insert_many(self, documents: list, *args, **kwargs) -> InsertManyResult:
+        return InsertManyResult([self._insert(document) for document in documents], True)
+
+    def _insert(self, document: dict):
+        if "_id" not in document:
+            # Como pymongo, el _id generado se añade al documento recibido
+            document["_id"] = ObjectId()
+        stored = to_bson(document)
+        if freeze(stored["_id"]) in self._data.documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_ dup key: {{_id: {stored['_id']!r}}}",
+                11000,
+            )
+        self._store(stored)
+        return stored["_id"]
+
+    def _upsert(self, query, update: dict) -> dict:
+        document = {}
+        for path, value in equality_fields(query).items():
+            if path == "_id":
+                document["_id"] = clone(value)
+            else:
+                apply_update(document, {"$set": {path: value}})
+        apply_update(document, update, inserting=True)
+        if "_id" not in document:
+            document = {"_id": ObjectId(), **document}
+        document = to_bson(document)
+        self._store(document)
+        return document
+
+    def _update(self, original: dict, update: dict) -> bool:
+        """Aplica la actualización sobre una copia y la guarda. Devuelve si hubo cambios"""
+        updated = clone(original)
+        apply_update(updated, update)
+        updated = to_bson(updated)
+        if updated == original:
+            return False
+        self._store(updated, previous_id=freeze(original["_id"]))
+        return True
+
+    @_command("update")
+    async def update_one(self, filter, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        documents = self._candidates(filter)
+        if not documents:
+            if upsert:
+                document = self._upsert(filter, update)
+                return UpdateResult({"n": 1, "nModified": 0, "upserted": document["_id"]}, True)
+            return UpdateResult({"n": 0, "nModified": 0}, True)
+        modified = self._update(documents[0], update)
+        return UpdateResult({"n": 1, "nModified": int(modified)}, True)
+
+    @_command("update")
+    async def update_many(self, filter, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        documents = self._candidates(filter)
+        if not documents and upsert:
+            document = self._upsert(filter, update)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": document["_id"]}, True)
+        modified = sum(self._update(document, update) for document in documents)
+        return UpdateResult({"n": len(documents), "nModified": modified}, True)
+
+    @_command("update")
+    async def replace_one(self, filter, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        documents = self._candidates(filter)
+        if not documents:
+            if upsert:
+                document = to_bson({"_id": ObjectId(), **equality_fields(filter), **replacement})
+                self._store(document)
+                return UpdateResult({"n": 1, "nModified": 0, "upserted": document["_id"]}, True)
+            return UpdateResult({"n": 0, "nModified": 0}, True)
+        original = documents[0]
+        document = to_bson({"_id": original["_id"], **replacement})
+        modified = document != original
+        if modified:
+            self._store(document, previous_id=freeze(original["_id"]))
+        return UpdateResult({"n": 1, "nModified": int(modified)}, True)
+
+    @_command("findAndModify")
+    async def find_one_and_update(self, filter, update: dict, projection=None, sort=None,
+                                  upsert: bool = False, return_document=ReturnDocument.BEFORE, **kwargs):
+        documents = self._candidates(filter)
+        if sort:
+            documents = sort_documents(documents, normalize_sort(sort))
+        if not documents:
+            if not upsert:
+                return None
+            document = self._upsert(filter, update)
+            return project(clone(document), projection) if return_document == ReturnDocument.AFTER else None
+        original = documents[0]
+        self._update(original, update)
+        result = original if return_document == ReturnDocument.BEFORE else self._data.documents[freeze(original["_id"])]
+        return project(clone(result), projection)
+
+    @_command("findAndModify")
+    async def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        documents = self._candidates(filter)
+        if sort:
+            documents = sort_documents(documents, normalize_sort(sort))
+        if not documents:
+            return None
+        self._remove(documents[0])
+        return project(clone(documents[0]), projection)
+
+    def _remove(self, document: dict) -> None:
+        document_id = freeze(document["_id"])
+        self._unregister(document_id)
+        self._data.documents.pop(document_id, None)
+
+    @_command("delete")
+    async def delete_one(self, filter, **kwargs) -> DeleteResult:
+        documents = self._candidates(filter)
+        if documents:
+            self._remove(documents[0])
+        return DeleteResult({"n": min(1, len(documents))}, True)
+
+    @_command("delete")
+    async def delete_many(self, filter, **kwargs) -> DeleteResult:
+        documents = self._candidates(filter)
+        for document in documents:
+            self._remove(document)
+        return DeleteResult({"n": len(documents)}, True)
+
+    # --- Índices ---
+
+    @_command("createIndexes")
+    async def create_index(self, keys, **kwargs) -> str:
+        return self._create_index(keys, **kwargs)
+
+    def _create_index(self, keys, **kwargs) -> str:
+        keys = normalize_sort(keys, 1)
+        name = kwargs.pop("name", None) or "_".join(f"{field}_{direction}" for field, direction in keys)
+        spec = {"key": keys, "v": 2, **kwargs}
+        data = self._data
+        data.indexes[name] = spec
+        if kwargs.get("unique"):
+            data.unique_entries[name] = {}
+            try:
+                for document in data.documents.values():
+                    for index_name, key in self._check_unique(document, previous_id=freeze(document["_id"])):
+                        if index_name == name:
+                            data.unique_entries[name][key] = freeze(document["_id"])
+            except DuplicateKeyError:
+                del data.indexes[name]
+                del data.unique_entries[name]
+                raise
+        return name
+
+    @_command("createIndexes")
+    async def create_indexes(self, indexes: list, **kwargs) -> list:
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            keys = list(document.pop("key").items())
+            names.append(self._create_index(keys, **document))
+        return names
+
+    @_command("listIndexes")
+    async def index_information(self) -> dict:
+        return {name: {**spec, "key": list(spec["key"])} for name, spec in self._data.indexes.items()}
+
+    @_command("dropIndexes")
+    async def drop_index(self, name: str) -> None:
+        self._data.indexes.pop(name, None)
+        self._data.unique_entries.pop(name, None)
+
+    @_command("drop")
+    async def drop(self) -> None:
+        self.database._collections.pop(self.name, None)
+
+    def explain_find(self, query: dict, sort=None) -> dict:
+        """Plan aproximado: IXSCAN si algún índice empieza por un campo del filtro o del orden"""
+        fields = [key for key in (query or {}) if not key.startswith("$")]
+        if "_id" in fields and not isinstance(query["_id"], dict):
+            return {"stage": "IDHACK"}
+        sort_fields = [field for field, _ in normalize_sort(sort)] if sort else []
+        for name, spec in self._data.indexes.items():
+            first_field = spec["key"][0][0]
+            partial = spec.get("partialFilterExpression")
+            if partial and not all(key in query for key in partial):
+                continue
+            if first_field in fields or (not fields and first_field in sort_fields):
+                return {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": name}}
+        plan = {"stage": "COLLSCAN"}
+        return {"stage": "SORT", "inputStage": plan} if sort_fields else plan
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+
+    @property
+    def _collections(self) -> dict:
+        return self.client._server.setdefault(self.name, {})
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return MemoryCollection(self, name)
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return MemoryCollection(self, name)
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return MemoryCollection(self, name)
+
+    async def list_collection_names(self, **kwargs) -> list:
+        with self.client._monitor(self.name, {"listCollections": 1}):
+            return list(self._collections.keys())
+
+    async def drop_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+
+    async def command(self, command, value=1, **kwargs) -> dict:
+        if isinstance(command, str):
+            command = {command: value}
+        name = next(iter(command))
+        with self.client._monitor(self.name, command):
+            return self._run_command(name, command)
+
+    def _run_command(self, name: str, command: dict) -> dict:
+        if name in ("ping", "hello", "isMaster", "ismaster"):
+            return {"ok": 1.0}
+        if name == "explain":
+            find = command["explain"]
+            plan = self[find["find"]].explain_find(find.get("filter", {}), find.get("sort"))
+            return {"queryPlanner": {"winningPlan": plan}, "ok": 1.0}
+        raise OperationFailure(f"Comando no soportado por el backend en memoria: {name}")
+
+
+class MemoryClient:
+    """Cliente equivalente a AsyncIOMotorClient para URLs 'memory://servidor/base_de_datos'"""
+
+    def __init__(self, url: str = "memory://localhost/test", event_listeners: Optional[list] = None, **kwargs):
+        parts = urlsplit(url)
+        self.address = parts.netloc or "localhost"
+        self.default_database_name = parts.path.lstrip("/") or None
+        self._server = _SERVERS.setdefault(self.address, {})
+        self._command_listeners = [
+            listener for listener in event_listeners or []
+            if isinstance(listener, monitoring.CommandListener)
+        ]
+        self._request_ids = itertools.count(1)
+        self.admin = MemoryDatabase(self, "admin")
+
+    @contextmanager
+    def _monitor(self, database_name: str, command: dict):
+        """Emite los mismos eventos de CommandListener que pymongo alrededor de una operación"""
+        if not self._command_listeners:
+            yield
+            return
+
+        request_id = next(self._request_ids)
+        connection = (self.address, 0)
+        command_name = next(iter(command))
+        started_event = monitoring.CommandStartedEvent(command, database_name, request_id, connection, request_id)
+        for listener in self._command_listeners:
+            listener.started(started_event)
+
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            duration = timedelta(seconds=time.perf_counter() - started)
+            failed_event = monitoring.CommandFailedEvent(
+                duration, {"ok": 0, "errmsg": str(e)}, command_name, request_id, connection, request_id,
+                database_name=database_name,
+            )
+            for listener in self._command_listeners:
+                listener.failed(failed_event)
+            raise
+        duration = timedelta(seconds=time.perf_counter() - started)
+        succeeded_event = monitoring.CommandSucceededEvent(
+            duration, {"ok": 1}, command_name, request_id, connection, request_id, database_name=database_name,
+        )
+        for listener in self._command_listeners:
+            listener.succeeded(succeeded_event)
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        return MemoryDatabase(self, name)
+
+    def get_database(self, name: Optional[str] = None, **kwargs) -> MemoryDatabase:
+        return MemoryDatabase(self, name or self.default_database_name)
+
+    async def list_database_names(self) -> list:
+        return list(self._server.keys())
+
+    async def drop_database(self, name: str) -> None:
+        self._server.pop(name, None)
+
+    def close(self) -> None:
+        pass
+
+
+# --- GridFS ---
+
+class MemoryGridOut:
+    """Fichero de GridFS leído desde la colección de chunks (interfaz de AsyncIOMotorGridOut)"""
+
+    def __init__(self, bucket: "MemoryGridFSBucket", file_document: dict):
+        self._bucket = bucket
+        self._file = file_document
+        self._position = 0
+        self._data: Optional[bytes] = None
+
+    _id = property(lambda self: self._file["_id"])
+    filename = property(lambda self: self._file.get("filename"))
+    length = property(lambda self: self._file["length"])
+    chunk_size = property(lambda self: self._file["chunkSize"])
+    upload_date = property(lambda self: self._file["uploadDate"])
+    metadata = property(lambda self: self._file.get("metadata"))
+    content_type = property(lambda self: (self._file.get("metadata") or {}).get("contentType"))
+
+    async def _load(self) -> bytes:
+        if self._data is None:
+            chunks = await self._bucket._chunks.find({"files_id": self._id}).sort("n", 1).to_list(None)
+            self._data = b"".join(chunk["data"] for chunk in chunks)
+        return self._data
+
+    async def read(self, size: int = -1) -> bytes:
+        data = await self._load()
+        end = len(data) if size is None or size < 0 else self._position + size
+        chunk = data[self._position:end]
+        self._position += len(chunk)
+        return chunk
+
+    async def readchunk(self) -> bytes:
+        """Resto del chunk actual. Como el driver, solo lee ese chunk de la colección"""
+        if self._position >= self.length:
+            return b""
+        number, offset = divmod(self._position, self.chunk_size)
+        if self._data is not None:
+            chunk = self._data[self._position:(number + 1) * self.chunk_size]
+        else:
+            document = await self._bucket._chunks.find_one({"files_id": self._id, "n": number})
+            chunk = document["data"][offset:] if document else b""
+        self._position += len(chunk)
+        return chunk
+
+    def seek(self, position: int, whence: int = 0) -> int:
+        base = {0: 0, 1: self._position, 2: self.length}[whence]
+        self._position = max(0, base + position)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        chunk = await self.readchunk()
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryGridIn:
+    """Escritura por partes de un fichero GridFS (interfaz de AsyncIOMotorGridIn)"""
+
+    def __init__(self, bucket: "MemoryGridFSBucket", file_id, filename: str,
+                 chunk_size: int, metadata: Optional[dict] = None):
+        self._bucket = bucket
+        self._id = file_id
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.metadata = metadata
+        self._buffer = bytearray()
+        self._chunk_number = 0
+        self.length = 0
+        self.closed = False
+
+    async def write(self, data) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer.extend(data)
+        self.length += len(data)
+        while len(self._buffer) >= self.chunk_size:
+            await self._flush_chunk(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+
+    async def _flush_chunk(self, data: bytes) -> None:
+        await self._bucket._chunks.insert_one({"files_id": self._id, "n": self._chunk_number, "data": data})
+        self._chunk_number += 1
+
+    async def close(self) -> None:
+        if self.closed:
+            return
+        if self._buffer:
+            await self._flush_chunk(bytes(self._buffer))
+            self._buffer.clear()
+        file_document = {
+            "_id": self._id,
+            "length": self.length,
+            "chunkSize": self.chunk_size,
+            "uploadDate": datetime.utcnow(),
+            "filename": self.filename,
+        }
+        if self.metadata is not None:
+            file_document["metadata"] = self.metadata
+        await self._bucket._files.insert_one(file_document)
+        self.closed = True
+
+    async def abort(self) -> None:
+        await self._bucket._chunks.delete_many({"files_id": self._id})
+        self.closed = True
+
+
+class MemoryGridFSBucket:
+    """Equivalente en memoria de AsyncIOMotorGridFSBucket (colecciones <bucket>.files y <bucket>.chunks)"""
+
+    def __init__(self, database: MemoryDatabase, bucket_name: str = "fs", chunk_size_bytes: int = 255 * 1024):
+        self._files = database[f"{bucket_name}.files"]
+        self._chunks = database[f"{bucket_name}.chunks"]
+        self._chunk_size = chunk_size_bytes
+
+    def open_upload_stream(self, filename: str, chunk_size_bytes: Optional[int] = None,
+                           metadata: Optional[dict] = None) -> MemoryGridIn:
+        return self.open_upload_stream_with_id(ObjectId(), filename, chunk_size_bytes, metadata)
+
+    def open_upload_stream_with_id(self, file_id, filename: str, chunk_size_bytes: Optional[int] = None,
+                                   metadata: Optional[dict] = None) -> MemoryGridIn:
+        return MemoryGridIn(self, file_id, filename, chunk_size_bytes or self._chunk_size, metadata)
+
+    async def upload_from_stream(self, filename: str, source, chunk_size_bytes: Optional[int] = None,
+                                 metadata: Optional[dict] = None):
+        grid_in = self.open_upload_stream(filename, chunk_size_bytes, metadata)
+        await self._write_source(grid_in, source)
+        return grid_in._id
+
+    async def upload_from_stream_with_id(self, file_id, filename: str, source,
+                                         chunk_size_bytes: Optional[int] = None, metadata: Optional[dict] = None) -> None:
+        grid_in = self.open_upload_stream_with_id(file_id, filename, chunk_size_bytes, metadata)
+        await self._write_source(grid_in, source)
+
+    @staticmethod
+    async def _write_source(grid_in: MemoryGridIn, source) -> None:
+        if isinstance(source, (bytes, bytearray, str)):
+            await grid_in.write(source)
+        else:
+            data = source.read()
+            if asyncio.iscoroutine(data):
+                data = await data
+            await grid_in.write(data)
+        await grid_in.close()
+
+    async def open_download_stream(self, file_id) -> MemoryGridOut:
+        file_document = await self._files.find_one({"_id": file_id})
+        if file_document is None:
+            raise NoFile(f"no file in gridfs collection {self._files.full_name!r} with _id {file_id!r}")
+        return MemoryGridOut(self, file_document)
+
+    async def download_to_stream(self, file_id, destination) -> None:
+        grid_out = await self.open_download_stream(file_id)
+        destination.write(await grid_out.read())
+
+    async def delete(self, file_id) -> None:
+        result = await self._files.delete_one({"_id": file_id})
+        await self._chunks.delete_many({"files_id": file_id})
+        if not result.deleted_count:
+            raise NoFile(f"no file could be deleted because none matched {file_id}")
+
+    def find(self, filter=None, **kwargs) -> "MemoryGridOutCursor":
+        return MemoryGridOutCursor(self, self._files.find(filter, **kwargs))
+
+
+class MemoryGridOutCursor:
+    """Cursor de ficheros GridFS: envuelve el cursor de <bucket>.files"""
+
+    def __init__(self, bucket: MemoryGridFSBucket, cursor: MemoryCursor):
+        self._bucket = bucket
+        self._cursor = cursor
+
+    def sort(self, key_or_list, direction=None):
+        self._cursor.sort(key_or_list, direction)
+        return self
+
+    def limit(self, count: int):
+        self._cursor.limit(count)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> MemoryGridOut:
+        return MemoryGridOut(self._bucket, await self._cursor.__anext__())
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        return [MemoryGridOut(self._bucket, d) for d in await self._cursor.to_list(length)]
@@ -0,0 +1,517 @@
+"""
+Evaluación de filtros, actualizaciones, proyecciones y ordenación con la semántica
+de MongoDB, para el backend en memoria. Cubre los operadores que usan los routers;
+cualquier otro se rechaza con OperationFailure en lugar de ignorarse en silencio.
+"""
+import re
+from datetime import datetime, timezone
+from functools import cmp_to_key
+
+from bson import Binary, Decimal128, Int64, ObjectId, Regex
+from bson.errors import InvalidDocument
+from pymongo.errors import OperationFailure
+
+_MISSING = object()
+
+_SCALAR_TYPES = (str, bytes, ObjectId, Binary, Decimal128, Regex, re.Pattern, type(None))
+
+
+# --- Copias y normalización ---
+
+def to_bson(value):
+    """
+    Copia un valor tal y como lo guardaría MongoDB: tuplas como listas, fechas en
+    UTC sin zona horaria y truncadas a milisegundos, y error con los tipos que BSON
+    no sabe codificar.
+    """
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise InvalidDocument(f"documents must have only string keys, key was {key!r}")
+            result[key] = to_bson(item)
+        return result
+    if isinstance(value, (list, tuple)):
+        return [to_bson(item) for item in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, (bool, int, float, Int64)) or isinstance(value, _SCALAR_TYPES):
+        return value
+    raise InvalidDocument(f"cannot encode object: {value!r}, of type: {type(value)!r}")
+
+
+def clone(value):
+    """Copia profunda de un documento ya normalizado (más rápida que copy.deepcopy)"""
+    if isinstance(value, dict):
+        return {key: clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [clone(item) for item in value]
+    return value
+
+
+def freeze(value):
+    """Representación hashable de un valor, usada como clave de _id e índices únicos"""
+    if isinstance(value, dict):
+        return ("d", tuple((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return ("l", tuple(freeze(item) for item in value))
+    if isinstance(value, bool):
+        return ("b", value)
+    return value
+
+
+# --- Comparación ---
+
+def _type_rank(value) -> int:
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float, Int64, Decimal128)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, (bytes, Binary)):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _numeric(value):
+    return value.to_decimal() if isinstance(value, Decimal128) else value
+
+
+def compare(a, b) -> int:
+    """Compara dos valores siguiendo el orden de tipos de BSON"""
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        return 0
+    if rank_a == 2:
+        a, b = _numeric(a), _numeric(b)
+    elif rank_a == 4:
+        return compare(list(a.items()), list(b.items()))
+    elif rank_a == 5:
+        for item_a, item_b in zip(a, b):
+            result = compare(item_a, item_b)
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    elif isinstance(a, tuple):
+        # Pares (clave, valor) de documentos embebidos
+        return compare(a[0], b[0]) or compare(a[1], b[1])
+    elif rank_a == 10:
+        a, b = str(a), str(b)
+    return (a > b) - (a < b)
+
+
+def values_equal(a, b) -> bool:
+    if _type_rank(a) != _type_rank(b):
+        return False
+    if isinstance(a, dict):
+        return list(a.keys()) == list(b.keys()) and all(values_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(values_equal(x, y) for x, y in zip(a, b))
+    return compare(a, b) == 0
+
+
+# --- Acceso por rutas con punto ---
+
+def get_path(document, path: str):
+    """Valor en una ruta 'a.b.c' sin expandir arrays (o _MISSING)"""
+    current = document
+    for part in path.split("."):
+        if isinstance(current, dict):
+            current = current.get(part, _MISSING)
+        elif isinstance(current, list) and part.isdigit():
+            index = int(part)
+            current = current[index] if index < len(current) else _MISSING
+        else:
+            return _MISSING
+        if current is _MISSING:
+            return _MISSING
+    return current
+
+
+def _candidate_values(document, parts: list) -> list:
+    """
+    Valores alcanzables en una ruta expandiendo los arrays intermedios, como hace
+    MongoDB al filtrar por 'maintenance_records._id'.
+    """
+    if not parts:
+        return [document]
+    head, rest = parts[0], parts[1:]
+    if isinstance(document, dict):
+        if head not in document:
+            return []
+        return _candidate_values(document[head], rest)
+    if isinstance(document, list):
+        values = []
+        if head.isdigit() and int(head) < len(document):
+            values.extend(_candidate_values(document[int(head)], rest))
+        for item in document:
+            if isinstance(item, dict):
+                values.extend(_candidate_values(item, parts))
+        return values
+    return []
+
+
+# --- Filtros ---
+
+def matches(document: dict, query: dict) -> bool:
+    """Indica si un documento cumple un filtro de MongoDB"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, sub) for sub in condition):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"Operador de consulta no soportado: {key}")
+        elif not _field_matches(document, key, condition):
+            return False
+    return True
+
+
+def _is_operator_dict(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(k.startswith("$") for k in condition)
+
+
+def _field_matches(document: dict, path: str, condition) -> bool:
+    values = _candidate_values(document, path.split("."))
+    if _is_operator_dict(condition):
+        options = condition.get("$options", "")
+        return all(_operator_matches(values, op, arg, options) for op, arg in condition.items())
+    return _equals_any(values, condition)
+
+
+def _expand(values: list) -> list:
+    """Los arrays se comparan por su valor completo y por cada elemento"""
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+
+def _equals_any(values: list, target) -> bool:
+    if target is None and not values:
+        return True
+    if isinstance(target, (re.Pattern, Regex)):
+        return _regex_any(values, target)
+    return any(values_equal(value, target) for value in _expand(values))
+
+
+def _regex_any(values: list, pattern, options: str = "") -> bool:
+    if isinstance(pattern, Regex):
+        pattern = pattern.try_compile()
+    if isinstance(pattern, str):
+        flags = re.IGNORECASE if "i" in options else 0
+        flags |= re.MULTILINE if "m" in options else 0
+        pattern = re.compile(pattern, flags)
+    return any(isinstance(v, str) and pattern.search(v) for v in _expand(values))
+
+
+def _operator_matches(values: list, operator: str, argument, options: str = "") -> bool:
+    if operator == "$eq":
+        return _equals_any(values, argument)
+    if operator == "$ne":
+        return not _equals_any(values, argument)
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        rank = _type_rank(argument)
+        for value in _expand(values):
+            if _type_rank(value) != rank:
+                continue
+            result = compare(value, argument)
+            if (operator == "$gt" and result > 0) or (operator == "$gte" and result >= 0) \
+                    or (operator == "$lt" and result < 0) or (operator == "$lte" and result <= 0):
+                return True
+        return False
+    if operator == "$in":
+        return any(_equals_any(values, item) for item in argument)
+    if operator == "$nin":
+        return not any(_equals_any(values, item) for item in argument)
+    if operator == "$exists":
+        return bool(values) == bool(argument)
+    if operator == "$size":
+        return any(isinstance(value, list) and len(value) == argument for value in values)
+    if operator == "$all":
+        return all(_equals_any(values, item) for item in argument)
+    if operator == "$elemMatch":
+        return any(
+            isinstance(value, list) and any(_element_matches(item, argument) for item in value)
+            for value in values
+        )
+    if operator == "$regex":
+        return _regex_any(values, argument, options)
+    if operator == "$options":
+        return True
+    if operator == "$not":
+        return not all(_operator_matches(values, op, arg) for op, arg in argument.items())
+    raise OperationFailure(f"Operador de consulta no soportado: {operator}")
+
+
+def _element_matches(element, condition) -> bool:
+    """Condición sobre un elemento de array ($elemMatch, $pull)"""
+    if _is_operator_dict(condition):
+        return all(_operator_matches([element], op, arg) for op, arg in condition.items())
+    if isinstance(condition, dict):
+        return isinstance(element, dict) and matches(element, condition)
+    return values_equal(element, condition)
+
+
+def equality_fields(query: dict) -> dict:
+    """Campos de igualdad de un filtro, que se copian al documento en un upsert"""
+    fields = {}
+    for key, condition in (query or {}).items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_dict(condition):
+            if "$eq" in condition:
+                fields[key] = condition["$eq"]
+            continue
+        fields[key] = condition
+    return fields
+
+
+# --- Actualizaciones ---
+
+def _set_path(document: dict, path: str, value) -> None:
+    parts = path.split(".")
+    for index, part in enumerate(parts[:-1]):
+        if part == "$[]":
+            rest = ".".join(parts[index + 1:])
+            if not isinstance(document, list):
+                raise OperationFailure(f"'$[]' requiere un array en la ruta {path}")
+            for item in document:
+                _set_path(item, rest, clone(value))
+            return
+        if isinstance(document, list):
+            document = document[int(part)]
+            continue
+        child = document.get(part)
+        if child is None or not isinstance(child, (dict, list)):
+            next_part = parts[index + 1]
+            if next_part == "$[]":
+                raise OperationFailure(f"'$[]' requiere un array en la ruta {path}")
+            child = {}
+            document[part] = child
+        document = child
+    last = parts[-1]
+    if last == "$[]":
+        raise OperationFailure(f"Ruta no soportada: {path}")
+    if isinstance(document, list):
+        document[int(last)] = value
+    else:
+        document[last] = value
+
+
+def _update_path(document: dict, path: str, func) -> None:
+    """Aplica func(valor_actual) en una ruta, expandiendo '$[]' sobre todos los elementos"""
+    parts = path.split(".")
+    if "$[]" in parts:
+        position = parts.index("$[]")
+        array = get_path(document, ".".join(parts[:position])) if position else document
+        if not isinstance(array, list):
+            raise OperationFailure(f"'$[]' requiere un array en la ruta {path}")
+        rest = ".".join(parts[position + 1:])
+        for index, item in enumerate(array):
+            if rest:
+                _update_path(item, rest, func)
+            else:
+                array[index] = func(item)
+        return
+    _set_path(document, path, func(get_path(document, path)))
+
+
+def _unset_path(document: dict, path: str) -> None:
+    parts = path.split(".")
+    parent = get_path(document, ".".join(parts[:-1])) if len(parts) > 1 else document
+    if isinstance(parent, dict):
+        parent.pop(parts[-1], None)
+    elif isinstance(parent, list) and parts[-1].isdigit() and int(parts[-1]) < len(parent):
+        parent[int(parts[-1])] = None
+
+
+def _array_at(document: dict, path: str, operator: str) -> list:
+    current = get_path(document, path)
+    if current is _MISSING or current is None:
+        current = []
+        _set_path(document, path, current)
+    if not isinstance(current, list):
+        raise OperationFailure(f"No se puede aplicar {operator} a un campo que no es un array: {path}")
+    return current
+
+
+def _add_numbers(current, amount, path: str):
+    if current is _MISSING or current is None:
+        return amount
+    if _type_rank(current) != 2:
+        raise OperationFailure(f"No se puede aplicar $inc a un valor no numérico en {path}")
+    return current + amount
+
+
+def apply_update(document: dict, update: dict, inserting: bool = False) -> None:
+    """Aplica los operadores de actualización sobre el documento (in place)"""
+    if not update or not all(key.startswith("$") for key in update):
+        raise OperationFailure("La actualización debe usar operadores ($set, $push...)")
+
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if path == "_id" or path.startswith("_id."):
+                if operator != "$setOnInsert" and not (operator == "$set" and values_equal(document.get("_id"), value)):
+                    raise OperationFailure("El campo inmutable '_id' no se puede modificar")
+            if operator == "$set":
+                _set_path(document, path, clone(value))
+            elif operator == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, clone(value))
+            elif operator == "$unset":
+                _unset_path(document, path)
+            elif operator == "$inc":
+                _update_path(document, path, lambda current, v=value, p=path: _add_numbers(current, v, p))
+            elif operator == "$min":
+                _update_path(document, path, lambda current, v=value: v if current is _MISSING or compare(v, current) < 0 else current)
+            elif operator == "$max":
+                _update_path(document, path, lambda current, v=value: v if current is _MISSING or compare(v, current) > 0 else current)
+            elif operator == "$push":
+                _push(_array_at(document, path, operator), value)
+            elif operator == "$addToSet":
+                array = _array_at(document, path, operator)
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                for item in items:
+                    if not any(values_equal(existing, item) for existing in array):
+                        array.append(clone(item))
+            elif operator == "$pull":
+                current = get_path(document, path)
+                if isinstance(current, list):
+                    current[:] = [item for item in current if not _element_matches(item, value)]
+            elif operator == "$pop":
+                current = get_path(document, path)
+                if isinstance(current, list) and current:
+                    current.pop(0 if value == -1 else -1)
+            else:
+                raise OperationFailure(f"Operador de actualización no soportado: {operator}")
+
+
+def _push(array: list, value) -> None:
+    if isinstance(value, dict) and "$each" in value:
+        items = [clone(item) for item in value["$each"]]
+        position = value.get("$position")
+        if position is None:
+            array.extend(items)
+        else:
+            array[position:position] = items
+        if value.get("$sort") is not None:
+            _sort_in_place(array, value["$sort"])
+        if value.get("$slice") is not None:
+            limit = value["$slice"]
+            array[:] = array[limit:] if limit < 0 else array[:limit]
+        return
+    array.append(clone(value))
+
+
+def _sort_in_place(array: list, spec) -> None:
+    if isinstance(spec, dict):
+        array[:] = sort_documents(array, list(spec.items()))
+    else:
+        array.sort(key=cmp_to_key(compare), reverse=spec < 0)
+
+
+# --- Proyecciones y ordenación ---
+
+def project(document: dict, projection) -> dict:
+    """Aplica una proyección de inclusión o exclusión (con '$slice' en arrays)"""
+    if not projection:
+        return document
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    slices = {k: v["$slice"] for k, v in projection.items() if isinstance(v, dict) and "$slice" in v}
+    plain = {k: v for k, v in projection.items() if k not in slices}
+    include_id = plain.pop("_id", 1)
+    inclusion = any(bool(v) for v in plain.values()) or (
+        not plain and not slices and "_id" in projection and bool(include_id)
+    )
+
+    if inclusion:
+        result = {}
+        if include_id and "_id" in document:
+            result["_id"] = document["_id"]
+        for path, flag in plain.items():
+            if flag:
+                _copy_path(document, result, path.split("."))
+        for path in slices:
+            if path not in plain:
+                _copy_path(document, result, path.split("."))
+    else:
+        result = clone(document)
+        for path in plain:
+            _unset_path(result, path)
+        if not include_id:
+            result.pop("_id", None)
+
+    for path, limit in slices.items():
+        array = get_path(result, path)
+        if isinstance(array, list):
+            if isinstance(limit, list):
+                skip, count = limit
+                sliced = array[skip:skip + count] if skip >= 0 else array[skip:][:count]
+            else:
+                sliced = array[limit:] if limit < 0 else array[:limit]
+            _set_path(result, path, sliced)
+    return result
+
+
+def _copy_path(source, target: dict, parts: list) -> None:
+    head = parts[0]
+    if not isinstance(source, dict) or head not in source:
+        return
+    value = source[head]
+    if len(parts) == 1:
+        target[head] = clone(value)
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(head, {}), parts[1:])
+    elif isinstance(value, list):
+        items = []
+        for item in value:
+            if isinstance(item, dict):
+                projected = {}
+                _copy_path(item, projected, parts[1:])
+                items.append(projected)
+        target[head] = items
+
+
+def normalize_sort(key_or_list, direction=None) -> list:
+    """Acepta las mismas formas que Cursor.sort de pymongo"""
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+
+def sort_documents(documents: list, sort_spec: list) -> list:
+    """Ordena documentos por varias claves (ordenación estable, de la última a la primera)"""
+    ordered = list(documents)
+    for path, direction in reversed(sort_spec):
+        def key(document, path=path):
+            value = get_path(document, path)
+            return None if value is _MISSING else value
+        ordered.sort(key=cmp_to_key(lambda a, b: compare(key(a), key(b))), reverse=direction < 0)
+    return ordered
@@ -1,20 +1,30 @@
-from utils.car_logo_scraper import get_car_logo
+import asyncio
 import logging
 
+import httpx
+
+from utils.car_logo_scraper import HEADERS, fetch_car_logo
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 
 # Lista de marcas a probar
 brands = ['Volkswagen', 'Ford', 'Toyota', 'Honda', 'BMW', 'Mercedes']
 
-print("Prueba de obtención de logos de coches:")
-print("-" * 40)
-
-for brand in brands:
-    print(f"Buscando logo para {brand}...")
-    logo = get_car_logo(brand)
-    if logo:
-        print(f"Logo encontrado para {brand} (longitud: {len(logo)} caracteres)")
-    else:
-        print(f"No se encontró logo para {brand}")
-    print("-" * 40) 
\ No newline at end of file
+
+async def main():
+    print("Prueba de obtención de logos de coches:")
+    print("-" * 40)
+
+    async with httpx.AsyncClient(base_url="https://www.carlogos.org", headers=HEADERS, timeout=10, follow_redirects=True) as client:
+        for brand in brands:
+            print(f"Buscando logo para {brand}...")
+            logo = await fetch_car_logo(client, brand)
+            if logo:
+                print(f"Logo encontrado para {brand} ({len(logo)} bytes)")
+            else:
+                print(f"No se encontró logo para {brand}")
+            print("-" * 40)
+
+
+asyncio.run(main())
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException, status
+
+from auth.password_pool import PasswordWorkerPool, pwd_context
+
+
+class _BlockingContext:
+    """Contexto de prueba cuyo hash se bloquea hasta que se libera el evento."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(timeout=5)
+        return f"hash:{password}"
+
+    def verify(self, password, password_hash):
+        return password_hash == f"hash:{password}"
+
+
+async def test_hash_and_verify_roundtrip():
+    """Testea que el pool hashea y verifica con bcrypt real."""
+    pool = PasswordWorkerPool(pwd_context, max_workers=1, max_queue=1)
+    password_hash = await pool.hash("password123")
+    assert await pool.verify("password123", password_hash)
+    assert not await pool.verify("otra", password_hash)
+
+    stats = pool.stats()
+    assert stats["completed"] == 3
+    assert stats["rejected"] == 0
+
+async def test_pool_rejects_when_saturated():
+    """Testea que se devuelve 503 cuando se supera la profundidad de cola."""
+    context = _BlockingContext()
+    pool = PasswordWorkerPool(context, max_workers=1, max_queue=1)
+
+    running = [asyncio.create_task(pool.hash("a")), asyncio.create_task(pool.hash("b"))]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await pool.hash("c")
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    context.release.set()
+    assert await asyncio.gather(*running) == ["hash:a", "hash:b"]
+    assert pool.stats()["rejected"] == 1
+    # La segunda tarea esperó en cola a que terminara la primera
+    assert pool.stats()["max_queue_wait_ms"] > 0
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, status
+
+from auth.rate_limiter import AuthRateLimiter, InMemoryBucketBackend, RedisBucketBackend
+
+
+def _request(host: str = "10.0.0.1", headers: dict = None):
+    """Simula el objeto Request con lo que usa el limitador."""
+    return SimpleNamespace(client=SimpleNamespace(host=host), headers=headers or {})
+
+def _limiter(**kwargs):
+    options = dict(ip_capacity=3, ip_per_minute=1, email_capacity=2, email_per_minute=1)
+    options.update(kwargs)
+    return AuthRateLimiter(InMemoryBucketBackend(), **options)
+
+
+async def test_bucket_allows_burst_then_rejects():
+    """Testea que la cubeta permite la ráfaga configurada y luego rechaza."""
+    backend = InMemoryBucketBackend()
+    results = [(await backend.take("k", 2, 1.0))[0] for _ in range(3)]
+    assert results == [True, True, False]
+
+async def test_prune_keeps_buckets_of_slower_scopes():
+    """Testea que la limpieza usa la configuración de cada cubeta y no la de la que la provoca."""
+    backend = InMemoryBucketBackend(max_keys=2)
+    # Cubeta lenta: tarda 60 s en llenarse
+    await backend.take("email:victima", 1, 1 / 60)
+    # Cubeta rápida: se llena en 1 ms
+    await backend.take("ip:10.0.0.1", 1, 1000.0)
+    await asyncio.sleep(0.01)
+    # Otra cubeta rápida provoca la limpieza
+    await backend.take("ip:10.0.0.2", 1, 1000.0)
+
+    assert "ip:10.0.0.1" not in backend._buckets
+    assert "email:victima" in backend._buckets
+    assert (await backend.take("email:victima", 1, 1 / 60))[0] is False
+
+async def test_buckets_in_use_are_capped():
+    """Testea que, aunque todas las cubetas estén en uso, el mapa no supera max_keys."""
+    backend = InMemoryBucketBackend(max_keys=10)
+    for i in range(100):
+        await backend.take(f"ip:10.0.0.{i}", 5, 1 / 60)
+
+    assert len(backend._buckets) <= 10
+    # Se conservan las más recientes
+    assert "ip:10.0.0.99" in backend._buckets
+
+async def test_redis_backend_refills_caps_and_expires(monkeypatch):
+    """Testea el script Lua contra un servidor compatible con Redis: recarga, tope de capacidad y TTL."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeAsyncRedis()
+    backend = RedisBucketBackend(client, prefix="test:")
+    now = [1000.0]
+    monkeypatch.setattr("auth.rate_limiter.time.time", lambda: now[0])
+
+    results = [await backend.take("k", 2, 0.5) for _ in range(3)]
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert results[2][1] == pytest.approx(2.0)
+    # Caduca cuando la cubeta ya estaría llena: ceil(2 / 0.5) + 1
+    assert await client.ttl("test:k") == 5
+
+    # 2 s después hay un token de nuevo
+    now[0] += 2
+    assert (await backend.take("k", 2, 0.5))[0] is True
+    assert (await backend.take("k", 2, 0.5))[0] is False
+
+    # Tras mucho tiempo la cubeta no pasa de su capacidad
+    now[0] += 3600
+    results = [(await backend.take("k", 2, 0.5))[0] for _ in range(3)]
+    assert results == [True, True, False]
+    await client.aclose()
+
+async def test_email_limit_returns_429_with_retry_after():
+    """Testea el rechazo por email y la cabecera Retry-After."""
+    limiter = _limiter()
+    await limiter.check(_request(), "victima@example.com")
+    await limiter.check(_request("10.0.0.2"), "VICTIMA@example.com")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check(_request("10.0.0.3"), "victima@example.com")
+    assert exc_info.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+    assert limiter.stats()["rejected_email"] == 1
+
+async def test_ip_limit_is_independent_of_email():
+    """Testea que una IP se limita aunque rote los emails."""
+    limiter = _limiter()
+    for i in range(3):
+        await limiter.check(_request(), f"user{i}@example.com")
+
+    with pytest.raises(HTTPException):
+        await limiter.check(_request(), "otro@example.com")
+    assert limiter.stats()["rejected_ip"] == 1
+
+async def test_forwarded_for_only_when_trusted():
+    """Testea que X-Forwarded-For solo se usa si se confía en el proxy."""
+    request = _request("10.0.0.1", {"x-forwarded-for": "203.0.113.7, 10.0.0.1"})
+    assert _limiter().client_ip(request) == "10.0.0.1"
+    assert _limiter(trust_proxy_headers=True).client_ip(request) == "203.0.113.7"
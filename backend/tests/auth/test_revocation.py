@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from auth.revocation import BloomFilter, RevocationFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Testea que todo elemento añadido se detecta."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+
+def test_bloom_filter_false_positive_rate_is_bounded():
+    """Testea que la tasa de falsos positivos se mantiene cerca de la configurada."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"revocado-{i}")
+    false_positives = sum(f"valido-{i}" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.03
+
+def test_bloom_filter_is_compact():
+    """Testea que 100.000 entradas al 0,1% ocupan menos de 200 KB."""
+    bloom = BloomFilter(capacity=100_000, error_rate=0.001)
+    assert len(bloom.bits) < 200 * 1024
+
+async def test_refresh_only_reads_new_revocations(test_db):
+    """Testea que la actualización periódica añade las revocaciones nuevas sin reconstruir el filtro."""
+    await test_db.revoked_tokens.delete_many({})
+    revocations = RevocationFilter(capacity=1000, refresh_seconds=0)
+    await revocations.rebuild(test_db)
+
+    # Revocado por otro proceso después de construir el filtro
+    await test_db.revoked_tokens.insert_one({
+        "jti": "de-otro-proceso",
+        "expires_at": datetime.utcnow() + timedelta(hours=1),
+        "revoked_at": datetime.utcnow(),
+    })
+    # La petición no espera a la actualización: se hace en segundo plano
+    await revocations.is_revoked(test_db, "cualquiera")
+    await revocations._refresh_task
+
+    assert await revocations.is_revoked(test_db, "de-otro-proceso") is True
+    assert revocations.rebuilds == 1
+    assert revocations.refreshes >= 1
+
+async def test_concurrent_requests_share_one_refresh(test_db, mocker):
+    """Testea que las peticiones simultáneas con el filtro caducado lanzan una sola actualización."""
+    revocations = RevocationFilter(capacity=1000, refresh_seconds=0)
+    await revocations.rebuild(test_db)
+    refresh = mocker.spy(revocations, "refresh")
+
+    await asyncio.gather(*(revocations.is_revoked(test_db, f"jti-{i}") for i in range(20)))
+    await revocations._refresh_task
+
+    assert refresh.call_count == 1
+
+async def test_first_check_waits_for_the_filter(test_db):
+    """Testea que, sin filtro construido, la primera comprobación lo construye antes de responder."""
+    await test_db.revoked_tokens.delete_many({})
+    await test_db.revoked_tokens.insert_one({
+        "jti": "revocado", "expires_at": datetime.utcnow() + timedelta(hours=1), "revoked_at": datetime.utcnow(),
+    })
+    revocations = RevocationFilter(capacity=1000)
+
+    assert await revocations.is_revoked(test_db, "revocado") is True
+    assert revocations.rebuilds == 1
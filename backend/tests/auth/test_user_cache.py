@@ -0,0 +1,52 @@
+import time
+
+from auth.user_cache import UserContextCache
+
+
+def test_cache_hit_and_miss_counters():
+    """Testea que los aciertos y fallos se contabilizan."""
+    cache = UserContextCache(max_size=10, ttl_seconds=60)
+    assert cache.get("a@example.com") is None
+
+    cache.set("a@example.com", {"id": "1", "email": "a@example.com"})
+    assert cache.get("a@example.com")["id"] == "1"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+def test_cache_returns_copies():
+    """Testea que modificar el contexto devuelto no altera la entrada cacheada."""
+    cache = UserContextCache()
+    cache.set("a@example.com", {"id": "1"})
+    cache.get("a@example.com")["id"] = "modificado"
+    assert cache.get("a@example.com")["id"] == "1"
+
+def test_cache_ttl_expiration():
+    """Testea que las entradas caducan tras el TTL."""
+    cache = UserContextCache(ttl_seconds=0.01)
+    cache.set("a@example.com", {"id": "1"})
+    time.sleep(0.02)
+    assert cache.get("a@example.com") is None
+    assert cache.stats()["size"] == 0
+
+def test_cache_lru_eviction():
+    """Testea que se descarta la entrada menos usada al superar el tamaño máximo."""
+    cache = UserContextCache(max_size=2)
+    cache.set("a", {"id": "1"})
+    cache.set("b", {"id": "2"})
+    cache.get("a")
+    cache.set("c", {"id": "3"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_invalidate_user_by_id():
+    """Testea la invalidación por ID de usuario (p. ej. tras cambiar el email)."""
+    cache = UserContextCache()
+    cache.set("old@example.com", {"id": "42"})
+    cache.invalidate_user("42")
+    assert cache.get("old@example.com") is None
@@ -1,7 +1,6 @@
 import pytest
 import os
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi.testclient import TestClient
 from fastapi import status # Importar status
 from dotenv import load_dotenv
@@ -10,15 +9,20 @@ import pytest_asyncio
 # Cargar variables de entorno desde .env
 load_dotenv()
 
-# Obtener las URLs de la BD
+# Obtener las URLs de la BD. Sin TEST_DATABASE_URL se usa el backend en memoria,
+# de modo que la suite funciona sin MongoDB (y en paralelo, un almacén por proceso)
 original_db_url = os.getenv("DATABASE_URL")
-test_db_url = os.getenv("TEST_DATABASE_URL")
-if not test_db_url:
-    raise ValueError("TEST_DATABASE_URL no está definida en el archivo .env")
+test_db_url = os.getenv("TEST_DATABASE_URL", "memory://localhost/test_obdy")
+
+# Valores por defecto para firmar tokens si no hay .env
+os.environ.setdefault("SECRET_KEY", "clave-de-pruebas")
+os.environ.setdefault("ALGORITHM", "HS256")
 
 # Ahora importar la app y la instancia db (usará la URL por defecto inicialmente)
 from main import app
 from database import db
+from auth.user_cache import user_cache
+from auth.rate_limiter import auth_rate_limiter
 
 # Usar pytest_asyncio.fixture para fixtures asíncronas
 # Scope "function"
@@ -43,10 +47,14 @@ async def test_db():
         print(f"Error haciendo ping a la BD de prueba: {e}")
         raise RuntimeError(f"No se pudo hacer ping a la base de datos de prueba: {test_db_url}") from e
 
+    # Los contextos de usuario cacheados apuntan a IDs de la limpieza anterior
+    user_cache.clear()
+    auth_rate_limiter.reset()
+
     # Limpieza ANTES del test (de la base de datos de PRUEBA)
     print(f"Limpiando colecciones en BD de prueba: {db.db.name}")
     await db.db.users.delete_many({}) # Limpiar la colección de usuarios
-    collections_to_clear = ["vehicles", "trips", "chats", "favorite_stations", "fs.files", "fs.chunks"] # Añadir 'favorite_stations' y GridFS
+    collections_to_clear = ["vehicles", "trips", "chats", "favorite_stations", "logos", "brand_logos", "manuals", "manual_texts", "maintenance_ai_cache", "maintenance_jobs", "fs.files", "fs.chunks"] # Añadir 'favorite_stations' y GridFS
     existing_collections = await db.db.list_collection_names()
     for col_name in collections_to_clear:
         if col_name in existing_collections:
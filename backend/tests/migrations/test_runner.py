@@ -0,0 +1,182 @@
+import asyncio
+import base64
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from bson import ObjectId
+
+from migrations.duplicates import DuplicateKeysError, unique_index_conflicts
+from migrations.logos import dedupe_inline_logos
+from migrations.manuals import dedupe_manuals
+from migrations.runner import LOCK_ID, MIGRATIONS, _plan_stages, create_declared_indexes, run_migrations
+from storage import gridfs_bucket
+from utils.manual_store import register_manual
+
+
+def test_plan_stages_detects_nested_collscan():
+    """Testea que se recorren las etapas anidadas del plan de explain."""
+    plan = {
+        "stage": "SORT",
+        "inputStage": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}},
+    }
+    assert _plan_stages(plan) == ["SORT", "FETCH", "COLLSCAN"]
+
+def test_plan_stages_with_or_branches():
+    """Testea los planes con varias ramas (inputStages)."""
+    plan = {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}
+    assert "COLLSCAN" in _plan_stages(plan)
+
+async def test_run_migrations_is_idempotent(test_db):
+    """Testea que cada migración se aplica una sola vez y queda registrada."""
+    await test_db.schema_migrations.delete_many({})
+
+    applied = await run_migrations(test_db)
+    assert applied == [m.version for m in MIGRATIONS]
+    assert await run_migrations(test_db) == []
+
+    indexes = await test_db.users.index_information()
+    assert indexes["users_email_unique"]["unique"] is True
+
+async def test_startup_skips_data_migrations(test_db):
+    """Testea que al arrancar solo se aplican las migraciones de índices."""
+    await test_db.schema_migrations.delete_many({})
+
+    applied = await run_migrations(test_db, include_data=False)
+
+    assert applied == [m.version for m in MIGRATIONS if not m.data]
+    assert await run_migrations(test_db) == [m.version for m in MIGRATIONS if m.data]
+
+async def test_migrations_are_skipped_while_another_process_holds_the_lock(test_db):
+    """Testea que un segundo proceso no aplica migraciones mientras otro tiene el cerrojo."""
+    await test_db.schema_migrations.delete_many({})
+    await test_db.schema_migrations.insert_one(
+        {"_id": LOCK_ID, "owner": "otro", "expires_at": datetime.utcnow() + timedelta(minutes=5)}
+    )
+
+    assert await run_migrations(test_db) == []
+    assert await test_db.schema_migrations.count_documents({}) == 1
+
+    # El cerrojo caducado de un proceso que murió se puede tomar
+    await test_db.schema_migrations.update_one(
+        {"_id": LOCK_ID}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    assert await run_migrations(test_db) == [m.version for m in MIGRATIONS]
+    assert await test_db.schema_migrations.find_one({"_id": LOCK_ID}) is None
+
+async def test_concurrent_runs_apply_each_migration_once(test_db):
+    """Testea que dos arranques simultáneos no aplican dos veces las mismas migraciones."""
+    await test_db.schema_migrations.delete_many({})
+
+    first, second = await asyncio.gather(run_migrations(test_db), run_migrations(test_db))
+
+    assert sorted(first + second) == [m.version for m in MIGRATIONS]
+
+async def drop_index_if_exists(collection, name: str) -> None:
+    if name in await collection.index_information():
+        await collection.drop_index(name)
+
+async def test_duplicate_favorite_stations_are_removed(test_db):
+    """Testea que las favoritas repetidas se borran (queda la más antigua) antes de crear el índice único."""
+    await drop_index_if_exists(test_db.favorite_stations, "favorite_stations_user_station_unique")
+    user_id = ObjectId()
+    oldest, newer = ObjectId(), ObjectId()
+    await test_db.favorite_stations.insert_many([
+        {"_id": oldest, "user_id": user_id, "station_id": "1111"},
+        {"_id": newer, "user_id": user_id, "station_id": "1111"},
+        {"_id": ObjectId(), "user_id": user_id, "station_id": "2222"},
+    ])
+
+    await create_declared_indexes(test_db)
+
+    assert await test_db.favorite_stations.count_documents({"station_id": "1111"}) == 1
+    assert await test_db.favorite_stations.find_one({"_id": oldest}) is not None
+    assert "favorite_stations_user_station_unique" in await test_db.favorite_stations.index_information()
+
+async def test_duplicate_emails_fail_with_the_offending_keys(test_db):
+    """Testea que los usuarios repetidos no se borran y la migración falla indicando el email."""
+    await drop_index_if_exists(test_db.users, "users_email_unique")
+    await test_db.users.insert_many([
+        {"_id": ObjectId(), "email": "repetido@example.com"},
+        {"_id": ObjectId(), "email": "repetido@example.com"},
+    ])
+
+    conflicts = await unique_index_conflicts(test_db)
+    assert [d["key"] for d in conflicts["users_email_unique"]] == [{"email": "repetido@example.com"}]
+    with pytest.raises(DuplicateKeysError, match="repetido@example.com"):
+        await create_declared_indexes(test_db)
+    assert await test_db.users.count_documents({"email": "repetido@example.com"}) == 2
+
+    # Resuelto a mano, la migración crea el índice
+    await test_db.users.delete_one({"email": "repetido@example.com"})
+    await create_declared_indexes(test_db)
+    assert "users_email_unique" in await test_db.users.index_information()
+
+async def test_inline_logos_are_deduplicated(test_db):
+    """Testea que la migración de logos deja una copia por contenido y el hash en cada vehículo."""
+    await test_db.logos.delete_many({})
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), (120, 0, 0)).save(buffer, "PNG")
+    logo = base64.b64encode(buffer.getvalue()).decode()
+    await test_db.vehicles.insert_many([
+        {"_id": ObjectId(), "brand": "SEAT", "logo": logo},
+        {"_id": ObjectId(), "brand": "Seat", "logo": logo},
+        {"_id": ObjectId(), "brand": "Kia", "logo": None},
+    ])
+
+    await dedupe_inline_logos(test_db)
+
+    # Un original (más sus miniaturas)
+    assert await test_db.logos.count_documents({"variant_of": {"$exists": False}}) == 1
+    stored = await test_db.logos.find_one({"variant_of": {"$exists": False}})
+    assert stored["brands"] == ["seat"]
+    assert await test_db.vehicles.count_documents({"logo": {"$exists": True}}) == 0
+    assert await test_db.vehicles.count_documents({"logo_hash": stored["_id"]}) == 2
+
+async def test_existing_manuals_are_deduplicated(test_db):
+    """Testea que la migración de manuales deja una copia de cada PDF con su recuento."""
+    bucket = gridfs_bucket(test_db)
+    first = await bucket.upload_from_stream("a.pdf", b"%PDF-1.4 manual")
+    second = await bucket.upload_from_stream("b.pdf", b"%PDF-1.4 manual")
+    other = await bucket.upload_from_stream("c.pdf", b"%PDF-1.4 otro")
+    await test_db.vehicles.insert_many([
+        {"_id": ObjectId(), "pdf_manual_grid_fs_id": str(first)},
+        {"_id": ObjectId(), "pdf_manual_grid_fs_id": str(second)},
+        {"_id": ObjectId(), "pdf_manual_grid_fs_id": str(other)},
+        {"_id": ObjectId(), "pdf_manual_grid_fs_id": str(ObjectId())},
+    ])
+
+    await dedupe_manuals(test_db)
+
+    assert await test_db["fs.files"].count_documents({}) == 2
+    shared = await test_db.manuals.find_one({"file_id": first})
+    assert shared["refcount"] == 2
+    assert await test_db.vehicles.count_documents({"pdf_manual_grid_fs_id": str(first), "pdf_manual_hash": shared["_id"]}) == 2
+    assert await test_db.vehicles.count_documents({"pdf_manual_grid_fs_id": {"$exists": False}}) == 1
+
+async def test_concurrent_manual_migrations_keep_the_file(test_db):
+    """Testea que dos migraciones de manuales a la vez no borran el único fichero ni cuentan dos veces."""
+    bucket = gridfs_bucket(test_db)
+    file_id = await bucket.upload_from_stream("a.pdf", b"%PDF-1.4 manual")
+    await test_db.vehicles.insert_one({"_id": ObjectId(), "pdf_manual_grid_fs_id": str(file_id)})
+
+    await asyncio.gather(dedupe_manuals(test_db), dedupe_manuals(test_db))
+
+    manual = await test_db.manuals.find_one({"file_id": file_id})
+    assert manual["refcount"] == 1
+    assert await test_db["fs.files"].count_documents({"_id": file_id}) == 1
+    assert await test_db.vehicles.count_documents({"pdf_manual_claimed_at": {"$exists": True}}) == 0
+
+async def test_register_manual_keeps_its_own_file(test_db):
+    """Testea que registrar otra vez el mismo fichero no lo borra de GridFS."""
+    bucket = gridfs_bucket(test_db)
+    file_id = await bucket.upload_from_stream("a.pdf", b"%PDF-1.4 manual")
+    await register_manual(test_db, bucket, "hash", file_id, 15)
+
+    manual = await register_manual(test_db, bucket, "hash", file_id, 15)
+
+    assert manual["file_id"] == file_id
+    assert await test_db["fs.files"].count_documents({"_id": file_id}) == 1
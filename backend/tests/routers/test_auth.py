@@ -113,6 +113,31 @@ def test_change_password_success(client: TestClient):
     )
     assert login_response_old.status_code == status.HTTP_401_UNAUTHORIZED
 
+def test_change_password_checks_the_stored_hash(client: TestClient):
+    """Testea que, tras un cambio en otro worker, la contraseña antigua no sirve aunque el usuario esté en caché."""
+    from auth.user_cache import user_cache
+    from database import db
+    from auth.password_pool import password_pool
+
+    token, _ = create_user_and_get_token(client, "changepw_other_worker")
+    headers = {"Authorization": f"Bearer {token}"}
+    email = "test_changepw_other_worker@example.com"
+    assert client.get("/users/me", headers=headers).status_code == status.HTTP_200_OK
+    cached = user_cache.get(email)
+    assert cached is not None and "password_hash" not in cached
+
+    # Otro worker cambia la contraseña: la caché de este proceso no se entera
+    client.portal.call(
+        db.db.users.update_one, {"email": email}, {"$set": {"password_hash": password_pool.crypt_context.hash("otra-clave")}}
+    )
+
+    response = client.put(
+        "/auth/change-password",
+        headers=headers,
+        json={"current_password": "password123", "new_password": "robada456"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
 def test_change_password_wrong_current(client: TestClient):
     """Testea el cambio de contraseña con la contraseña actual incorrecta."""
     old_password = "password123"
@@ -138,4 +163,126 @@ def test_change_password_unauthorized(client: TestClient):
         json={"current_password": "any", "new_password": "any"}
     )
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
-    assert "Not authenticated" in response.json()["detail"] # Esperamos el error estándar de FastAPI 
\ No newline at end of file
+    assert "Not authenticated" in response.json()["detail"] # Esperamos el error estándar de FastAPI 
+# --- Tests para tokens con claims de identidad ---
+
+def test_identity_token_revoked_after_password_change(client: TestClient, monkeypatch):
+    """Testea que los tokens de identidad se revocan al cambiar la contraseña."""
+    monkeypatch.setenv("JWT_IDENTITY_CLAIMS", "true")
+    token, user_id = create_user_and_get_token(client, "identity_revoke")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    me_response = client.get("/users/me", headers=headers)
+    assert me_response.status_code == status.HTTP_200_OK
+    assert me_response.json()["id"] == user_id
+
+    response = client.put(
+        "/auth/change-password",
+        headers=headers,
+        json={"current_password": "password123", "new_password": "newpassword456"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    new_token = response.json()["access_token"]
+
+    # El token anterior lleva una época obsoleta
+    assert client.get("/users/me", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    new_headers = {"Authorization": f"Bearer {new_token}"}
+    assert client.get("/users/me", headers=new_headers).status_code == status.HTTP_200_OK
+
+def test_login_rate_limited_per_email(client: TestClient):
+    """Testea que los intentos de login repetidos sobre un email se cortan con 429."""
+    from auth.rate_limiter import auth_rate_limiter
+
+    attempts = int(auth_rate_limiter.email_bucket.capacity)
+    for _ in range(attempts):
+        response = client.post(
+            "/auth/login",
+            data={"username": "stuffing@example.com", "password": "wrongpassword"}
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post(
+        "/auth/login",
+        data={"username": "stuffing@example.com", "password": "wrongpassword"}
+    )
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert "Retry-After" in response.headers
+
+# --- Tests para tokens de refresco ---
+
+def test_refresh_token_rotation_and_logout(client: TestClient, monkeypatch):
+    """Testea la renovación con rotación y la revocación al cerrar sesión."""
+    monkeypatch.setenv("REFRESH_TOKENS_ENABLED", "true")
+    register_response = client.post(
+        "/auth/register",
+        json={"username": "refreshuser", "email": "refresh@example.com", "password": "password123"}
+    )
+    assert register_response.status_code == status.HTTP_201_CREATED
+    refresh_token = register_response.json()["refresh_token"]
+    assert refresh_token
+
+    # Un token de refresco no sirve como token de acceso
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {refresh_token}"}).status_code == status.HTTP_401_UNAUTHORIZED
+
+    refresh_response = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert refresh_response.status_code == status.HTTP_200_OK
+    new_tokens = refresh_response.json()
+
+    # El token de refresco usado queda revocado tras la rotación
+    reuse_response = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert reuse_response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    headers = {"Authorization": f"Bearer {new_tokens['access_token']}"}
+    assert client.get("/users/me", headers=headers).status_code == status.HTTP_200_OK
+
+    logout_response = client.post("/auth/logout", headers=headers, json={"refresh_token": new_tokens["refresh_token"]})
+    assert logout_response.status_code == status.HTTP_204_NO_CONTENT
+    assert client.get("/users/me", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.post("/auth/refresh", json={"refresh_token": new_tokens["refresh_token"]}).status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_logout_with_a_token_without_jti(client: TestClient):
+    """Testea que el cierre de sesión funciona con los tokens emitidos antes de tener jti."""
+    import os
+    from datetime import datetime, timedelta
+    from jose import jwt
+
+    create_user_and_get_token(client, "legacy_logout")
+    legacy_token = jwt.encode(
+        {"sub": "test_legacy_logout@example.com", "exp": datetime.utcnow() + timedelta(minutes=5)},
+        os.getenv("SECRET_KEY"),
+        algorithm=os.getenv("ALGORITHM")
+    )
+
+    response = client.post("/auth/logout", headers={"Authorization": f"Bearer {legacy_token}"})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+async def test_concurrent_refreshes_with_the_same_token(test_db, monkeypatch):
+    """Testea que dos renovaciones simultáneas con el mismo token de refresco solo dan tokens a una."""
+    import asyncio
+    import httpx
+    from main import app
+    from routers import auth
+
+    monkeypatch.setenv("REFRESH_TOKENS_ENABLED", "true")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        register_response = await client.post(
+            "/auth/register",
+            json={"username": "raceuser", "email": "race@example.com", "password": "password123"}
+        )
+        refresh_token = register_response.json()["refresh_token"]
+
+        # Ensancha la ventana entre la comprobación de revocación y la rotación
+        find_by_email = auth.User.find_by_email
+
+        async def slow_find_by_email(database, email):
+            await asyncio.sleep(0.05)
+            return await find_by_email(database, email)
+
+        monkeypatch.setattr(auth.User, "find_by_email", slow_find_by_email)
+        responses = await asyncio.gather(*(
+            client.post("/auth/refresh", json={"refresh_token": refresh_token}) for _ in range(2)
+        ))
+
+    assert sorted(response.status_code for response in responses) == [
+        status.HTTP_200_OK, status.HTTP_401_UNAUTHORIZED
+    ]
@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from ..conftest import create_user_and_get_token
+
+
+def test_readiness_reports_database_and_pool(client: TestClient):
+    """Testea que /health/ready hace ping a la BD y devuelve las métricas del pool."""
+    response = client.get("/health/ready")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "ready", "database": {"status": "ok"}}
+
+def test_component_stats_require_the_internal_token(client: TestClient, monkeypatch):
+    """Testea que las métricas internas solo se sirven con el token interno."""
+    assert client.get("/health/stats").status_code == status.HTTP_404_NOT_FOUND
+
+    monkeypatch.setenv("HEALTH_STATS_TOKEN", "secreto")
+    assert client.get("/health/stats").status_code == status.HTTP_403_FORBIDDEN
+    assert client.get("/health/stats", headers={"X-Internal-Token": "otro"}).status_code == status.HTTP_403_FORBIDDEN
+    assert client.get("/health/queries").status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.get("/health/stats", headers={"X-Internal-Token": "secreto"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["database"]["status"] == "ok"
+    assert "checkout_wait_ms" in data["pool"]
+    assert "hit_ratio" in data["user_cache"]
+    assert "latency_ms" in data["llm"]
+
+def test_readiness_without_database(client: TestClient, mocker):
+    """Testea que /health/ready devuelve 503 si no hay conexión a la BD."""
+    mocker.patch("routers.health.db.client", None)
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["status"] == "unavailable"
+
+def test_query_metrics_are_attributed_to_routes(client: TestClient, monkeypatch):
+    """Testea que los comandos de MongoDB se atribuyen a la ruta que los ejecuta."""
+    from utils.command_metrics import route_query_metrics
+    route_query_metrics.reset()
+
+    token, _ = create_user_and_get_token(client, "query_metrics")
+    client.get("/vehicles", headers={"Authorization": f"Bearer {token}"})
+
+    monkeypatch.setenv("HEALTH_STATS_TOKEN", "secreto")
+    routes = client.get("/health/queries", headers={"X-Internal-Token": "secreto"}).json()["routes"]
+    assert routes["POST /auth/register"]["by_command"]["insert users"] == 1
+    assert routes["GET /vehicles"]["requests"] == 1
+    assert "find vehicles" in routes["GET /vehicles"]["by_command"]
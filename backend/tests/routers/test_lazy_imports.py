@@ -0,0 +1,7 @@
+from benchmarks.import_time import measure
+
+
+def test_app_import_does_not_load_heavy_dependencies():
+    """Testea que importar la app no carga PyMuPDF, Pillow, requests, bs4 ni httpx (arranque en frío)."""
+    result = measure("main")
+    assert result["heavy"] == [], f"Dependencias cargadas al importar main: {result['heavy']}"
@@ -0,0 +1,108 @@
+import base64
+import io
+
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from ..conftest import create_user_and_get_token
+from .test_vehicles import VEHICLE_DATA_1
+
+from PIL import Image
+
+
+def png_bytes(color=(0, 90, 200), size=(64, 32)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG_LOGO = png_bytes()
+
+
+def test_logo_is_stored_once_and_served_with_etag(client: TestClient):
+    """Testea que el logo se guarda por hash y se sirve con ETag y caché larga."""
+    token, _ = create_user_and_get_token(client, "logo_store")
+    headers = {"Authorization": f"Bearer {token}"}
+    logo_b64 = base64.b64encode(PNG_LOGO).decode()
+
+    vehicle_ids = []
+    for plate in ("1111AAA", "2222BBB"):
+        created = client.post("/vehicles", headers=headers, json={**VEHICLE_DATA_1, "licensePlate": plate})
+        vehicle_ids.append(created.json()["id"])
+        updated = client.put(f"/vehicles/{vehicle_ids[-1]}", headers=headers, json={"logo": logo_b64})
+        assert updated.status_code == status.HTTP_200_OK
+    data = updated.json()
+    assert data["logo_url"] == f"/logos/{data['logo_hash']}"
+
+    summary = client.get("/vehicles", headers=headers, params={"view": "summary"}).json()
+    assert {vehicle["logo_hash"] for vehicle in summary} == {data["logo_hash"]}
+    assert all("logo" not in vehicle for vehicle in summary)
+
+    response = client.get(data["logo_url"])
+    assert response.status_code == status.HTTP_200_OK
+    assert base64.b64encode(response.content).decode() == data["logo"]
+    assert Image.open(io.BytesIO(response.content)).size == (64, 32)
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["content-security-policy"] == "default-src 'none'; sandbox"
+    assert response.headers["etag"] == f'"{data["logo_hash"]}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    cached = client.get(data["logo_url"], headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.content == b""
+
+def test_unknown_logo_returns_404(client: TestClient):
+    """Testea que un hash inexistente o mal formado devuelve 404."""
+    assert client.get("/logos/" + "0" * 64).status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/logos/no-es-un-hash").status_code == status.HTTP_404_NOT_FOUND
+
+def test_invalid_manual_logo_is_rejected(client: TestClient):
+    """Testea que un logo manual que no es base64 devuelve 400."""
+    token, _ = create_user_and_get_token(client, "logo_invalid")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+
+    response = client.put(f"/vehicles/{vehicle_id}", headers=headers, json={"logo": "no es base64!"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_non_raster_logos_are_rejected(client: TestClient):
+    """Testea que SVG, HTML o un PNG con HTML añadido no se sirven tal cual desde /logos."""
+    token, _ = create_user_and_get_token(client, "logo_xss")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+
+    for payload in (
+        b"<svg xmlns='http://www.w3.org/2000/svg' onload='alert(1)'></svg>",
+        b"<html><script>alert(1)</script></html>",
+        b"\x89PNG\r\n\x1a\n<script>alert(1)</script>",
+    ):
+        response = client.put(f"/vehicles/{vehicle_id}", headers=headers,
+                              json={"logo": base64.b64encode(payload).decode()})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Los bytes añadidos a una imagen válida desaparecen al volver a codificarla
+    polyglot = PNG_LOGO + b"<script>alert(1)</script>"
+    logo_url = client.put(f"/vehicles/{vehicle_id}", headers=headers,
+                          json={"logo": base64.b64encode(polyglot).decode()}).json()["logo_url"]
+    assert b"<script>" not in client.get(logo_url).content
+
+def test_logo_thumbnail_by_size(client: TestClient):
+    """Testea que ?size= sirve la miniatura WebP normalizada con su propio ETag."""
+    token, _ = create_user_and_get_token(client, "logo_thumbnail")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+    logo_url = client.put(
+        f"/vehicles/{vehicle_id}", headers=headers, json={"logo": base64.b64encode(png_bytes(size=(300, 300))).decode()}
+    ).json()["logo_url"]
+
+    response = client.get(logo_url, params={"size": 90})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert "sandbox" in response.headers["content-security-policy"]
+    assert Image.open(io.BytesIO(response.content)).size == (96, 96)
+    assert response.headers["etag"] != f'"{logo_url.rsplit("/", 1)[1]}"'
+    cached = client.get(logo_url, params={"size": 90}, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
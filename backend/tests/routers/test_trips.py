@@ -157,6 +157,28 @@ def test_add_single_gps_point(client: TestClient):
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"message": "Punto GPS añadido con éxito"}
 
+def test_get_trips_summary_view_skips_gps_points(client: TestClient):
+    """Testea que view=summary y fields= no devuelven los puntos GPS."""
+    token, _ = create_user_and_get_token(client, "trip_summary_view")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_resp = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1)
+    trip_id = create_active_trip(client, headers, vehicle_resp.json()["id"])
+    client.post(f"/trips/{trip_id}/gps-points/batch", headers=headers, json=GPS_POINTS_BATCH)
+
+    full = client.get("/trips", headers=headers)
+    assert len(full.json()[0]["gps_points"]) == 2
+
+    summary = client.get("/trips", headers=headers, params={"view": "summary"})
+    assert summary.status_code == status.HTTP_200_OK
+    assert "gps_points" not in summary.json()[0]
+    assert summary.json()[0]["id"] == trip_id
+
+    selected = client.get("/trips", headers=headers, params={"fields": "start_time,distance_in_km"})
+    assert set(selected.json()[0]) == {"id", "start_time", "distance_in_km"}
+
+    invalid_view = client.get("/trips", headers=headers, params={"view": "compact"})
+    assert invalid_view.status_code == status.HTTP_400_BAD_REQUEST
+
 def test_end_trip_already_ended(client: TestClient):
     token, _ = create_user_and_get_token(client, "trip_end_ended")
     headers = {"Authorization": f"Bearer {token}"}
@@ -87,4 +87,15 @@ def test_update_user_invalid_id_format(client: TestClient):
     # FastAPI/Pydantic debería devolver un error de validación (422) si el ID no es válido
     # antes de que llegue a nuestra lógica de ruta que compara IDs.
     response = client.put(f"/users/{invalid_id}", headers=headers, json=update_payload)
-    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY 
\ No newline at end of file
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY 
+def test_update_user_email_invalidates_cached_context(client: TestClient):
+    """Testea que tras cambiar el email el token antiguo deja de resolverse desde la caché."""
+    token, user_id = create_user_and_get_token(client, "update_email_cache")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.put(f"/users/{user_id}", headers=headers, json={"email": "nuevo_email_cache@example.com"})
+    assert response.status_code == status.HTTP_200_OK
+
+    # El 'sub' del token antiguo ya no corresponde a ningún usuario
+    me_response = client.get("/users/me", headers=headers)
+    assert me_response.status_code == status.HTTP_401_UNAUTHORIZED
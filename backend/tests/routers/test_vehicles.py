@@ -1,5 +1,6 @@
 import pytest
 import io
+import asyncio
 from fastapi.testclient import TestClient
 from fastapi import status
 from bson import ObjectId
@@ -86,6 +87,27 @@ def test_get_user_vehicles_success(client: TestClient):
     assert data[0]["licensePlate"] == VEHICLE_DATA_1["licensePlate"]
     assert data[1]["licensePlate"] == VEHICLE_DATA_2["licensePlate"]
 
+def test_get_user_vehicles_views_and_fields(client: TestClient):
+    """Testea view=summary (sin logo) y la selección de campos con fields=."""
+    token, _ = create_user_and_get_token(client, "vehicle_get_views")
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1)
+
+    summary = client.get("/vehicles", headers=headers, params={"view": "summary"})
+    assert summary.status_code == status.HTTP_200_OK
+    assert "logo" not in summary.json()[0]
+    assert summary.json()[0]["licensePlate"] == VEHICLE_DATA_1["licensePlate"]
+
+    full = client.get("/vehicles", headers=headers)
+    assert "logo" in full.json()[0]
+
+    selected = client.get("/vehicles", headers=headers, params={"fields": "brand,model"})
+    assert selected.status_code == status.HTTP_200_OK
+    assert set(selected.json()[0]) == {"id", "brand", "model"}
+
+    invalid = client.get("/vehicles", headers=headers, params={"fields": "brand,password"})
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+
 def test_get_specific_vehicle_success(client: TestClient):
     token, _ = create_user_and_get_token(client, "vehicle_get_one")
     headers = {"Authorization": f"Bearer {token}"}
@@ -142,6 +164,18 @@ def test_update_vehicle_success(client: TestClient):
     assert data["model"] == "Corolla Hybrid"
     assert data["brand"] == VEHICLE_DATA_1["brand"] # Brand no debería cambiar
 
+def test_update_brand_when_logo_lookup_fails(client: TestClient, mocker):
+    """Testea que un fallo al buscar el logo no impide cambiar la marca."""
+    token, _ = create_user_and_get_token(client, "update_brand_logo_error")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+    mocker.patch("routers.vehicles.logo_resolver.resolve", side_effect=ValueError("URL inválida"))
+
+    response = client.put(f"/vehicles/{vehicle_id}", headers=headers, json={"brand": "Lexus"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["brand"] == "Lexus"
+
 def test_delete_vehicle_success(client: TestClient):
     token, _ = create_user_and_get_token(client, "vehicle_delete")
     headers = {"Authorization": f"Bearer {token}"}
@@ -270,6 +304,145 @@ def test_get_manual_success(client: TestClient):
     assert response.content == fake_pdf_content
     assert response.headers["content-type"] == "application/pdf"
 
+def test_get_manual_ranges_and_etag(client: TestClient):
+    """Testea la descarga por rangos (también entre chunks de GridFS) y la revalidación con ETag."""
+    token, _ = create_user_and_get_token(client, "manual_ranges")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+    big_pdf = b"%PDF-1.4\n" + bytes(range(256)) * 2400  # ~600 KB, varios chunks de GridFS
+    files = {"file": ("manual.pdf", io.BytesIO(big_pdf), "application/pdf")}
+    assert client.post(f"/vehicles/{vehicle_id}/manual", headers=headers, files=files).status_code == status.HTTP_201_CREATED
+
+    full = client.get(f"/vehicles/{vehicle_id}/manual", headers=headers)
+    assert full.content == big_pdf
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+
+    partial = client.get(f"/vehicles/{vehicle_id}/manual", headers={**headers, "Range": "bytes=261000-262999"})
+    assert partial.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert partial.content == big_pdf[261000:263000]
+    assert partial.headers["content-range"] == f"bytes 261000-262999/{len(big_pdf)}"
+
+    suffix = client.get(f"/vehicles/{vehicle_id}/manual", headers={**headers, "Range": "bytes=-100"})
+    assert suffix.content == big_pdf[-100:]
+
+    stale = client.get(f"/vehicles/{vehicle_id}/manual", headers={**headers, "Range": "bytes=0-9", "If-Range": '"otro"'})
+    assert stale.status_code == status.HTTP_200_OK
+    assert stale.content == big_pdf
+
+    outside = client.get(f"/vehicles/{vehicle_id}/manual", headers={**headers, "Range": f"bytes={len(big_pdf)}-"})
+    assert outside.status_code == status.HTTP_416_RANGE_NOT_SATISFIABLE
+
+    cached = client.get(f"/vehicles/{vehicle_id}/manual", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+def test_identical_manuals_are_stored_once(client: TestClient):
+    """Testea que un mismo PDF se guarda una vez y solo se borra al soltar la última referencia."""
+    token_a, _ = create_user_and_get_token(client, "manual_dedupe_a")
+    token_b, _ = create_user_and_get_token(client, "manual_dedupe_b")
+    headers_a = {"Authorization": f"Bearer {token_a}"}
+    headers_b = {"Authorization": f"Bearer {token_b}"}
+    vehicle_a = client.post("/vehicles", headers=headers_a, json=VEHICLE_DATA_1).json()["id"]
+    vehicle_b = client.post("/vehicles", headers=headers_b, json=VEHICLE_DATA_2).json()["id"]
+
+    upload_a = client.post(f"/vehicles/{vehicle_a}/manual", headers=headers_a,
+                           files={"file": ("manual.pdf", io.BytesIO(fake_pdf_content), "application/pdf")})
+    upload_b = client.post(f"/vehicles/{vehicle_b}/manual/update", headers=headers_b,
+                           files={"file": ("otro.pdf", io.BytesIO(fake_pdf_content), "application/pdf")})
+    assert upload_a.status_code == status.HTTP_201_CREATED
+    assert upload_b.status_code == status.HTTP_200_OK
+    file_id = upload_a.json()["pdf_manual_grid_fs_id"]
+    assert client.get(f"/vehicles/{vehicle_b}", headers=headers_b).json()["pdf_manual_grid_fs_id"] == file_id
+
+    # Volver a subir el mismo PDF al mismo vehículo no cambia nada
+    again = client.post(f"/vehicles/{vehicle_a}/manual", headers=headers_a,
+                        files={"file": ("manual.pdf", io.BytesIO(fake_pdf_content), "application/pdf")})
+    assert again.json()["pdf_manual_grid_fs_id"] == file_id
+
+    # Al quitarlo de un vehículo el otro lo sigue teniendo
+    assert client.delete(f"/vehicles/{vehicle_a}/manual", headers=headers_a).status_code == status.HTTP_204_NO_CONTENT
+    assert client.get(f"/vehicles/{vehicle_b}/manual", headers=headers_b).content == fake_pdf_content
+
+    # Con la última referencia se borra: una nueva subida crea otro fichero
+    assert client.delete(f"/vehicles/{vehicle_b}", headers=headers_b).status_code == status.HTTP_204_NO_CONTENT
+    upload_c = client.post(f"/vehicles/{vehicle_a}/manual", headers=headers_a,
+                           files={"file": ("manual.pdf", io.BytesIO(fake_pdf_content), "application/pdf")})
+    assert upload_c.json()["pdf_manual_grid_fs_id"] != file_id
+
+def test_maintenance_ai_results_are_cached(client: TestClient, mocker):
+    """Testea que el mismo manual no vuelve a llamar al modelo y que la respuesta indica el acierto de caché."""
+    from utils.maintenance_cache import maintenance_cache
+    maintenance_cache.clear()
+    completion = mocker.patch(
+        "utils.maintenance_ai.llm_client.chat_completion",
+        return_value={"choices": [{"message": {"content": '[{"type":"cambio de aceite","recommended_interval_km":15000,"notes":"Motor"}]'}}]},
+    )
+    token, _ = create_user_and_get_token(client, "maintenance_ai_cache")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+    client.post(f"/vehicles/{vehicle_id}/manual", headers=headers,
+                files={"file": ("manual.pdf", io.BytesIO(fake_pdf_content), "application/pdf")})
+
+    first = client.post(f"/vehicles/{vehicle_id}/maintenance-ai", headers=headers).json()
+    second = client.post(f"/vehicles/{vehicle_id}/maintenance-ai", headers=headers).json()
+
+    assert first["cached"] is False and second["cached"] is True
+    assert second["maintenance_recommendations"] == first["maintenance_recommendations"] == [
+        {"type": "Cambio de aceite", "recommended_interval_km": 15000, "notes": "Motor"}
+    ]
+    assert completion.call_count == 1
+
+    # Otro proceso (sin caché en memoria) la encuentra en MongoDB
+    maintenance_cache.clear()
+    assert client.post(f"/vehicles/{vehicle_id}/maintenance-ai", headers=headers).json()["cached"] is True
+    assert completion.call_count == 1
+
+def test_maintenance_ai_job_coalesces_and_reports_progress(client: TestClient, mocker):
+    """Testea que el análisis en segundo plano se une a un trabajo activo y devuelve el resultado al terminar."""
+    import time
+    from utils.maintenance_cache import maintenance_cache
+    maintenance_cache.clear()
+
+    async def slow_completion(data):
+        await asyncio.sleep(0.2)
+        return {"choices": [{"message": {"content": '[{"type":"bujías","recommended_interval_km":60000,"notes":""}]'}}]}
+
+    completion = mocker.patch("utils.maintenance_ai.llm_client.chat_completion", side_effect=slow_completion)
+    token, _ = create_user_and_get_token(client, "maintenance_ai_job")
+    headers = {"Authorization": f"Bearer {token}"}
+    vehicle_id = client.post("/vehicles", headers=headers, json=VEHICLE_DATA_1).json()["id"]
+    client.post(f"/vehicles/{vehicle_id}/manual", headers=headers,
+                files={"file": ("manual.pdf", io.BytesIO(fake_pdf_content), "application/pdf")})
+
+    first = client.post(f"/vehicles/{vehicle_id}/maintenance-ai/jobs", headers=headers)
+    second = client.post(f"/vehicles/{vehicle_id}/maintenance-ai/jobs", headers=headers)
+    assert first.status_code == second.status_code == status.HTTP_202_ACCEPTED
+    assert first.json()["coalesced"] is False and second.json()["coalesced"] is True
+    job_id = first.json()["jobId"]
+    assert second.json()["jobId"] == job_id
+
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(f"/vehicles/{vehicle_id}/maintenance-ai/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            break
+        assert job["status"] in ("queued", "running")
+        time.sleep(0.05)
+
+    assert job["status"] == "completed" and job["progress"] == 100
+    assert job["maintenance_recommendations"] == [{"type": "Bujías", "recommended_interval_km": 60000, "notes": ""}]
+    assert completion.call_count == 1
+
+    # Terminado, un nuevo envío crea otro trabajo (que encuentra el resultado en caché)
+    again = client.post(f"/vehicles/{vehicle_id}/maintenance-ai/jobs", headers=headers).json()
+    assert again["jobId"] != job_id and again["coalesced"] is False
+
+    # Otro usuario no puede consultar el trabajo
+    other_token, _ = create_user_and_get_token(client, "maintenance_ai_job_other")
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+    other_vehicle = client.post("/vehicles", headers=other_headers, json=VEHICLE_DATA_2).json()["id"]
+    assert client.get(f"/vehicles/{other_vehicle}/maintenance-ai/jobs/{job_id}", headers=other_headers).status_code == 404
+
 def test_get_manual_not_found(client: TestClient):
     token, _ = create_user_and_get_token(client, "manual_get_notfound")
     headers = {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from storage import MemoryClient, gridfs_bucket
+
+
+@pytest.fixture
+def memory_db():
+    client = MemoryClient(f"memory://tests-{ObjectId()}/obdy")
+    return client.get_database()
+
+
+async def test_push_each_and_inc_all_positional(memory_db):
+    """Testea $push con $each y $inc sobre todos los elementos con $[]."""
+    vehicle_id = (await memory_db.vehicles.insert_one({
+        "maintenance_records": [{"km_since_last_change": 10}, {"km_since_last_change": 0}],
+        "gps_points": [],
+    })).inserted_id
+
+    result = await memory_db.vehicles.update_one(
+        {"_id": vehicle_id},
+        {
+            "$inc": {"maintenance_records.$[].km_since_last_change": 5.5},
+            "$push": {"gps_points": {"$each": [{"lat": 1}, {"lat": 2}]}},
+        }
+    )
+
+    vehicle = await memory_db.vehicles.find_one({"_id": vehicle_id})
+    assert result.matched_count == 1 and result.modified_count == 1
+    assert [r["km_since_last_change"] for r in vehicle["maintenance_records"]] == [15.5, 5.5]
+    assert vehicle["gps_points"] == [{"lat": 1}, {"lat": 2}]
+
+async def test_pull_unset_and_nested_filters(memory_db):
+    """Testea $pull por subdocumento, $unset y filtros sobre campos de arrays."""
+    record_id = ObjectId()
+    await memory_db.vehicles.insert_one({
+        "_id": "v1", "pdf": "x", "maintenance_records": [{"_id": record_id}, {"_id": ObjectId()}],
+    })
+
+    assert await memory_db.vehicles.find_one({"maintenance_records._id": record_id}) is not None
+    await memory_db.vehicles.update_one(
+        {"_id": "v1"}, {"$pull": {"maintenance_records": {"_id": record_id}}, "$unset": {"pdf": ""}}
+    )
+
+    vehicle = await memory_db.vehicles.find_one({"_id": "v1"})
+    assert len(vehicle["maintenance_records"]) == 1
+    assert "pdf" not in vehicle
+
+async def test_upsert_with_set_on_insert(memory_db):
+    """Testea que $setOnInsert solo se aplica al crear el documento."""
+    for _ in range(2):
+        await memory_db.revoked_tokens.update_one(
+            {"jti": "abc"}, {"$setOnInsert": {"jti": "abc", "revoked": 1}}, upsert=True
+        )
+    await memory_db.revoked_tokens.update_one({"jti": "abc"}, {"$setOnInsert": {"revoked": 2}}, upsert=True)
+
+    documents = await memory_db.revoked_tokens.find({}).to_list(None)
+    assert len(documents) == 1
+    assert documents[0]["revoked"] == 1
+
+async def test_find_sort_limit_projection_and_comparisons(memory_db):
+    """Testea find con filtros de rango, orden descendente, límite y proyección."""
+    user_id = ObjectId()
+    start = datetime(2024, 1, 1)
+    for day in range(5):
+        await memory_db.trips.insert_one({"user_id": user_id, "start_time": start + timedelta(days=day), "n": day})
+
+    cursor = memory_db.trips.find({"user_id": user_id, "n": {"$gte": 1}}, {"n": 1, "_id": 0})
+    trips = await cursor.sort("start_time", -1).limit(2).to_list(length=2)
+
+    assert trips == [{"n": 4}, {"n": 3}]
+    assert [t["n"] async for t in memory_db.trips.find({"n": {"$in": [0, 2]}})] == [0, 2]
+
+async def test_aggregate_group(memory_db):
+    """Testea $match + $group con $sum y $avg como en las estadísticas de viajes."""
+    await memory_db.trips.insert_many([
+        {"vehicle_id": 1, "distance_in_km": 10, "average_speed_kmh": 40},
+        {"vehicle_id": 1, "distance_in_km": 5, "average_speed_kmh": 60},
+        {"vehicle_id": 2, "distance_in_km": 99},
+    ])
+
+    result = await memory_db.trips.aggregate([
+        {"$match": {"vehicle_id": 1}},
+        {"$group": {
+            "_id": None,
+            "total_trips": {"$sum": 1},
+            "total_distance": {"$sum": "$distance_in_km"},
+            "avg_speed": {"$avg": "$average_speed_kmh"},
+        }},
+    ]).to_list(length=1)
+
+    assert result == [{"_id": None, "total_trips": 2, "total_distance": 15, "avg_speed": 50.0}]
+
+async def test_find_one_and_update_returns_document(memory_db):
+    """Testea find_one_and_update con proyección y ReturnDocument.AFTER."""
+    user_id = (await memory_db.users.insert_one({"email": "a@example.com"})).inserted_id
+    user = await memory_db.users.find_one_and_update(
+        {"_id": user_id}, {"$inc": {"token_epoch": 1}},
+        projection={"token_epoch": 1}, return_document=ReturnDocument.AFTER,
+    )
+    assert user == {"_id": user_id, "token_epoch": 1}
+
+async def test_unique_index_and_partial_filter(memory_db):
+    """Testea que los índices únicos se respetan y se informan en index_information."""
+    await memory_db.users.create_indexes([IndexModel([("email", 1)], name="email_unique", unique=True)])
+    await memory_db.users.insert_one({"email": "a@example.com"})
+
+    with pytest.raises(DuplicateKeyError):
+        await memory_db.users.insert_one({"email": "a@example.com"})
+
+    indexes = await memory_db.users.index_information()
+    assert indexes["email_unique"]["unique"] is True
+
+async def test_dates_are_stored_like_bson(memory_db):
+    """Testea que las fechas se guardan en UTC sin zona horaria y con precisión de milisegundos."""
+    aware = datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone(timedelta(hours=2)))
+    await memory_db.trips.insert_one({"_id": 1, "start_time": aware})
+
+    trip = await memory_db.trips.find_one({"_id": 1})
+    assert trip["start_time"] == datetime(2024, 5, 1, 10, 0, 0, 123000)
+
+async def test_gridfs_roundtrip_and_delete(memory_db):
+    """Testea subir, descargar por chunks y borrar un fichero GridFS."""
+    fs = gridfs_bucket(memory_db)
+    content = b"%PDF" + b"x" * 1000
+    file_id = await fs.upload_from_stream("manual.pdf", content, chunk_size_bytes=256, metadata={"vehicle_id": "1"})
+
+    grid_out = await fs.open_download_stream(file_id)
+    assert grid_out.length == len(content)
+    assert grid_out.metadata == {"vehicle_id": "1"}
+    assert await grid_out.readchunk() == content[:256]
+    assert await grid_out.read() == content[256:]
+    assert await memory_db["fs.chunks"].count_documents({"files_id": file_id}) == 4
+
+    await fs.delete(file_id)
+    with pytest.raises(NoFile):
+        await fs.open_download_stream(file_id)
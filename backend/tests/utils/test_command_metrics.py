@@ -0,0 +1,28 @@
+import logging
+
+from utils.command_metrics import RequestQueryStats, RouteQueryMetrics, route_template
+
+
+def test_route_template_restores_router_prefix():
+    """Testea que la plantilla incluye el prefijo del router y los parámetros de ruta."""
+    assert route_template("/vehicles/66aa/maintenance", "/{vehicle_id}/maintenance") == "/vehicles/{vehicle_id}/maintenance"
+    assert route_template("/vehicles", "") == "/vehicles"
+    assert route_template("/users/me", "/users/me") == "/users/me"
+
+def test_request_over_budget_logs_warning(caplog):
+    """Testea el aviso cuando una petición supera el presupuesto de consultas o repite comandos."""
+    metrics = RouteQueryMetrics(query_budget=3, repeat_threshold=2)
+    stats = RequestQueryStats()
+    for _ in range(4):
+        stats.started("find", "vehicles")
+        stats.finished(0.001)
+
+    with caplog.at_level(logging.WARNING, logger="utils.command_metrics"):
+        metrics.record("POST /chats/{chat_id}/messages", stats)
+
+    assert "presupuesto 3" in caplog.text
+    assert "posible N+1" in caplog.text
+    route = metrics.stats()["POST /chats/{chat_id}/messages"]
+    assert route["commands"] == 4
+    assert route["over_budget"] == 1
+    assert route["by_command"] == {"find vehicles": 4}
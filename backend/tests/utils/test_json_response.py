@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+from typing import List
+
+from bson import Decimal128, ObjectId
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from schemas.fuel import FuelStationList
+from schemas.trip import TripResponse
+from utils.json_response import FastJSONResponse, FastJSONRoute, ResponseSerializer, json_dumps
+
+
+def test_encodes_mongo_documents_natively():
+    """Testea que ObjectId, datetime y Decimal128 se serializan sin convertirlos antes."""
+    object_id = ObjectId()
+    document = {
+        "_id": object_id,
+        "created_at": datetime(2024, 5, 1, 12, 30, 15),
+        "price": Decimal128("1.659"),
+        "tags": {"diesel"},
+    }
+
+    data = json.loads(json_dumps(document))
+
+    assert data == {"_id": str(object_id), "created_at": "2024-05-01T12:30:15", "price": 1.659, "tags": ["diesel"]}
+
+def test_route_class_only_applies_without_response_model():
+    """Testea que las rutas con response_model conservan la serialización de pydantic."""
+    class Item(BaseModel):
+        name: str
+
+    router = APIRouter(route_class=FastJSONRoute)
+
+    @router.get("/raw")
+    async def raw():
+        return {"ok": True}
+
+    @router.get("/model", response_model=Item)
+    async def model():
+        return {"name": "item"}
+
+    routes = {route.path: route for route in router.routes}
+    assert routes["/raw"].response_class is FastJSONResponse
+    assert routes["/model"].response_class is not FastJSONResponse
+
+    app = FastAPI()
+    app.include_router(router, prefix="/items")
+    client = TestClient(app)
+    assert client.get("/items/raw").json() == {"ok": True}
+    assert client.get("/items/model").json() == {"name": "item"}
+
+def test_trusted_serializer_matches_validated_output():
+    """Testea que el modo de confianza produce el mismo JSON que validar con el esquema."""
+
+    now = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    trips = [{
+        "id": str(ObjectId()), "user_id": str(ObjectId()), "vehicle_id": str(ObjectId()),
+        "start_time": now, "end_time": None, "distance_in_km": 12.5, "fuel_consumption_liters": 0.9,
+        "average_speed_kmh": 45.0, "duration_seconds": 1800, "is_active": False,
+        "gps_points": [{"latitude": 40.4, "longitude": -3.7, "timestamp": now}],
+        "created_at": now, "updated_at": now,
+    }]
+
+    trusted = ResponseSerializer(List[TripResponse], trusted=True).dump_json(trips)
+    validated = ResponseSerializer(List[TripResponse]).dump_json(trips)
+
+    assert json.loads(trusted) == json.loads(validated)
+
+def test_serializer_keeps_aliases():
+    """Testea que la serialización precompilada respeta los alias del response_model."""
+
+    station = {"id": "1", "postal_code": "28001", "is_favorite": True, "last_updated": datetime(2024, 5, 1)}
+    data = json.loads(ResponseSerializer(FuelStationList).dump_json({"stations": [station]}))
+
+    assert data["stations"][0]["postalcode"] == "28001"
+    assert data["stations"][0]["isfavorite"] is True
@@ -0,0 +1,212 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from utils.llm_client import CircuitOpenError, LLMClient, LLMError
+
+PAYLOAD = {"model": "openai/gpt-test", "messages": [{"role": "user", "content": "hola"}]}
+
+
+def completion(content: str) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+class OpenRouterStandIn:
+    """Servidor local compatible con OpenRouter: responde según un guion y cuenta las peticiones"""
+
+    def __init__(self, script=None, delay: float = 0.0):
+        self.script = list(script or [])
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            step = self.script.pop(0) if self.script else 200
+            if isinstance(step, Exception):
+                raise step
+            if isinstance(step, dict):
+                return httpx.Response(200, json=step)
+            if step == 200:
+                return httpx.Response(200, json=completion("respuesta"))
+            return httpx.Response(step, text="fallo del proveedor")
+        finally:
+            self.active -= 1
+
+
+def make_client(server, **kwargs) -> LLMClient:
+    options = {"backoff_base": 0, "max_retries": 2}
+    options.update(kwargs)
+    return LLMClient(url="http://openrouter.test/api/v1/chat/completions", headers={},
+                     transport=httpx.MockTransport(server), **options)
+
+
+async def test_transient_errors_are_retried_with_backoff():
+    """Testea que los 5xx, los errores de OpenRouter con status 200 y los timeouts se reintentan."""
+    server = OpenRouterStandIn(script=[
+        503,
+        {"error": {"code": 524, "message": "timeout del proveedor"}},
+        httpx.ReadTimeout("lento"),
+        200,
+    ])
+    client = make_client(server, max_retries=3)
+
+    result = await client.chat_completion(PAYLOAD)
+
+    assert result["choices"][0]["message"]["content"] == "respuesta"
+    assert len(server.requests) == 4
+    stats = client.stats()
+    assert stats["retries"] == 3 and stats["successes"] == 1 and stats["timeouts"] == 1
+    assert stats["errors"] == {"503": 1, "524": 1, "network": 1}
+    assert stats["latency_ms"]["max"] > 0
+
+async def test_request_errors_are_not_retried():
+    """Testea que un 400 falla al momento y no cuenta para el circuit breaker."""
+    server = OpenRouterStandIn(script=[400])
+    client = make_client(server, failure_threshold=1)
+
+    with pytest.raises(LLMError) as error:
+        await client.chat_completion(PAYLOAD)
+
+    assert error.value.status_code == 400
+    assert len(server.requests) == 1
+    assert client.breaker("openai").state == "closed"
+
+async def test_circuit_opens_per_provider_and_recovers():
+    """Testea que el circuito se abre tras varios fallos, solo para ese proveedor, y se cierra tras la prueba."""
+    server = OpenRouterStandIn(script=[503, 503])
+    client = make_client(server, max_retries=1, failure_threshold=2, reset_timeout=0.05)
+
+    with pytest.raises(LLMError):
+        await client.chat_completion(PAYLOAD)
+    assert client.breaker("openai").state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        await client.chat_completion(PAYLOAD)
+    assert len(server.requests) == 2
+
+    # Otro proveedor no se ve afectado
+    await client.chat_completion({**PAYLOAD, "model": "anthropic/claude-test"})
+
+    await asyncio.sleep(0.06)
+    await client.chat_completion(PAYLOAD)
+    assert client.breaker("openai").state == "closed"
+    assert client.stats()["rejected"] == 1
+
+async def test_concurrency_is_limited():
+    """Testea que nunca hay más de max_concurrency peticiones a la vez contra el proveedor."""
+    server = OpenRouterStandIn(delay=0.02)
+    client = make_client(server, max_concurrency=2)
+
+    await asyncio.gather(*(client.chat_completion(PAYLOAD) for _ in range(6)))
+
+    assert len(server.requests) == 6
+    assert server.max_active == 2
+    await client.close()
+
+async def test_chat_route_uses_shared_client(monkeypatch):
+    """Testea get_llm_response contra el servidor local, incluido el circuito abierto."""
+    from routers import chats
+
+    server = OpenRouterStandIn(script=[200, 503])
+    monkeypatch.setenv("OPENROUTER_API_KEY", "clave-de-prueba")
+    monkeypatch.setattr(chats, "llm_client", make_client(server, max_retries=0, failure_threshold=1))
+
+    assert await chats.get_llm_response([{"role": "user", "content": "hola"}]) == "respuesta"
+    assert server.requests[0].read().count(b'"role":"system"') == 1
+
+    with pytest.raises(HTTPException) as error:
+        await chats.get_llm_response([{"role": "user", "content": "hola"}])
+    assert error.value.status_code == 502
+
+    with pytest.raises(HTTPException) as error:
+        await chats.get_llm_response([{"role": "user", "content": "hola"}])
+    assert error.value.status_code == 503
+
+async def test_optional_openrouter_headers_are_omitted(monkeypatch):
+    """Testea que sin HTTP_REFERER ni X_TITLE la petición sale sin esas cabeceras (httpx no admite None)."""
+    monkeypatch.setenv("OPENROUTER_API_KEY", "clave-de-prueba")
+    monkeypatch.delenv("HTTP_REFERER", raising=False)
+    monkeypatch.setenv("X_TITLE", "OBDY")
+    server = OpenRouterStandIn()
+    client = LLMClient(url="http://openrouter.test/api/v1/chat/completions", transport=httpx.MockTransport(server))
+
+    await client.chat_completion(PAYLOAD)
+
+    sent = server.requests[0].headers
+    assert sent["authorization"] == "Bearer clave-de-prueba"
+    assert sent["x-title"] == "OBDY"
+    assert "http-referer" not in sent
+
+async def test_half_open_probe_failures_do_not_wedge_the_circuit():
+    """Testea que un error inesperado en la petición de prueba no deja el circuito medio abierto para siempre."""
+    server = OpenRouterStandIn(script=[
+        503,
+        httpx.DecodingError("gzip corrupto"),
+        RuntimeError("fallo inesperado"),
+        200,
+    ])
+    client = make_client(server, max_retries=0, failure_threshold=1, reset_timeout=0.01)
+
+    with pytest.raises(LLMError):
+        await client.chat_completion(PAYLOAD)
+    await asyncio.sleep(0.02)
+
+    # Un error de httpx en la prueba es un fallo transitorio: el circuito vuelve a abrirse
+    with pytest.raises(LLMError) as error:
+        await client.chat_completion(PAYLOAD)
+    assert not isinstance(error.value, CircuitOpenError)
+    assert client.breaker("openai").state == "open"
+    await asyncio.sleep(0.02)
+
+    # Cualquier otra excepción libera la prueba
+    with pytest.raises(RuntimeError):
+        await client.chat_completion(PAYLOAD)
+    await client.chat_completion(PAYLOAD)
+    assert client.breaker("openai").state == "closed"
+    assert len(server.requests) == 4
+
+async def test_cancelled_waiters_are_not_counted():
+    """Testea que una petición cancelada mientras espera turno deja de contarse como en espera."""
+    server = OpenRouterStandIn(delay=0.05)
+    client = make_client(server, max_concurrency=1)
+
+    running = asyncio.ensure_future(client.chat_completion(PAYLOAD))
+    waiting = asyncio.ensure_future(client.chat_completion(PAYLOAD))
+    await asyncio.sleep(0.01)
+    assert client.stats()["waiting"] == 1
+    waiting.cancel()
+    await running
+
+    assert client.stats()["waiting"] == 0 and client.stats()["in_flight"] == 0
+
+async def test_close_closes_the_clients_of_every_loop():
+    """Testea que cada event loop tiene su cliente HTTP y close() los cierra todos."""
+    import threading
+
+    server = OpenRouterStandIn()
+    client = make_client(server)
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.chat_completion(PAYLOAD), other_loop))
+        await client.chat_completion(PAYLOAD)
+        clients = [http for http, _ in client._clients.values()]
+        assert len(clients) == 2
+
+        await client.close()
+
+        assert all(http.is_closed for http in clients)
+        assert len(client._clients) == 0
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
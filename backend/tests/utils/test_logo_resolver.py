@@ -0,0 +1,106 @@
+import asyncio
+import io
+from datetime import timedelta
+
+import httpx
+
+from utils.logo_resolver import LogoResolver
+from utils.logo_store import logo_hash, normalize_logo
+
+def _png() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (200, 0, 0)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG_LOGO = _png()
+# Hash con el que se guarda el logo (normalizado a PNG)
+STORED_HASH = logo_hash(normalize_logo(PNG_LOGO))
+
+BRAND_PAGE = """
+<div class="article"><div class="logo-art"><div class="present">
+  <a href="#"><img src="/car-logos/seat-logo.png"></a>
+</div></div></div>
+"""
+
+
+class CarLogosStandIn:
+    """Servidor local que imita carlogos.org y cuenta las peticiones recibidas"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        await asyncio.sleep(self.delay)
+        if request.url.path == "/car-brands/seat-logo.html":
+            return httpx.Response(200, text=BRAND_PAGE)
+        if request.url.path == "/car-logos/seat-logo.png":
+            return httpx.Response(200, content=PNG_LOGO, headers={"content-type": "image/png"})
+        return httpx.Response(404)
+
+
+def make_resolver(server, **kwargs) -> LogoResolver:
+    return LogoResolver(base_url="http://carlogos.test", transport=httpx.MockTransport(server), **kwargs)
+
+
+async def test_concurrent_resolves_share_one_fetch_and_are_cached(test_db):
+    """Testea el single-flight y que la marca queda cacheada de forma persistente."""
+    server = CarLogosStandIn(delay=0.05)
+    resolver = make_resolver(server)
+
+    results = await asyncio.gather(*(resolver.resolve(test_db, "SEAT") for _ in range(5)))
+
+    assert results == [STORED_HASH] * 5
+    assert resolver.fetches == 1
+    assert resolver.shared == 4
+    assert server.requests == ["/car-brands/seat-logo.html", "/car-logos/seat-logo.png"]
+
+    # Otra instancia (otro proceso) usa la caché de MongoDB sin salir a la red
+    other = make_resolver(server)
+    assert await other.resolve(test_db, "seat") == STORED_HASH
+    assert other.fetches == 0 and other.hits == 1
+    assert len(server.requests) == 2
+
+async def test_brands_without_logo_are_negatively_cached(test_db):
+    """Testea que una marca sin logo no se vuelve a buscar hasta que caduca la caché negativa."""
+    server = CarLogosStandIn()
+    resolver = make_resolver(server)
+
+    assert await resolver.resolve(test_db, "Marca Inventada") is None
+    requests_made = len(server.requests)
+    assert await resolver.resolve(test_db, "Marca Inventada") is None
+    assert len(server.requests) == requests_made
+    assert resolver.negative_hits == 1
+
+    expired = make_resolver(server, negative_ttl=timedelta(0))
+    await expired.resolve(test_db, "Marca Inventada")
+    assert expired.fetches == 1
+
+async def test_network_errors_are_not_cached(test_db):
+    """Testea que un timeout o error de red no se guarda como marca sin logo."""
+    def unreachable(request):
+        raise httpx.ConnectError("sin conexión", request=request)
+
+    resolver = make_resolver(unreachable)
+
+    assert await resolver.resolve(test_db, "SEAT") is None
+    assert resolver.errors == 1
+    assert await test_db.brand_logos.find_one({"_id": "seat"}) is None
+
+async def test_unexpected_errors_are_negatively_cached(test_db):
+    """Testea que un error que no es de red (p. ej. una URL inválida en la página) no se propaga y se cachea como marca sin logo."""
+    def broken_page(request):
+        if request.url.path == "/car-brands/seat-logo.html":
+            return httpx.Response(200, text=BRAND_PAGE.replace("/car-logos/seat-logo.png", "http://[::1"))
+        return httpx.Response(404)
+
+    resolver = make_resolver(broken_page)
+
+    assert await resolver.resolve(test_db, "SEAT") is None
+    assert resolver.errors == 1
+    assert await resolver.resolve(test_db, "SEAT") is None
+    assert resolver.fetches == 1 and resolver.negative_hits == 1
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from utils.logo_thumbnails import THUMBNAIL_SIZES, closest_size, make_thumbnails
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def png_logo(width: int = 400, height: int = 200) -> bytes:
+    """Logo rojo de 100x50 en el centro de un fondo blanco"""
+    image = Image.new("RGB", (width, height), "white")
+    image.paste((200, 0, 0), (150, 75, 250, 125))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_thumbnails_are_trimmed_square_webp():
+    """Testea que se recorta el fondo y se genera cada tamaño como WebP cuadrado."""
+    thumbnails = make_thumbnails(png_logo())
+
+    assert sorted(thumbnails) == list(THUMBNAIL_SIZES)
+    for size, data in thumbnails.items():
+        image = Image.open(io.BytesIO(data))
+        assert image.format == "WEBP"
+        assert image.size == (size, size)
+        # Sin el fondo blanco el logo (2:1) ocupa todo el ancho del lienzo
+        bbox = image.getchannel("A").getbbox()
+        assert bbox[2] - bbox[0] >= size - 2
+
+def test_undecodable_logo_has_no_thumbnails():
+    """Testea que una imagen que Pillow no entiende (p. ej. SVG) se sirve sin miniaturas."""
+    assert make_thumbnails(b"<svg xmlns='http://www.w3.org/2000/svg'></svg>") == {}
+
+def test_closest_size():
+    """Testea la elección de la miniatura que cubre el tamaño pedido."""
+    assert closest_size(40) == 48
+    assert closest_size(96) == 96
+    assert closest_size(500) == 192
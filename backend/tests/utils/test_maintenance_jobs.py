@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from utils.maintenance_jobs import INTERRUPTED_ERROR, MAINTENANCE_JOBS_COLLECTION, MaintenanceJobQueue, default_job_mode
+
+
+async def wait_until_finished(queue: MaintenanceJobQueue, database, job_id):
+    for _ in range(200):
+        job = await queue.get(database, job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("El trabajo no terminó")
+
+
+async def test_missing_manual_fails_the_job(test_db):
+    """Testea que un error de extracción deja el trabajo como fallido y libera el manual."""
+    queue = MaintenanceJobQueue(workers=1)
+
+    job, created = await queue.submit(test_db, "manual-inexistente", ObjectId())
+    assert created
+    finished = await wait_until_finished(queue, test_db, job["_id"])
+
+    assert finished["status"] == "failed"
+    assert finished["error"].startswith("Error al extraer texto del PDF")
+    assert "active_key" not in finished and finished["expires_at"] > datetime.utcnow()
+
+async def test_stale_job_is_replaced(test_db):
+    """Testea que un trabajo activo que ya no se actualiza no bloquea nuevos envíos del mismo manual."""
+    queue = MaintenanceJobQueue(workers=1, stale_after=timedelta(minutes=5))
+    stale_id = ObjectId()
+    await test_db[MAINTENANCE_JOBS_COLLECTION].insert_one({
+        "_id": stale_id, "manual_key": "abc", "file_id": ObjectId(), "active_key": "abc",
+        "status": "running", "stage": "analyzing", "progress": 40,
+        "created_at": datetime.utcnow() - timedelta(hours=1),
+        "updated_at": datetime.utcnow() - timedelta(hours=1),
+    })
+
+    job, created = await queue.submit(test_db, "abc", ObjectId())
+
+    assert created and job["_id"] != stale_id
+    stale = await queue.get(test_db, stale_id)
+    assert stale["status"] == "failed" and "active_key" not in stale
+    assert queue.stats()["abandoned"] == 1
+    await wait_until_finished(queue, test_db, job["_id"])
+
+async def test_get_reports_stale_job_as_failed(test_db):
+    """Testea que consultar un trabajo que ya no se actualiza lo da por fallido."""
+    queue = MaintenanceJobQueue(workers=1, stale_after=timedelta(minutes=5))
+    stale_id = ObjectId()
+    await test_db[MAINTENANCE_JOBS_COLLECTION].insert_one({
+        "_id": stale_id, "manual_key": "abc", "file_id": ObjectId(), "active_key": "abc",
+        "status": "running", "stage": "analyzing", "progress": 40,
+        "created_at": datetime.utcnow() - timedelta(hours=1),
+        "updated_at": datetime.utcnow() - timedelta(hours=1),
+    })
+
+    job = await queue.get(test_db, stale_id)
+
+    assert job["status"] == "failed" and job["error"] == INTERRUPTED_ERROR
+    assert "active_key" not in job
+    assert queue.stats()["abandoned"] == 1
+
+async def test_finish_errors_are_logged(caplog):
+    """Testea que un fallo al guardar el final del trabajo se registra y no rompe la tarea."""
+    class FailingCollection:
+        async def update_one(self, *args, **kwargs):
+            raise ConnectionError("MongoDB no disponible")
+
+    queue = MaintenanceJobQueue(workers=1)
+    job_id = ObjectId()
+
+    await queue._finish({MAINTENANCE_JOBS_COLLECTION: FailingCollection()}, {"_id": job_id}, "completed", result={})
+
+    assert f"No se pudo guardar el final del trabajo de maintenance-ai {job_id}" in caplog.text
+
+async def test_shutdown_cancels_running_jobs(test_db, mocker):
+    """Testea que al parar el servidor los trabajos en marcha y en cola se cancelan y quedan como fallidos."""
+    started = asyncio.Event()
+
+    async def never_finishes(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(3600)
+
+    mocker.patch("utils.maintenance_jobs.analyze_manual", never_finishes)
+    queue = MaintenanceJobQueue(workers=1)
+    running, _ = await queue.submit(test_db, "manual-1", ObjectId())
+    queued, _ = await queue.submit(test_db, "manual-2", ObjectId())
+    await asyncio.wait_for(started.wait(), timeout=5)
+
+    await queue.shutdown()
+
+    assert not queue._tasks
+    for job_id in (running["_id"], queued["_id"]):
+        job = await queue.get(test_db, job_id)
+        assert job["status"] == "failed" and job["error"] == INTERRUPTED_ERROR
+    assert queue.stats()["queued"] == 0 and queue.stats()["running"] == 0
+
+async def test_inline_mode_finishes_before_returning(test_db, mocker):
+    """Testea que en modo inline (serverless) el envío responde con el trabajo ya terminado."""
+    async def analyze(*args, **kwargs):
+        return {"maintenance_recommendations": [], "cached": False}
+
+    mocker.patch("utils.maintenance_jobs.analyze_manual", analyze)
+    queue = MaintenanceJobQueue(workers=1, mode="inline")
+
+    job, created = await queue.submit(test_db, "manual-1", ObjectId())
+
+    assert created and job["status"] == "completed"
+    assert not queue._tasks
+
+async def test_worker_mode_jobs_are_run_by_the_worker(test_db, mocker):
+    """Testea que en modo worker la API solo encola y el worker reclama y ejecuta el trabajo."""
+    async def analyze(*args, **kwargs):
+        return {"maintenance_recommendations": [], "cached": False}
+
+    mocker.patch("utils.maintenance_jobs.analyze_manual", analyze)
+    api = MaintenanceJobQueue(workers=1, mode="worker")
+    job, _ = await api.submit(test_db, "manual-1", ObjectId())
+    await asyncio.sleep(0.05)
+    assert (await api.get(test_db, job["_id"]))["status"] == "queued"
+
+    worker = MaintenanceJobQueue(workers=1, mode="worker")
+    loop_task = asyncio.ensure_future(worker.run_worker(test_db, poll_interval=0.01))
+    try:
+        finished = await wait_until_finished(api, test_db, job["_id"])
+    finally:
+        loop_task.cancel()
+        await worker.shutdown()
+
+    assert finished["status"] == "completed"
+    assert await worker.claim_next(test_db) is None
+
+def test_serverless_defaults_to_inline(monkeypatch):
+    """Testea que en Vercel los trabajos se ejecutan dentro de la petición."""
+    monkeypatch.delenv("MAINTENANCE_JOB_MODE", raising=False)
+    monkeypatch.setenv("VERCEL", "1")
+    assert default_job_mode() == "inline"
+    monkeypatch.setenv("MAINTENANCE_JOB_MODE", "worker")
+    assert default_job_mode() == "worker"
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import io
+import re
+
+import pytest
+
+import utils.manual_text as manual_text
+from benchmarks.maintenance_prompt import synthetic_manual_pdf
+from benchmarks.maintenance_sections import legacy_extract, synthetic_manual
+from storage import gridfs_bucket
+from utils.manual_text import (
+    EXTRACTION_VERSION,
+    MAINTENANCE_KEYWORDS,
+    MANUAL_TEXTS_COLLECTION,
+    NUMBER_PATTERNS,
+    SECTION_HEADER_KEYWORDS,
+    _extract_maintenance_sections,
+    _is_maintenance_related,
+    _is_maintenance_section_header,
+    format_maintenance_tables,
+    get_manual_text,
+    prompt_text,
+    select_candidate_pages,
+)
+
+LINES = [
+    "Cambio de aceite cada 15 000 km",
+    "Replace every 3 years",
+    "Recorrido máximo: 10 miles",
+    "10miles de kilómetros",
+    "PROGRAMA DE MANTENIMIENTO PERIÓDICO",
+    "Maintenance Schedule",
+    "INSPECCIÓN DEL VEHÍCULO",
+    "Abroche el cinturón",
+    "cada  20 días",
+    "Pulse el botón 5 veces",
+    "Servicios adicionales",
+    "",
+]
+
+
+def naive_related(line: str) -> bool:
+    lower = line.lower()
+    return any(k in lower for k in MAINTENANCE_KEYWORDS) or any(re.search(p, lower) for p in NUMBER_PATTERNS)
+
+
+def test_compiled_matcher_matches_keyword_heuristics():
+    """Testea que el emparejador precompilado da el mismo resultado que recorrer las palabras clave."""
+    for line in LINES + [keyword.upper() for keyword in MAINTENANCE_KEYWORDS + SECTION_HEADER_KEYWORDS]:
+        assert _is_maintenance_related(line) == naive_related(line), line
+        assert _is_maintenance_section_header(line) == any(k in line.lower() for k in SECTION_HEADER_KEYWORDS), line
+
+def test_sections_match_previous_implementation():
+    """Testea que la extracción de secciones no cambia respecto a la implementación anterior."""
+    text = synthetic_manual(3000) + "\n" + "\n".join(LINES)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert _extract_maintenance_sections(text) == legacy_extract(text)
+
+
+def test_candidate_pages_from_toc_and_intervals():
+    """Testea que se eligen las páginas con intervalos o dentro de la entrada de mantenimiento del índice."""
+    pages = ["Velocidad máxima 120 km/h"] * 10
+    pages[3] = "Aceite 15 000 km 12 meses\nFiltro 30.000 km 24 meses\nBujías 60000 km"
+    toc = [[1, "Conducción", 1], [1, "Mantenimiento y cuidados", 7], [1, "Datos técnicos", 9]]
+
+    assert select_candidate_pages(pages, toc) == [3, 6, 7]
+
+def test_tables_keep_header_and_interval_rows():
+    """Testea el formato de las tablas: cabecera y filas con intervalos, o líneas de la página si no hay tablas."""
+    tables = {
+        0: [
+            [["Operación", "Km", "Meses"], ["Aceite\ndel motor", "15 000 km", "12 meses"], ["Nota", "", "Ver página 3"]],
+            [["Presión", "Delante"], ["2,2 bar", "2,4 bar"]],
+        ],
+        1: [],
+    }
+    page_texts = ["", "Texto\nCambiar la correa cada 120 000 km\nFin"]
+
+    assert format_maintenance_tables(tables, page_texts) == (
+        "[Página 1]\nOperación | Km | Meses\nAceite del motor | 15 000 km | 12 meses\n\n"
+        "[Página 2]\nCambiar la correa cada 120 000 km"
+    )
+
+
+def manual_pdf(pages: int = 3) -> bytes:
+    """PDF con una tabla de mantenimiento en la última página"""
+    fitz = pytest.importorskip("pymupdf")
+    document = fitz.open()
+    for number in range(pages - 1):
+        document.new_page().insert_text((72, 72), f"Capítulo {number + 1}: conducción segura")
+    page = document.new_page()
+    page.insert_text((72, 72), "PROGRAMA DE MANTENIMIENTO")
+    page.insert_text((72, 96), "Cambio de aceite cada 15000 km")
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+async def test_manual_text_is_extracted_once(test_db, monkeypatch):
+    """Testea que el texto se extrae una vez por manual y después sale de manual_texts."""
+    calls = []
+    original = manual_text.pdf_pool.extract_pages
+    monkeypatch.setattr(manual_text.pdf_pool, "extract_pages", lambda data: calls.append(1) or original(data))
+
+    bucket = gridfs_bucket(test_db)
+    file_id = await bucket.upload_from_stream("manual.pdf", manual_pdf())
+
+    first, second = await asyncio.gather(
+        get_manual_text(test_db, bucket, "hash-manual", file_id),
+        get_manual_text(test_db, bucket, "hash-manual", file_id),
+    )
+    again = await get_manual_text(test_db, bucket, "hash-manual", file_id)
+
+    assert len(calls) == 1
+    assert first["pages"] == 3
+    assert "Cambio de aceite cada 15000 km" in first["sections"]
+    assert "conducción segura" in first["text"]
+    assert second["sections"] == again["sections"] == first["sections"]
+
+async def test_outdated_extraction_is_recomputed(test_db):
+    """Testea que una entrada con otra versión de extracción se vuelve a calcular."""
+    bucket = gridfs_bucket(test_db)
+    file_id = await bucket.upload_from_stream("manual.pdf", manual_pdf(pages=1))
+    await test_db[MANUAL_TEXTS_COLLECTION].insert_one(
+        {"_id": "hash-antiguo", "version": EXTRACTION_VERSION - 1, "sections": "", "pages": 0}
+    )
+
+    document = await get_manual_text(test_db, bucket, "hash-antiguo", file_id)
+
+    assert document["version"] == EXTRACTION_VERSION
+    assert "Cambio de aceite" in document["sections"]
+
+async def test_layout_mode_sends_only_the_schedule_table(test_db):
+    """Testea que en modo tablas el texto para el modelo es la tabla del programa de mantenimiento."""
+    pytest.importorskip("pymupdf")
+    bucket = gridfs_bucket(test_db)
+    file_id = await bucket.upload_from_stream("manual.pdf", synthetic_manual_pdf(40, schedule_page=30))
+
+    document = await get_manual_text(test_db, bucket, "hash-tablas", file_id)
+
+    assert 30 in document["candidate_pages"]
+    assert "Aceite del motor y filtro | 15 000 km | 12 meses" in document["tables"]
+    assert len(document["tables"]) * 10 < len(document["sections"])
+    assert prompt_text(document) == document["tables"]
+    assert prompt_text(document, mode="sections") == document["sections"]
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from utils.pdf_pool import PdfExtractionError, PdfExtractionPool, _extract_page_range
+
+fitz = pytest.importorskip("pymupdf")
+
+
+def synthetic_pdf(pages: int) -> bytes:
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Página {number + 1}")
+        page.insert_text((72, 96), f"Cambiar el filtro cada {number + 1}000 km")
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+async def test_ranges_are_merged_in_order():
+    """Testea que el texto repartido entre procesos es idéntico al de la extracción secuencial."""
+    pdf = synthetic_pdf(23)
+    pool = PdfExtractionPool(max_workers=2, pages_per_task=5)
+    try:
+        text, pages = await pool.extract_text(pdf)
+    finally:
+        pool.shutdown()
+
+    assert pages == 23
+    texts, _ = _extract_page_range(pdf, 0, 23)
+    assert text == "".join(page + "\n" for page in texts)
+    assert text.index("Página 9\n") < text.index("Página 10\n")
+    assert pool.stats()["completed"] == 1
+
+async def test_timeout_restarts_the_pool():
+    """Testea que un PDF que supera el tiempo máximo falla y el pool sigue funcionando después."""
+    pool = PdfExtractionPool(max_workers=1, pages_per_task=10, timeout=0.001)
+    try:
+        with pytest.raises(PdfExtractionError):
+            await pool.extract_text(synthetic_pdf(40))
+        assert pool.stats()["timeouts"] == 1
+
+        pool.timeout = 60
+        _, pages = await pool.extract_text(synthetic_pdf(3))
+        assert pages == 3
+    finally:
+        pool.shutdown()
+
+async def test_timeout_only_fails_the_slow_document():
+    """Testea que el reinicio del pool por un PDF lento no hace fallar a los que compartían el pool."""
+    pool = PdfExtractionPool(max_workers=2, timeout=6)
+
+    async def slow(source, submit):
+        return await submit(time.sleep, 60)
+
+    async def innocent(source, submit):
+        await submit(time.sleep, 3)
+        return "ok"
+
+    async def start_late():
+        # Sigue en marcha cuando el PDF lento supera el tiempo y se matan los procesos
+        await asyncio.sleep(4)
+        return await pool._run(b"%PDF", innocent)
+
+    try:
+        slow_result, innocent_result = await asyncio.gather(
+            pool._run(b"%PDF", slow), start_late(), return_exceptions=True
+        )
+    finally:
+        pool.shutdown()
+
+    assert isinstance(slow_result, PdfExtractionError)
+    assert innocent_result == "ok"
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["retries"] == 1
+    assert stats["failures"] == 0
+
+async def test_pool_shut_down_before_submitting_is_retried():
+    """Testea que una tarea enviada a un pool ya cerrado se repite en el pool nuevo."""
+    pool = PdfExtractionPool(max_workers=1)
+    calls = []
+
+    async def job(source, submit):
+        calls.append(source)
+        if len(calls) == 1:
+            # Otra extracción reinicia el pool entre _get_executor y el envío
+            pool._restart()
+        return await submit(os.getpid)
+
+    try:
+        pid = await pool._run(b"%PDF", job)
+    finally:
+        pool.shutdown()
+
+    assert isinstance(pid, int)
+    assert len(calls) == 2
+    assert pool.stats()["retries"] == 1
+
+async def test_only_memory_errors_mention_the_memory_limit():
+    """Testea que el mensaje solo habla del límite de memoria si el proceso se quedó sin ella."""
+    pytest.importorskip("resource")
+    pool = PdfExtractionPool(max_workers=1, memory_limit_mb=256)
+
+    async def allocate(source, submit):
+        return await submit(bytearray, 1024 ** 3)
+
+    async def crash(source, submit):
+        return await submit(os._exit, 1)
+
+    try:
+        with pytest.raises(PdfExtractionError, match="límite de memoria"):
+            await pool._run(b"%PDF", allocate)
+        with pytest.raises(PdfExtractionError) as error:
+            await pool._run(b"%PDF", crash)
+    finally:
+        pool.shutdown()
+
+    assert "memoria" not in str(error.value)
+    assert pool.stats()["failures"] == 2
+
+def test_workers_have_a_memory_cap():
+    """Testea que cada proceso del pool arranca con el tope de memoria virtual configurado."""
+    resource = pytest.importorskip("resource")
+    pool = PdfExtractionPool(max_workers=1, memory_limit_mb=512)
+    try:
+        limit = pool._get_executor().submit(resource.getrlimit, resource.RLIMIT_AS).result(timeout=30)
+    finally:
+        pool.shutdown()
+    assert limit == (512 * 1024 * 1024, 512 * 1024 * 1024)
+
+async def test_thread_mode_without_processes():
+    """Testea la extracción en un hilo cuando el pool no tiene procesos."""
+    pool = PdfExtractionPool(max_workers=0)
+    text, pages = await pool.extract_text(synthetic_pdf(2))
+    assert pages == 2
+    assert "Página 2" in text
@@ -0,0 +1,48 @@
+from pymongo import monitoring
+
+from database import client_options
+from utils.pool_metrics import PoolMetricsListener
+
+ADDRESS = ("localhost", 27017)
+
+
+def test_checkout_wait_and_in_use_counters():
+    """Testea que se contabilizan conexiones abiertas, en uso y la espera de checkout."""
+    listener = PoolMetricsListener()
+    listener.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {}))
+    listener.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1, 0.004))
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1, 0.002))
+    listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+
+    stats = listener.stats()
+    assert stats["pools"] == 1
+    assert stats["open_connections"] == 1
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["checkout_wait_ms"]["avg"] == 3.0
+    assert stats["checkout_wait_ms"]["max"] == 4.0
+
+def test_checkout_timeouts_are_counted():
+    """Testea que los fallos de checkout por timeout se distinguen del resto."""
+    listener = PoolMetricsListener()
+    reasons = monitoring.ConnectionCheckOutFailedReason
+    listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, reasons.TIMEOUT, 0.5))
+    listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, reasons.POOL_CLOSED, 0.0))
+
+    stats = listener.stats()
+    assert stats["checkout_failures"] == 2
+    assert stats["checkout_timeouts"] == 1
+
+def test_client_options_from_environment(monkeypatch):
+    """Testea que solo se pasan al cliente las opciones definidas en el entorno."""
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+    monkeypatch.delenv("MONGO_MIN_POOL_SIZE", raising=False)
+
+    options = client_options()
+    assert options["maxPoolSize"] == 50
+    assert options["serverSelectionTimeoutMS"] == 3000
+    assert options["compressors"] == "zstd,zlib"
+    assert "minPoolSize" not in options
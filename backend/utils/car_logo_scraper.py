@@ -1,8 +1,9 @@
-import requests
-from bs4 import BeautifulSoup
-import base64
 import re
 import logging
+from typing import List, Optional
+
+# httpx y BeautifulSoup se importan dentro de cada función: solo se necesitan
+# al crear o editar un vehículo y encarecen el arranque en frío
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,7 @@ def normalize_brand_name(brand_name):
     """
     # Convertir a minúsculas y eliminar espacios adicionales
     normalized = brand_name.lower().strip()
-    
+
     # Mapeo de nombres de marcas comunes con sus equivalentes en carlogos.org
     brand_mapping = {
         'vw': 'volkswagen',
@@ -31,254 +32,164 @@ def normalize_brand_name(brand_name):
         'chevy': 'chevrolet',
         'gm': 'general-motors',
     }
-    
+
     # Reemplazar si hay una coincidencia exacta
     if normalized in brand_mapping:
         return brand_mapping[normalized]
-    
+
     # Manejo especial para algunas marcas
     for key, value in brand_mapping.items():
         if key in normalized:
             return value
-    
+
     # Remover caracteres especiales y convertir espacios a guiones
     normalized = re.sub(r'[^\w\s]', '', normalized)
     normalized = normalized.replace(' ', '-')
-    
+
     return normalized
 
-def get_car_logo(brand):
+async def fetch_car_logo(client, brand) -> Optional[bytes]:
     """
-    Obtiene el logo de la marca de coche haciendo scraping a carlogos.org
-    
+    Obtiene el logo de la marca haciendo scraping a carlogos.org (o al servidor al
+    que apunte base_url del cliente): página de la marca, lista general de marcas y,
+    como último recurso, URLs directas con los patrones habituales.
+
     Args:
+        client (httpx.AsyncClient): Cliente con base_url y cabeceras configuradas
         brand (str): Nombre de la marca del coche
-    
+
     Returns:
-        str: Imagen del logo codificada en base64 o None si no se encuentra
+        bytes: Imagen del logo o None si la marca no tiene logo
+
+    Raises:
+        httpx.TransportError: Si el servidor no responde (no equivale a "sin logo")
     """
+    normalized_brand = normalize_brand_name(brand)
+    if not normalized_brand:
+        return None
+
+    strategies = [
+        lambda: _logos_in_brand_page(client, normalized_brand),
+        lambda: _logos_in_main_page(client, normalized_brand),
+    ]
+    for strategy in strategies:
+        for img_url in await strategy():
+            logo = await download_image(client, img_url)
+            if logo:
+                return logo
+
+    return await search_direct_image(client, normalized_brand)
+
+async def _get_page(client, url: str):
+    """Página HTML parseada, o None si el servidor responde con error"""
+    import httpx
+    from bs4 import BeautifulSoup
+
     try:
-        # Normalizar el nombre de la marca para la URL
-        normalized_brand = normalize_brand_name(brand)
-        
-        # URL base para carlogos.org
-        base_url = "https://www.carlogos.org/car-brands"
-        
-        # Construir URL completa
-        url = f"{base_url}/{normalized_brand}-logo.html"
-        
-        # Realizar petición HTTP
-        try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
-            response.raise_for_status()  # Lanzar excepción si hay error HTTP
-        except (requests.RequestException, requests.Timeout) as e:
-            logger.warning(f"Error al acceder a {url}: {str(e)}")
-            return search_logo_in_main_page(brand)
-        
-        # Parsear la página HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Método 1: Buscar el logo en la estructura: article > logo-art > present > a > img
-        logo_present = soup.select_one('div.article div.logo-art div.present a img')
-        if logo_present and logo_present.get('src'):
-            img_url = logo_present.get('src')
-            logger.info(f"Encontrado logo mediante estructura article>logo-art>present: {img_url}")
-            # Asegurarse de que la URL sea absoluta
-            if not img_url.startswith(('http://', 'https://')):
-                img_url = f"https://www.carlogos.org{img_url}"
-            try:
-                return download_and_encode_image(img_url)
-            except Exception as e:
-                logger.warning(f"Error al descargar logo de {img_url}: {str(e)}")
-        
-        # Método 2: Buscar cualquier imagen que coincida con el patrón /car-logos/{brand}*.png
-        img_tags = soup.find_all('img')
-        for img in img_tags:
-            src = img.get('src', '')
-            if f"/car-logos/{normalized_brand}" in src.lower() and '.png' in src.lower():
-                logger.info(f"Encontrado logo mediante búsqueda de patrón en src: {src}")
-                # Asegurarse de que la URL sea absoluta
-                if not src.startswith(('http://', 'https://')):
-                    src = f"https://www.carlogos.org{src}"
-                try:
-                    return download_and_encode_image(src)
-                except Exception as e:
-                    logger.warning(f"Error al descargar logo de {src}: {str(e)}")
-                    continue
-        
-        # Método 3: El método original
-        logo_div = soup.find('div', class_='car-logo')
-        if logo_div:
-            img_tag = logo_div.find('img')
-            if img_tag and img_tag.get('src'):
-                img_url = img_tag.get('src')
-                logger.info(f"Encontrado logo mediante método original: {img_url}")
-                # Asegurarse de que la URL sea absoluta
-                if not img_url.startswith(('http://', 'https://')):
-                    img_url = f"https://www.carlogos.org{img_url}"
-                try:
-                    return download_and_encode_image(img_url)
-                except Exception as e:
-                    logger.warning(f"Error al descargar logo de {img_url}: {str(e)}")
-        
-        # Si no se encuentra, buscar en la página principal
-        logger.info(f"No se encontró el logo para {brand} en la página específica, buscando en la lista general...")
-        return search_logo_in_main_page(brand)
-    
-    except Exception as e:
-        logger.error(f"Error al obtener el logo para {brand}: {str(e)}")
+        response = await client.get(url)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.warning(f"Error al acceder a {url}: {e.response.status_code}")
         return None
+    return BeautifulSoup(response.content, 'html.parser')
+
+async def _logos_in_brand_page(client, normalized_brand) -> List[str]:
+    """URLs de logo candidatas en la página específica de la marca"""
+    soup = await _get_page(client, f"/car-brands/{normalized_brand}-logo.html")
+    if soup is None:
+        return []
+
+    candidates = []
+    # Método 1: Buscar el logo en la estructura: article > logo-art > present > a > img
+    logo_present = soup.select_one('div.article div.logo-art div.present a img')
+    if logo_present and logo_present.get('src'):
+        candidates.append(logo_present.get('src'))
 
-def download_and_encode_image(img_url):
+    # Método 2: Buscar cualquier imagen que coincida con el patrón /car-logos/{brand}*.png
+    for img in soup.find_all('img'):
+        src = img.get('src', '')
+        if f"/car-logos/{normalized_brand}" in src.lower() and '.png' in src.lower():
+            candidates.append(src)
+
+    # Método 3: El método original
+    logo_div = soup.find('div', class_='car-logo')
+    if logo_div:
+        img_tag = logo_div.find('img')
+        if img_tag and img_tag.get('src'):
+            candidates.append(img_tag.get('src'))
+
+    return list(dict.fromkeys(candidates))
+
+async def _logos_in_main_page(client, normalized_brand) -> List[str]:
+    """URLs de logo candidatas en la página general con todas las marcas"""
+    soup = await _get_page(client, "/car-brands/")
+    if soup is None:
+        return []
+
+    candidates = []
+    # Método 1: Buscar enlaces con clase logo-item que contengan el nombre de la marca
+    for link in soup.find_all('a', class_='logo-item'):
+        link_text = link.get_text().lower() if link.get_text() else ''
+        if normalized_brand in link_text or any(normalized_brand in alt.lower() for alt in link.get('alt', '').split()):
+            img_tag = link.find('img')
+            if img_tag and img_tag.get('src'):
+                candidates.append(img_tag.get('src'))
+
+    # Método 2: Buscar cualquier imagen que coincida con el patrón /car-logos/{brand}*.png
+    for img in soup.find_all('img'):
+        src = img.get('src', '')
+        if f"/car-logos/{normalized_brand}" in src.lower() and '.png' in src.lower():
+            candidates.append(src)
+
+    if not candidates:
+        logger.info(f"No se encontró coincidencia para {normalized_brand} en la página principal")
+    return list(dict.fromkeys(candidates))
+
+async def download_image(client, img_url) -> Optional[bytes]:
     """
-    Descarga una imagen y la codifica en base64
-    
-    Args:
-        img_url (str): URL de la imagen
-    
+    Descarga una imagen. Las URLs relativas se resuelven contra base_url del cliente
+
     Returns:
-        str: Imagen codificada en base64 o None si hay error
+        bytes: Contenido de la imagen o None si la respuesta no es una imagen válida
     """
+    import httpx
+
+    if not img_url or not isinstance(img_url, str):
+        logger.error(f"URL de imagen inválida: {img_url}")
+        return None
+
     try:
-        # Verificar que la URL es válida
-        if not img_url or not isinstance(img_url, str):
-            logger.error(f"URL de imagen inválida: {img_url}")
-            return None
-
-        # Realizar la petición con timeout y verificación de estado
-        img_response = requests.get(img_url, headers=HEADERS, timeout=10)
-        img_response.raise_for_status()
-
-        # Verificar que el contenido es una imagen
-        content_type = img_response.headers.get('content-type', '')
-        if not content_type.startswith('image/'):
-            logger.error(f"El contenido no es una imagen: {content_type}")
-            return None
-
-        # Verificar que el contenido no está vacío
-        if not img_response.content:
-            logger.error("El contenido de la imagen está vacío")
-            return None
-
-        # Codificar la imagen en base64
-        try:
-            logo_base64 = base64.b64encode(img_response.content).decode('utf-8')
-            if not logo_base64:
-                logger.error("Error al codificar la imagen en base64")
-                return None
-            return logo_base64
-        except Exception as e:
-            logger.error(f"Error al codificar la imagen en base64: {str(e)}")
-            return None
-
-    except requests.exceptions.Timeout:
-        logger.error(f"Timeout al descargar la imagen de {img_url}")
+        response = await client.get(img_url)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.warning(f"Error al descargar la imagen de {img_url}: {e.response.status_code}")
         return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error en la petición HTTP al descargar la imagen de {img_url}: {str(e)}")
+
+    content_type = response.headers.get('content-type', '')
+    if not content_type.startswith('image/'):
+        logger.error(f"El contenido no es una imagen: {content_type}")
         return None
-    except Exception as e:
-        logger.error(f"Error inesperado al descargar o codificar la imagen {img_url}: {str(e)}")
+    if not response.content:
+        logger.error("El contenido de la imagen está vacío")
         return None
+    return response.content
 
-def search_logo_in_main_page(brand):
-    """
-    Busca el logo en la página principal de carlogos.org si no encuentra la página específica
-    
-    Args:
-        brand (str): Nombre de la marca del coche
-    
-    Returns:
-        str: Imagen del logo codificada en base64 o None si no se encuentra
-    """
-    try:
-        # URL de la página principal con todos los logos
-        url = "https://www.carlogos.org/car-brands/"
-        
-        # Realizar petición HTTP con timeout para evitar que se quede esperando
-        try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
-            response.raise_for_status()  # Lanzar excepción si hay error HTTP
-        except (requests.RequestException, requests.Timeout) as e:
-            logger.warning(f"No se pudo acceder a la página principal de carlogos.org: {str(e)}")
-            return search_direct_image(brand)
-        
-        # Parsear la página HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Normalizar el nombre de la marca para buscar coincidencias
-        search_brand = normalize_brand_name(brand)
-        
-        # Método 1: Buscar enlaces con clase logo-item que contengan el nombre de la marca
-        logo_links = soup.find_all('a', class_='logo-item')
-        for link in logo_links:
-            # Obtener el texto del enlace y normalizarlo
-            link_text = link.get_text().lower() if link.get_text() else ''
-            
-            # Buscar coincidencias con el nombre de la marca
-            if search_brand in link_text or any(search_brand in alt.lower() for alt in link.get('alt', '').split()):
-                # Encontrar la imagen dentro del enlace
-                img_tag = link.find('img')
-                if img_tag and img_tag.get('src'):
-                    img_url = img_tag.get('src')
-                    logger.info(f"Encontrado logo en página principal mediante logo-item: {img_url}")
-                    # Asegurarse de que la URL sea absoluta
-                    if not img_url.startswith(('http://', 'https://')):
-                        img_url = f"https://www.carlogos.org{img_url}"
-                    return download_and_encode_image(img_url)
-        
-        # Método 2: Buscar cualquier imagen que coincida con el patrón /car-logos/{brand}*.png
-        img_tags = soup.find_all('img')
-        for img in img_tags:
-            src = img.get('src', '')
-            if f"/car-logos/{search_brand}" in src.lower() and '.png' in src.lower():
-                logger.info(f"Encontrado logo en página principal mediante patrón en src: {src}")
-                # Asegurarse de que la URL sea absoluta
-                if not src.startswith(('http://', 'https://')):
-                    src = f"https://www.carlogos.org{src}"
-                return download_and_encode_image(src)
-        
-        logger.warning(f"No se encontró coincidencia para {brand} en la página principal")
-        return search_direct_image(brand)
-    
-    except Exception as e:
-        logger.error(f"Error al buscar el logo en la página principal para {brand}: {str(e)}")
-        return search_direct_image(brand)
-
-def search_direct_image(brand):
+async def search_direct_image(client, normalized_brand) -> Optional[bytes]:
     """
     Último recurso: buscar directamente una URL de imagen basada en patrones comunes
-    
-    Args:
-        brand (str): Nombre de la marca del coche
-    
-    Returns:
-        str: Imagen del logo codificada en base64 o None si no se encuentra
     """
-    try:
-        normalized_brand = normalize_brand_name(brand)
-        
-        # Lista de posibles patrones de URL para el logo
-        url_patterns = [
-            f"https://www.carlogos.org/car-logos/{normalized_brand}-logo.png",
-            f"https://www.carlogos.org/car-logos/{normalized_brand}-logo-640.png", 
-            f"https://www.carlogos.org/car-logos/{normalized_brand}-logo-2020-640.png",
-            f"https://www.carlogos.org/car-logos/{normalized_brand}-logo-2017-640.png",
-            f"https://www.carlogos.org/logo/{normalized_brand}-logo.png"
-        ]
-        
-        for url in url_patterns:
-            try:
-                response = requests.get(url, headers=HEADERS, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"Encontrado logo mediante URL directa: {url}")
-                    return base64.b64encode(response.content).decode('utf-8')
-            except:
-                continue
-        
-        logger.warning(f"No se pudo encontrar un logo para {brand} mediante ningún método")
-        return None
-    
-    except Exception as e:
-        logger.error(f"Error al buscar la imagen directamente para {brand}: {str(e)}")
-        return None 
\ No newline at end of file
+    url_patterns = [
+        f"/car-logos/{normalized_brand}-logo.png",
+        f"/car-logos/{normalized_brand}-logo-640.png",
+        f"/car-logos/{normalized_brand}-logo-2020-640.png",
+        f"/car-logos/{normalized_brand}-logo-2017-640.png",
+        f"/logo/{normalized_brand}-logo.png"
+    ]
+    for url in url_patterns:
+        logo = await download_image(client, url)
+        if logo:
+            logger.info(f"Encontrado logo mediante URL directa: {url}")
+            return logo
+
+    logger.warning(f"No se pudo encontrar un logo para {normalized_brand} mediante ningún método")
+    return None
@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Comandos internos del driver que no son consultas de la aplicación
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "killCursors"}
+
+
+class RequestQueryStats:
+    """Comandos ejecutados durante una petición HTTP"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = 0
+        self.failures = 0
+        self.duration = 0.0
+        self.by_command: Counter = Counter()
+
+    def started(self, command_name: str, collection: Optional[str]) -> None:
+        with self._lock:
+            self.commands += 1
+            self.by_command[(command_name, collection)] += 1
+
+    def finished(self, duration: float, failed: bool = False) -> None:
+        with self._lock:
+            self.duration += duration
+            if failed:
+                self.failures += 1
+
+    def repeated(self, threshold: int) -> dict:
+        """Comandos repetidos más de 'threshold' veces sobre la misma colección (posible N+1)"""
+        return {
+            f"{name} {collection}": count
+            for (name, collection), count in self.by_command.items()
+            if count > threshold
+        }
+
+
+current_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_request_stats", default=None)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Atribuye cada comando de MongoDB a la petición HTTP en curso.
+
+    Motor ejecuta las operaciones en hilos propios pero copia el contexto, así que
+    la ContextVar fijada por QueryMonitorMiddleware es visible desde los eventos.
+    """
+
+    def started(self, event):
+        stats = current_request_stats.get()
+        if stats is None or event.command_name in IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        stats.started(event.command_name, collection if isinstance(collection, str) else None)
+
+    def succeeded(self, event):
+        stats = current_request_stats.get()
+        if stats is not None and event.command_name not in IGNORED_COMMANDS:
+            stats.finished(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        stats = current_request_stats.get()
+        if stats is not None and event.command_name not in IGNORED_COMMANDS:
+            stats.finished(event.duration_micros / 1_000_000, failed=True)
+
+
+class RouteQueryMetrics:
+    """Acumulado de comandos por ruta, con aviso al superar el presupuesto por petición"""
+
+    def __init__(self, query_budget: int = 10, repeat_threshold: int = 5):
+        self.query_budget = query_budget
+        self.repeat_threshold = repeat_threshold
+        self._lock = threading.Lock()
+        self._routes: dict = {}
+
+    def record(self, route: str, stats: RequestQueryStats) -> None:
+        repeated = stats.repeated(self.repeat_threshold)
+        over_budget = stats.commands > self.query_budget
+
+        with self._lock:
+            entry = self._routes.setdefault(route, {
+                "requests": 0, "commands": 0, "failures": 0, "duration": 0.0,
+                "max_commands": 0, "over_budget": 0, "by_command": Counter(),
+            })
+            entry["requests"] += 1
+            entry["commands"] += stats.commands
+            entry["failures"] += stats.failures
+            entry["duration"] += stats.duration
+            entry["max_commands"] = max(entry["max_commands"], stats.commands)
+            entry["over_budget"] += int(over_budget)
+            for (name, collection), count in stats.by_command.items():
+                entry["by_command"][f"{name} {collection}"] += count
+
+        if over_budget:
+            logger.warning(
+                f"{route} ejecutó {stats.commands} comandos de MongoDB "
+                f"(presupuesto {self.query_budget}, {stats.duration * 1000:.1f} ms): {dict(stats.by_command)}"
+            )
+        if repeated:
+            logger.warning(f"{route}: comandos repetidos en una misma petición (posible N+1): {repeated}")
+
+    def stats(self) -> dict:
+        """Comandos por ruta: totales, media por petición y desglose por comando y colección"""
+        with self._lock:
+            return {
+                route: {
+                    "requests": entry["requests"],
+                    "commands": entry["commands"],
+                    "avg_commands": round(entry["commands"] / entry["requests"], 2),
+                    "max_commands": entry["max_commands"],
+                    "avg_db_ms": round(entry["duration"] / entry["requests"] * 1000, 3),
+                    "failures": entry["failures"],
+                    "over_budget": entry["over_budget"],
+                    "by_command": dict(entry["by_command"]),
+                }
+                for route, entry in self._routes.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+class QueryMonitorMiddleware:
+    """Middleware ASGI que abre un RequestQueryStats por petición y lo registra por ruta"""
+
+    def __init__(self, app, metrics: RouteQueryMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = current_request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request_stats.reset(token)
+            route = scope.get("route")
+            if route is not None and stats.commands:
+                self.metrics.record(f"{scope['method']} {route_template(scope['path'], route.path)}", stats)
+
+
+def route_template(path: str, route_path: str) -> str:
+    """
+    Plantilla completa de la ruta ('/vehicles/{vehicle_id}'). Con routers incluidos,
+    route.path no lleva el prefijo; como cada parámetro ocupa un segmento, el prefijo
+    son los primeros segmentos de la ruta real que no cubre la plantilla.
+    """
+    segments = [segment for segment in path.split("/") if segment]
+    route_segments = [segment for segment in route_path.split("/") if segment]
+    prefix = segments[:max(0, len(segments) - len(route_segments))]
+    return "/" + "/".join(prefix + route_segments)
+
+
+command_metrics = CommandMetricsListener()
+
+route_query_metrics = RouteQueryMetrics(
+    query_budget=int(os.getenv("QUERY_BUDGET_PER_REQUEST", 10)),
+    repeat_threshold=int(os.getenv("QUERY_REPEAT_THRESHOLD", 5)),
+)
@@ -0,0 +1,118 @@
+import re
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+
+# Tamaño de lectura del fichero subido. Starlette ya lo vuelca a disco a partir de
+# 1 MB, así que leyendo por bloques el PDF nunca está entero en memoria
+UPLOAD_READ_SIZE = 1024 * 1024
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+async def upload_to_gridfs(bucket, upload: UploadFile, filename: str, metadata: Optional[dict] = None):
+    """
+    Sube el fichero a GridFS bloque a bloque con open_upload_stream.
+
+    Returns:
+        ObjectId: ID del fichero en GridFS
+    """
+    grid_in = bucket.open_upload_stream(filename, metadata=metadata)
+    try:
+        while True:
+            block = await upload.read(UPLOAD_READ_SIZE)
+            if not block:
+                break
+            await grid_in.write(block)
+        await grid_in.close()
+    except BaseException:
+        # Borra los chunks ya escritos de una subida incompleta
+        await grid_in.abort()
+        raise
+    return grid_in._id
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """
+    Rango (inicio, fin inclusive) de una cabecera 'Range: bytes=...'. Devuelve None
+    si no hay cabecera o si no es un rango simple (se sirve el fichero completo) y
+    lanza 416 si el rango queda fuera del fichero.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), length - 1) if last else length - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # bytes=-N: los últimos N bytes
+        start = max(0, length - int(last))
+        end = length - 1
+
+    if start >= length or length == 0:
+        raise HTTPException(
+            status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+            detail="Rango fuera del fichero",
+            headers={"Content-Range": f"bytes */{length}"},
+        )
+    return start, end
+
+
+async def _iter_range(grid_out, start: int, end: int) -> AsyncIterator[bytes]:
+    """Lee de GridFS solo los chunks que cubren [start, end]"""
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+
+
+def gridfs_response(grid_out, request: Request, media_type: str, cache_control: str = "private, no-cache") -> Response:
+    """
+    Respuesta en streaming de un fichero GridFS con soporte de Range, If-Range e
+    If-None-Match. Los ficheros de GridFS no se modifican nunca, así que su _id es un ETag fuerte.
+    """
+    etag = f'"{grid_out._id}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    length = grid_out.length
+    byte_range = parse_range(request.headers.get("range"), length)
+
+    # If-Range: si el fichero cambió desde que el cliente empezó, se envía completo
+    if_range = request.headers.get("if-range")
+    if byte_range and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range is None:
+        start, end, status_code = 0, length - 1, status.HTTP_200_OK
+    else:
+        (start, end), status_code = byte_range, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+
+    return StreamingResponse(
+        _iter_range(grid_out, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
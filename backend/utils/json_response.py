@@ -0,0 +1,106 @@
+import json
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from bson import Decimal128, ObjectId
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute, request_response
+from pydantic import BaseModel, TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+    logger.warning("El paquete 'orjson' no está instalado; las respuestas JSON usarán el módulo json estándar")
+
+
+def _default(value: Any) -> Any:
+    """Tipos que ni orjson ni json saben serializar por sí mismos"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    # Solo se llega aquí con el módulo json estándar: orjson ya serializa estos tipos
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable a JSON: {type(value).__name__}")
+
+
+def json_dumps(content: Any) -> bytes:
+    """
+    Serializa a JSON en bytes. Con orjson los datetime y los UUID se codifican de
+    forma nativa y ObjectId/Decimal128 pasan por _default, así que se pueden devolver
+    documentos de MongoDB sin convertirlos antes a str.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse basada en orjson con soporte nativo de ObjectId y datetime"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Ruta que usa FastJSONResponse cuando no declara response_model.
+
+    Las rutas con response_model se dejan con la clase por defecto: FastAPI las
+    serializa directamente con pydantic (dump_json) y fijar una clase explícita
+    desactivaría ese camino, que es más rápido que volcar el modelo y pasar por orjson.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        if self.response_field is None and isinstance(self.response_class, DefaultPlaceholder):
+            self.response_class = FastJSONResponse
+            self.app = request_response(self.get_route_handler())
+
+
+class ResponseSerializer:
+    """
+    TypeAdapter precompilado para el response_model de una ruta.
+
+    Valida los datos una sola vez y los serializa a bytes con pydantic. Como la ruta
+    devuelve la Response ya construida, FastAPI no vuelve a validarla contra su
+    response_model (que se mantiene para la documentación OpenAPI).
+
+    Con trusted=True no se valida: los datos se serializan tal cual con json_dumps.
+    Solo para rutas que construyen cada campo con el tipo del esquema a partir de
+    documentos escritos por la propia API.
+    """
+
+    def __init__(self, response_type, trusted: bool = False):
+        self.adapter = TypeAdapter(response_type)
+        self.trusted = trusted
+
+    def validate(self, data: Any) -> Any:
+        return self.adapter.validate_python(data)
+
+    def dump_json(self, data: Any, include: Any = None) -> bytes:
+        if self.trusted:
+            return json_dumps(data)
+        return self.adapter.dump_json(self.validate(data), by_alias=True, include=include)
+
+    def response(self, data: Any, status_code: int = 200, include: Any = None) -> Response:
+        """
+        include sigue el formato de pydantic ({'__all__': {...}} para listas). En modo
+        de confianza no se aplica: la ruta debe construir solo los campos pedidos.
+        """
+        return Response(self.dump_json(data, include), status_code=status_code, media_type="application/json")
@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import weakref
+from collections import deque
+from typing import Dict, Optional
+
+from utils.pool_metrics import _percentile
+
+logger = logging.getLogger(__name__)
+
+# Respuestas que indican un fallo transitorio del proveedor (524: timeout de Cloudflare)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 524}
+
+
+class LLMError(Exception):
+    """Error al llamar al modelo. retryable indica si es un fallo transitorio del proveedor"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMError):
+    """El circuito del proveedor está abierto: no se envía la petición"""
+
+
+def openrouter_headers() -> dict:
+    """Cabeceras de OpenRouter; HTTP-Referer y X-Title son opcionales y se omiten si no están configuradas"""
+    headers = {
+        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+        "Content-Type": "application/json",
+    }
+    for header, variable in (("HTTP-Referer", "HTTP_REFERER"), ("X-Title", "X_TITLE")):
+        value = os.getenv(variable)
+        if value:
+            headers[header] = value
+    return headers
+
+
+class CircuitBreaker:
+    """
+    Circuito de un proveedor: tras failure_threshold fallos transitorios seguidos
+    se abre y rechaza las peticiones durante reset_timeout segundos. Después deja
+    pasar una sola petición de prueba (half_open): si va bien se cierra, si falla
+    se vuelve a abrir.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self) -> None:
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "opened": self.opened}
+
+
+class LLMClient:
+    """
+    Cliente asíncrono para APIs de chat compatibles con OpenAI/OpenRouter.
+
+    - Un único httpx.AsyncClient con pool de conexiones (keep-alive) para todo el proceso.
+    - Reintentos de los fallos transitorios con backoff exponencial y jitter
+      (o el Retry-After del proveedor).
+    - Un circuit breaker por proveedor (prefijo del modelo, p. ej. 'openai' en
+      'openai/gpt-4o'): si el proveedor está caído se falla al momento.
+    - Como mucho max_concurrency peticiones a la vez; el resto espera su turno.
+    - Métricas de latencia y errores (ver stats()).
+
+    url y headers se leen del entorno en cada petición si no se indican; transport
+    permite probarlo contra un servidor local (httpx.MockTransport).
+    """
+
+    def __init__(self, url: Optional[str] = None, headers: Optional[dict] = None,
+                 timeout: float = 90.0, connect_timeout: float = 10.0, max_retries: int = 2,
+                 backoff_base: float = 1.0, backoff_max: float = 20.0, max_concurrency: int = 4,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 transport=None, sample_size: int = 500):
+        self.url = url
+        self.headers = headers
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max(1, max_concurrency)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.transport = transport
+        # Por event loop: cliente HTTP y semáforo (las conexiones no se comparten entre loops)
+        self._clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies = deque(maxlen=sample_size)
+        self._in_flight = 0
+        self._waiting = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.status_errors: Dict[str, int] = {}
+
+    def _get_http(self):
+        """Cliente HTTP y semáforo del event loop actual; se crean en su primer uso"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                transport=self.transport,
+            )
+            entry = self._clients[loop] = (http, asyncio.Semaphore(self.max_concurrency))
+        return entry
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    async def chat_completion(self, payload: dict, max_retries: Optional[int] = None) -> dict:
+        """
+        Envía payload (model, messages, ...) y devuelve la respuesta JSON del proveedor.
+
+        Raises:
+            CircuitOpenError: Si el circuito del proveedor está abierto
+            LLMError: Si la petición falla y no se puede (o no quedan) reintentos
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        provider = _provider(payload.get("model"))
+        breaker = self.breaker(provider)
+        self.requests += 1
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"El proveedor {provider} no está disponible; se reintentará en {breaker.reset_timeout:g} s",
+                    status_code=503,
+                )
+            try:
+                result = await self._send(payload)
+            except LLMError as e:
+                self._count_error(e)
+                if not e.retryable:
+                    # El proveedor responde: el error es de la petición, no del proveedor
+                    breaker.record_success()
+                    self.failures += 1
+                    raise
+                breaker.record_failure()
+                if attempt >= retries:
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e.retry_after)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"Fallo de {provider} ({e}); reintento {attempt} de {retries} en {delay:.1f} s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelación o error inesperado (p. ej. una URL mal configurada): si era
+                # la petición de prueba, la siguiente puede volver a probar
+                breaker.release()
+                raise
+            breaker.record_success()
+            self.successes += 1
+            return result
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # Full jitter: las réplicas que fallan a la vez no reintentan a la vez
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _send(self, payload: dict) -> dict:
+        import httpx
+
+        http, semaphore = self._get_http()
+        url = self.url or os.getenv('OPENROUTER_URL')
+        headers = self.headers if self.headers is not None else openrouter_headers()
+
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            response = await http.post(url, json=payload, headers=headers)
+        except httpx.TimeoutException as e:
+            self.timeouts += 1
+            raise LLMError(f"Timeout en la solicitud ({type(e).__name__})", retryable=True) from e
+        except httpx.RequestError as e:
+            # Conexión, protocolo, descompresión de la respuesta, redirecciones...
+            raise LLMError(f"Error en la solicitud: {type(e).__name__}: {e}", retryable=True) from e
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+        self._latencies.append(time.perf_counter() - started)
+
+        if response.status_code >= 400:
+            raise LLMError(
+                f"Error {response.status_code} del proveedor: {response.text[:500]}",
+                status_code=response.status_code,
+                retryable=response.status_code in RETRYABLE_STATUS,
+                retry_after=_retry_after(response),
+            )
+        try:
+            result = response.json()
+        except ValueError as e:
+            raise LLMError("La respuesta del proveedor no es JSON", status_code=502, retryable=True) from e
+
+        # OpenRouter devuelve algunos errores del proveedor con status 200
+        if isinstance(result, dict) and "error" in result:
+            error = result["error"] if isinstance(result["error"], dict) else {"message": str(result["error"])}
+            code = error.get("code")
+            raise LLMError(
+                error.get("message", "Error desconocido de OpenRouter"),
+                status_code=code if isinstance(code, int) else 502,
+                retryable=code in RETRYABLE_STATUS,
+            )
+        return result
+
+    def _count_error(self, error: LLMError) -> None:
+        key = "network" if error.status_code is None else str(error.status_code)
+        self.status_errors[key] = self.status_errors.get(key, 0) + 1
+
+    async def close(self) -> None:
+        """Cierra los clientes HTTP de todos los event loops que siguen abiertos"""
+        current = asyncio.get_running_loop()
+        clients, self._clients = list(self._clients.items()), weakref.WeakKeyDictionary()
+        for loop, (http, _) in clients:
+            if loop is current:
+                await http.aclose()
+            elif loop.is_running():
+                # Las conexiones son de ese loop: se cierran en él
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(http.aclose(), loop))
+            # Con el loop ya cerrado sus conexiones no se pueden cerrar de forma ordenada
+
+    def stats(self) -> dict:
+        samples = sorted(self._latencies)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "errors": dict(self.status_errors),
+            "latency_ms": {
+                "avg": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+                "p50": round(_percentile(samples, 0.50) * 1000, 3),
+                "p95": round(_percentile(samples, 0.95) * 1000, 3),
+                "max": round(samples[-1] * 1000, 3) if samples else 0.0,
+            },
+            "circuits": {provider: breaker.stats() for provider, breaker in self._breakers.items()},
+        }
+
+
+def _provider(model: Optional[str]) -> str:
+    if model and "/" in model:
+        return model.split("/", 1)[0]
+    return model or "default"
+
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+llm_client = LLMClient(
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", 90)),
+    connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", 10)),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+    backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1)),
+    backoff_max=float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 20)),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+    failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURES", 5)),
+    reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", 30)),
+)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from utils.car_logo_scraper import HEADERS, fetch_car_logo, normalize_brand_name
+from utils.logo_store import save_logo
+
+logger = logging.getLogger(__name__)
+
+# Marca normalizada -> hash del logo (o None si la marca no tiene logo)
+BRAND_LOGOS_COLLECTION = "brand_logos"
+
+
+class LogoResolver:
+    """
+    Resuelve el logo de una marca sin bloquear el event loop.
+
+    - Caché persistente en MongoDB (brand_logos): cada marca se busca una sola vez.
+    - Caché negativa: las marcas sin logo no se vuelven a buscar hasta pasado negative_ttl.
+    - Single-flight: las peticiones simultáneas para la misma marca comparten la búsqueda.
+
+    Los errores de red o los timeouts no se cachean: la siguiente petición lo reintenta.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 8.0, negative_ttl: timedelta = timedelta(days=7), transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self.transport = transport
+        self._inflight: dict = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.fetches = 0
+        self.shared = 0
+        self.errors = 0
+
+    async def resolve(self, database, brand: Optional[str]) -> Optional[str]:
+        """
+        Returns:
+            str: Hash del logo en la colección logos, o None si no hay logo
+        """
+        key = normalize_brand_name(brand or "")
+        if not key:
+            return None
+
+        cached = await database[BRAND_LOGOS_COLLECTION].find_one({"_id": key})
+        if cached:
+            if cached.get("logo_hash"):
+                self.hits += 1
+                return cached["logo_hash"]
+            if cached["resolved_at"] + self.negative_ttl > datetime.utcnow():
+                self.negative_hits += 1
+                return None
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(self._fetch_and_store(database, key, brand))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: si se cancela una petición, la búsqueda sigue para las demás
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, database, key: str, brand: str) -> Optional[str]:
+        import httpx
+
+        self.fetches += 1
+        try:
+            async with httpx.AsyncClient(
+                base_url=self.base_url, headers=HEADERS, timeout=self.timeout,
+                follow_redirects=True, transport=self.transport,
+            ) as client:
+                logo = await asyncio.wait_for(fetch_car_logo(client, brand), timeout=self.timeout)
+        except (asyncio.TimeoutError, httpx.HTTPError) as e:
+            self.errors += 1
+            logger.warning(f"No se pudo consultar el logo de {brand}: {type(e).__name__}: {e}")
+            return None
+        except Exception as e:
+            # URL mal formada en la página, HTML inesperado...: reintentarlo daría lo
+            # mismo, así que se guarda como marca sin logo
+            self.errors += 1
+            logger.warning(f"Error al obtener el logo de {brand}: {type(e).__name__}: {e}")
+            logo = None
+
+        logo_hash = await save_logo(database, logo, brand) if logo else None
+        await database[BRAND_LOGOS_COLLECTION].update_one(
+            {"_id": key},
+            {"$set": {"logo_hash": logo_hash, "resolved_at": datetime.utcnow()}},
+            upsert=True
+        )
+        if not logo_hash:
+            logger.info(f"La marca {brand} no tiene logo; no se volverá a buscar en {self.negative_ttl}")
+        return logo_hash
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "fetches": self.fetches,
+            "shared": self.shared,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+        }
+
+
+logo_resolver = LogoResolver(
+    base_url=os.getenv("CAR_LOGOS_BASE_URL", "https://www.carlogos.org"),
+    timeout=float(os.getenv("LOGO_RESOLVE_TIMEOUT_SECONDS", 8)),
+    negative_ttl=timedelta(hours=float(os.getenv("LOGO_NEGATIVE_TTL_HOURS", 24 * 7))),
+)
@@ -0,0 +1,174 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import re
+from datetime import datetime
+from typing import Iterable, Optional
+
+from utils.logo_thumbnails import THUMBNAIL_CONTENT_TYPE, closest_size, make_thumbnails
+
+logger = logging.getLogger(__name__)
+
+# Los logos se guardan una sola vez por contenido: el _id es el SHA-256 de la imagen
+LOGOS_COLLECTION = "logos"
+
+# El contenido de /logos/{hash} no cambia nunca, así que se puede cachear indefinidamente
+LOGO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Los logos se decodifican y se vuelven a codificar en PNG: solo se aceptan imágenes
+# raster (nunca SVG ni HTML, que servidos desde el origen de la API permitirían XSS)
+LOGO_CONTENT_TYPE = "image/png"
+MAX_LOGO_PIXELS = 4096 * 4096
+_LOGO_FORMATS = ["PNG", "JPEG", "GIF", "WEBP"]
+_PNG_MODES = ("1", "L", "LA", "P", "RGB", "RGBA")
+
+
+def logo_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_logo_hash(value: str) -> bool:
+    return bool(value) and bool(_HASH_PATTERN.match(value))
+
+
+def logo_url(digest: Optional[str]) -> Optional[str]:
+    """Ruta relativa desde la que se sirve el logo"""
+    return f"/logos/{digest}" if digest else None
+
+
+def normalize_logo(data: bytes) -> Optional[bytes]:
+    """
+    Decodifica el logo con Pillow y lo devuelve codificado de nuevo en PNG (sin
+    metadatos ni bytes añadidos). None si no es una imagen raster válida o si
+    Pillow no está instalado.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("El paquete 'Pillow' no está instalado; no se aceptan logos")
+        return None
+
+    try:
+        # Solo los decodificadores de estos formatos (p. ej. EPS ejecutaría Ghostscript)
+        image = Image.open(io.BytesIO(data), formats=_LOGO_FORMATS)
+        if image.width * image.height > MAX_LOGO_PIXELS:
+            logger.info(f"Logo demasiado grande: {image.width}x{image.height}")
+            return None
+        image.load()
+        if image.mode not in _PNG_MODES:
+            image = image.convert("RGBA")
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+    except Exception as e:
+        logger.info(f"El logo no es una imagen válida: {type(e).__name__}: {e}")
+        return None
+    return buffer.getvalue()
+
+
+def decode_base64_logo(logo: Optional[str]) -> Optional[bytes]:
+    """Bytes de un logo en base64 (admite el prefijo data:image/...;base64,)"""
+    if not logo:
+        return None
+    if logo.startswith("data:") and "," in logo:
+        logo = logo.split(",", 1)[1]
+    try:
+        data = base64.b64decode(logo, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data or None
+
+
+async def save_logo(database, data: bytes, brand: Optional[str] = None) -> Optional[str]:
+    """
+    Guarda el logo (normalizado a PNG) si no existe ya otro con el mismo contenido
+    y asocia la marca.
+
+    Returns:
+        str: Hash del logo, o None si no es una imagen raster válida
+    """
+    data = await asyncio.to_thread(normalize_logo, data)
+    if data is None:
+        return None
+    digest = logo_hash(data)
+    update = {
+        "$setOnInsert": {
+            "data": data,
+            "content_type": LOGO_CONTENT_TYPE,
+            "size": len(data),
+            "created_at": datetime.utcnow(),
+        }
+    }
+    if brand:
+        update["$addToSet"] = {"brands": brand.strip().lower()}
+    result = await database[LOGOS_COLLECTION].update_one({"_id": digest}, update, upsert=True)
+    if result.upserted_id is not None:
+        # Las miniaturas se generan una sola vez, cuando el logo entra en el almacén
+        await generate_thumbnails(database, digest, data)
+    return digest
+
+
+async def generate_thumbnails(database, digest: str, data: bytes) -> dict:
+    """
+    Genera y guarda las miniaturas normalizadas de un logo (cada una es a su vez un
+    logo direccionado por contenido) y las enlaza desde el original en 'thumbnails'.
+    Si no se pueden generar queda {} y se sirve siempre el original.
+    """
+    thumbnails = await asyncio.to_thread(make_thumbnails, data)
+    variants = {}
+    for width, thumbnail in thumbnails.items():
+        variant = logo_hash(thumbnail)
+        await database[LOGOS_COLLECTION].update_one(
+            {"_id": variant},
+            {"$setOnInsert": {
+                "data": thumbnail,
+                "content_type": THUMBNAIL_CONTENT_TYPE,
+                "size": len(thumbnail),
+                "width": width,
+                "variant_of": digest,
+                "created_at": datetime.utcnow(),
+            }},
+            upsert=True
+        )
+        variants[str(width)] = variant
+    await database[LOGOS_COLLECTION].update_one({"_id": digest}, {"$set": {"thumbnails": variants}})
+    return variants
+
+
+async def resolve_variant(database, digest: str, width: Optional[int]) -> str:
+    """Hash de la miniatura más adecuada para 'width' px, o el del original si no la hay"""
+    if not width or not is_logo_hash(digest):
+        return digest
+    logo = await database[LOGOS_COLLECTION].find_one({"_id": digest}, {"thumbnails": 1})
+    thumbnails = (logo or {}).get("thumbnails") or {}
+    return thumbnails.get(str(closest_size(width)), digest)
+
+
+async def save_base64_logo(database, logo: Optional[str], brand: Optional[str] = None) -> Optional[str]:
+    """Como save_logo para logos en base64. None si el valor no es una imagen en base64 válida"""
+    data = decode_base64_logo(logo)
+    if data is None:
+        return None
+    return await save_logo(database, data, brand)
+
+
+async def get_logo(database, digest: str) -> Optional[dict]:
+    if not is_logo_hash(digest):
+        return None
+    return await database[LOGOS_COLLECTION].find_one({"_id": digest})
+
+
+async def logos_as_base64(database, digests: Iterable[Optional[str]]) -> dict:
+    """
+    Logos en base64 por hash, en una sola consulta. Se usa para seguir rellenando el
+    campo 'logo' de las respuestas de vehículos que aún lo esperan en línea.
+    """
+    unique = {digest for digest in digests if digest}
+    if not unique:
+        return {}
+    cursor = database[LOGOS_COLLECTION].find({"_id": {"$in": list(unique)}}, {"data": 1})
+    return {document["_id"]: base64.b64encode(document["data"]).decode("ascii") async for document in cursor}
@@ -0,0 +1,71 @@
+import io
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tamaños (en px, cuadrados) que pinta la app: vehicle_card usa el pequeño y
+# vehicle_header el mediano; el grande cubre pantallas de alta densidad
+THUMBNAIL_SIZES = (48, 96, 192)
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+THUMBNAIL_QUALITY = 90
+
+
+def closest_size(requested: int) -> int:
+    """Menor miniatura que cubre el tamaño pedido (o la mayor si ninguna lo cubre)"""
+    for size in THUMBNAIL_SIZES:
+        if size >= requested:
+            return size
+    return THUMBNAIL_SIZES[-1]
+
+
+def make_thumbnails(data: bytes) -> Dict[int, bytes]:
+    """
+    Normaliza un logo: recorta los bordes transparentes o de color uniforme, lo
+    ajusta a cada tamaño de THUMBNAIL_SIZES sobre un lienzo cuadrado transparente
+    y lo codifica en WebP.
+
+    Pillow es opcional: sin él (o si la imagen no se puede decodificar, p. ej. SVG)
+    devuelve un diccionario vacío y se sigue sirviendo el original.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.warning("El paquete 'Pillow' no está instalado; no se generan miniaturas de logos")
+        return {}
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        logger.info(f"No se pueden generar miniaturas del logo: {type(e).__name__}: {e}")
+        return {}
+
+    image = _trim(image.convert("RGBA"))
+    if image is None:
+        return {}
+
+    thumbnails = {}
+    for size in THUMBNAIL_SIZES:
+        fitted = ImageOps.contain(image, (size, size), Image.LANCZOS)
+        canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        canvas.paste(fitted, ((size - fitted.width) // 2, (size - fitted.height) // 2))
+        buffer = io.BytesIO()
+        canvas.save(buffer, "WEBP", quality=THUMBNAIL_QUALITY, method=6)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def _trim(image) -> Optional[object]:
+    """Recorta el borde transparente y, después, el de color uniforme (fondo blanco)"""
+    from PIL import Image, ImageChops
+
+    bbox = image.getchannel("A").getbbox()
+    if bbox is None:
+        # Imagen completamente transparente
+        return None
+    image = image.crop(bbox)
+
+    background = Image.new("RGBA", image.size, image.getpixel((0, 0)))
+    bbox = ImageChops.difference(image, background).getbbox()
+    return image.crop(bbox) if bbox else image
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import re
+from typing import Awaitable, Callable, List, Optional
+
+from config.llm_config import MAINTENANCE_PROMPT_VERSION, MAINTENANCE_SYSTEM_PROMPT, MAINTENANCE_USER_PROMPT
+from utils.llm_client import llm_client
+from utils.maintenance_cache import maintenance_cache, maintenance_cache_key
+from utils.manual_text import get_manual_text, prompt_text
+
+logger = logging.getLogger(__name__)
+
+# progress(etapa, porcentaje): lo usan los trabajos en segundo plano para informar del avance
+ProgressCallback = Callable[[str, int], Awaitable[None]]
+
+
+class ManualExtractionError(Exception):
+    """No se pudo obtener el texto del manual"""
+
+
+def _clean_json_string(text: str) -> str:
+    """Limpia una cadena JSON malformada"""
+    # Eliminar caracteres de escape innecesarios
+    text = text.replace('\\\"', '"')
+    text = text.replace('\\"', '"')
+
+    # Eliminar comillas simples si existen
+    text = text.replace("'", '"')
+
+    # Eliminar espacios en blanco en nombres de propiedades
+    text = re.sub(r'"(\w+)\s*":', r'"\1":', text)
+
+    # Corregir espacios en valores numéricos
+    text = re.sub(r':\s*(\d+)\s*,', r': \1,', text)
+
+    # Eliminar caracteres no válidos
+    text = re.sub(r'[^\x20-\x7E]', '', text)
+
+    return text
+
+
+def parse_recommendations(content: str) -> List[dict]:
+    """Array JSON de mantenimientos de la respuesta del modelo, validado y normalizado"""
+    try:
+        # Primero intentar parsear directamente
+        ai_response = json.loads(content)
+    except json.JSONDecodeError:
+        # Si falla, buscar el array JSON usando regex
+        json_match = re.search(r'\[(.*?)\]', content, re.DOTALL)
+        if not json_match:
+            logger.warning("No se encontró JSON en la respuesta del modelo")
+            return []
+        try:
+            ai_response = json.loads(_clean_json_string(f"[{json_match.group(1)}]"))
+        except json.JSONDecodeError as e:
+            logger.warning(f"Error al parsear el JSON limpio: {e}")
+            return []
+
+    recommendations = []
+    for item in ai_response:
+        if isinstance(item, dict) and "type" in item and "recommended_interval_km" in item:
+            try:
+                interval = int(float(str(item["recommended_interval_km"]).replace(',', '')))
+                # Capitalizar la primera letra del tipo de mantenimiento
+                maintenance_type = item["type"].strip()
+                maintenance_type = maintenance_type[0].upper() + maintenance_type[1:] if maintenance_type else ""
+
+                recommendations.append({
+                    "type": maintenance_type,
+                    "recommended_interval_km": interval,
+                    "notes": item.get("notes", "").strip()  # Incluir las notas si existen
+                })
+            except (ValueError, TypeError):
+                logger.warning(f"Valor inválido para recommended_interval_km: {item['recommended_interval_km']}")
+    return recommendations
+
+
+async def analyze_manual(database, bucket, key: str, file_id,
+                         progress: Optional[ProgressCallback] = None) -> dict:
+    """
+    Recomendaciones de mantenimiento del manual: texto del manual (guardado al
+    subirlo), caché de resultados y, si no está, llamada al modelo.
+
+    Returns:
+        dict: maintenance_recommendations y cached, o maintenance_recommendations
+        vacío y error si el modelo falla o su respuesta no es válida
+
+    Raises:
+        ManualExtractionError: Si no se puede extraer el texto del PDF
+    """
+    async def report(stage: str, percent: int) -> None:
+        if progress is not None:
+            await progress(stage, percent)
+
+    await report("extracting", 10)
+    try:
+        manual_text = await get_manual_text(database, bucket, key, file_id)
+    except Exception as e:
+        raise ManualExtractionError(str(e)) from e
+    logger.info(f"Texto del manual disponible ({manual_text['pages']} páginas)")
+
+    # Por defecto solo las tablas de mantenimiento de las páginas candidatas
+    cleaned_text = prompt_text(manual_text)
+
+    # El mismo texto con el mismo modelo y prompt da el mismo resultado
+    model = os.getenv('OPENROUTER_MODEL')
+    cache_key = maintenance_cache_key(model, MAINTENANCE_PROMPT_VERSION, cleaned_text)
+    cached = await maintenance_cache.get(database, cache_key)
+    if cached is not None:
+        logger.info("Recomendaciones de mantenimiento obtenidas de la caché")
+        return {"maintenance_recommendations": cached, "cached": True}
+
+    await report("analyzing", 40)
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": MAINTENANCE_SYSTEM_PROMPT},
+            {"role": "user", "content": MAINTENANCE_USER_PROMPT.format(text=cleaned_text)}
+        ],
+        "temperature": 0.1,
+        "top_p": 0.9,
+        "frequency_penalty": 0.0,
+        "presence_penalty": 0.0
+    }
+    # Reintentos con backoff y circuit breaker en el cliente
+    try:
+        result = await llm_client.chat_completion(data)
+    except Exception as e:
+        logger.warning(f"Error final en OpenRouter: {e}")
+        return {"maintenance_recommendations": [], "error": str(e)}
+
+    await report("parsing", 90)
+    try:
+        if "choices" not in result or not result["choices"]:
+            return {"maintenance_recommendations": [], "error": "Formato de respuesta inválido"}
+        content = result["choices"][0]["message"].get("content", "").strip()
+        recommendations = parse_recommendations(content)
+    except Exception as e:
+        return {"maintenance_recommendations": [], "error": f"Error al procesar la respuesta: {str(e)}"}
+
+    # Una lista vacía suele ser una respuesta que no se pudo interpretar: no se cachea
+    if recommendations:
+        await maintenance_cache.set(database, cache_key, recommendations, model, MAINTENANCE_PROMPT_VERSION)
+    return {"maintenance_recommendations": recommendations, "cached": False}
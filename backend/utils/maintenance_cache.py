@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Resultados de maintenance-ai por (modelo, versión del prompt, hash del texto
+# enviado). Los documentos caducan con el índice TTL sobre expires_at
+MAINTENANCE_AI_CACHE_COLLECTION = "maintenance_ai_cache"
+
+
+def maintenance_cache_key(model: Optional[str], prompt_version: int, text: str) -> str:
+    """Clave de la caché: SHA-256 del modelo, la versión del prompt y el texto"""
+    digest = hashlib.sha256(f"{model or ''}\0{prompt_version}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MaintenanceResultCache:
+    """
+    Caché de las recomendaciones de mantenimiento ya analizadas por el modelo.
+
+    - Persistente en MongoDB (maintenance_ai_cache), compartida entre procesos y
+      con caducidad por TTL.
+    - Delante, una caché LRU en memoria de front_size entradas que evita la
+      consulta a MongoDB en las repeticiones dentro del mismo proceso.
+
+    Los errores de MongoDB no hacen fallar el análisis: se tratan como un fallo de caché.
+    """
+
+    def __init__(self, ttl: timedelta = timedelta(days=30), front_size: int = 256):
+        self.ttl = ttl
+        self.front_size = front_size
+        self._front: "OrderedDict[str, tuple[float, list]]" = OrderedDict()
+        self.front_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    async def get(self, database, key: str) -> Optional[List[dict]]:
+        """Recomendaciones cacheadas para la clave, o None"""
+        entry = self._front.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._front.move_to_end(key)
+                self.front_hits += 1
+                return [dict(item) for item in entry[1]]
+            del self._front[key]
+
+        try:
+            cached = await database[MAINTENANCE_AI_CACHE_COLLECTION].find_one({"_id": key})
+        except PyMongoError as e:
+            self.errors += 1
+            logger.warning(f"No se pudo consultar la caché de maintenance-ai: {e}")
+            return None
+        # El monitor TTL borra cada minuto: un documento caducado puede seguir ahí
+        if cached is None or cached["expires_at"] <= datetime.utcnow():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._remember(key, cached["expires_at"], cached["recommendations"])
+        return cached["recommendations"]
+
+    async def set(self, database, key: str, recommendations: List[dict], model: Optional[str], prompt_version: int) -> None:
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        try:
+            await database[MAINTENANCE_AI_CACHE_COLLECTION].replace_one(
+                {"_id": key},
+                {
+                    "model": model,
+                    "prompt_version": prompt_version,
+                    "recommendations": recommendations,
+                    "created_at": now,
+                    "expires_at": expires_at,
+                },
+                upsert=True
+            )
+        except PyMongoError as e:
+            self.errors += 1
+            logger.warning(f"No se pudo guardar en la caché de maintenance-ai: {e}")
+        else:
+            self.stores += 1
+        self._remember(key, expires_at, recommendations)
+
+    def _remember(self, key: str, expires_at: datetime, recommendations: List[dict]) -> None:
+        if self.front_size <= 0:
+            return
+        remaining = (expires_at - datetime.utcnow()).total_seconds()
+        self._front[key] = (time.time() + remaining, [dict(item) for item in recommendations])
+        self._front.move_to_end(key)
+        while len(self._front) > self.front_size:
+            self._front.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vacía la caché en memoria sin reiniciar los contadores"""
+        self._front.clear()
+
+    def stats(self) -> dict:
+        total = self.front_hits + self.hits + self.misses
+        return {
+            "front_size": len(self._front),
+            "front_hits": self.front_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_ratio": round((self.front_hits + self.hits) / total, 3) if total else 0.0,
+        }
+
+
+maintenance_cache = MaintenanceResultCache(
+    ttl=timedelta(days=float(os.getenv("MAINTENANCE_AI_CACHE_TTL_DAYS", 30))),
+    front_size=int(os.getenv("MAINTENANCE_AI_CACHE_FRONT_SIZE", 256)),
+)
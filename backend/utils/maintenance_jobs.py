@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from storage import gridfs_bucket
+from utils.maintenance_ai import ManualExtractionError, analyze_manual
+
+logger = logging.getLogger(__name__)
+
+# Un documento por análisis en segundo plano. Mientras está en cola o en marcha
+# tiene active_key (clave del manual, índice único parcial): un segundo envío
+# del mismo manual se une a ese trabajo. Al terminar se quita active_key y los
+# documentos caducan con el índice TTL sobre expires_at
+MAINTENANCE_JOBS_COLLECTION = "maintenance_jobs"
+
+INTERRUPTED_ERROR = "El trabajo se interrumpió antes de terminar"
+
+# Dónde se ejecutan los trabajos:
+# - tasks: tareas asyncio en el proceso de la API que recibe el envío
+# - worker: la API solo los encola; los ejecuta 'python -m utils.maintenance_worker'
+# - inline: dentro de la propia petición de envío, que responde con el trabajo ya
+#   terminado. Es el modo por defecto en serverless (Vercel, AWS Lambda), donde la
+#   función se congela al enviar la respuesta y una tarea en segundo plano no avanzaría
+JOB_MODES = ("tasks", "worker", "inline")
+
+
+def default_job_mode() -> str:
+    mode = os.getenv("MAINTENANCE_JOB_MODE")
+    if mode:
+        return mode
+    if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return "inline"
+    return "tasks"
+
+
+class MaintenanceJobQueue:
+    """
+    Ejecuta maintenance-ai en segundo plano para no mantener abierta la petición
+    HTTP durante la descarga, la extracción y la llamada al modelo.
+
+    Los trabajos se guardan en MongoDB (el estado se consulta desde cualquier
+    proceso) y se ejecutan según mode (ver JOB_MODES), como mucho workers a la vez
+    por proceso. Un trabajo en cola se reclama con una actualización condicional
+    antes de ejecutarlo, así que nunca lo ejecutan dos procesos. Si el proceso que
+    lo ejecuta termina, el trabajo deja de actualizarse y, pasado stale_after, se da
+    por fallido al consultarlo y el siguiente envío del mismo manual crea otro.
+    """
+
+    def __init__(self, workers: int = 2, stale_after: timedelta = timedelta(minutes=15),
+                 retention: timedelta = timedelta(days=1), mode: str = "tasks"):
+        if mode not in JOB_MODES:
+            raise ValueError(f"Modo de trabajos desconocido: {mode} (válidos: {', '.join(JOB_MODES)})")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.stale_after = stale_after
+        self.retention = retention
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._tasks: set = set()
+        self._queued = 0
+        self._running = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    async def submit(self, database, manual_key, file_id) -> Tuple[dict, bool]:
+        """
+        Encola el análisis del manual, o devuelve el trabajo activo del mismo manual.
+
+        Returns:
+            Tuple[dict, bool]: Documento del trabajo y si se ha creado en esta llamada
+        """
+        active_key = str(manual_key)
+        collection = database[MAINTENANCE_JOBS_COLLECTION]
+        while True:
+            existing = await collection.find_one({"active_key": active_key})
+            if existing is not None:
+                if not self._is_stale(existing):
+                    self.coalesced += 1
+                    return existing, False
+                await self._abandon(database, existing)
+
+            now = datetime.utcnow()
+            job = {
+                "_id": ObjectId(),
+                "manual_key": manual_key,
+                "file_id": ObjectId(file_id),
+                "active_key": active_key,
+                "status": "queued",
+                "stage": "queued",
+                "progress": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            try:
+                await collection.insert_one(job)
+            except DuplicateKeyError:
+                # Otro proceso lo ha encolado entretanto: se vuelve a buscar
+                continue
+            self.submitted += 1
+            if self.mode == "tasks":
+                self._track(self._run(database, job))
+            elif self.mode == "inline":
+                if await self._claim(database, job):
+                    await self._execute(database, job)
+                job = await collection.find_one({"_id": job["_id"]})
+            return job, True
+
+    async def get(self, database, job_id: ObjectId) -> Optional[dict]:
+        """Trabajo por id; si sigue activo pero ya no se actualiza, se marca como fallido"""
+        collection = database[MAINTENANCE_JOBS_COLLECTION]
+        job = await collection.find_one({"_id": job_id})
+        if job is not None and "active_key" in job and self._is_stale(job):
+            await self._abandon(database, job)
+            job = await collection.find_one({"_id": job_id})
+        return job
+
+    def _is_stale(self, job: dict) -> bool:
+        return job["updated_at"] + self.stale_after <= datetime.utcnow()
+
+    async def _abandon(self, database, job: dict) -> None:
+        # Solo si nadie lo ha actualizado desde que se leyó
+        await self._finish(database, job, "failed", error=INTERRUPTED_ERROR,
+                           condition={"updated_at": job["updated_at"]})
+        self.abandoned += 1
+
+    def _ensure_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._slots
+
+    def _track(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        # Referencia fuerte hasta que termine (el event loop solo guarda referencias débiles)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _claim(self, database, job: dict) -> bool:
+        """Pasa el trabajo de la cola a en marcha. False si ya lo ha reclamado otro proceso"""
+        result = await database[MAINTENANCE_JOBS_COLLECTION].update_one(
+            {"_id": job["_id"], "status": "queued"},
+            {"$set": {"status": "running", "stage": "starting", "progress": 5, "updated_at": datetime.utcnow()}}
+        )
+        return bool(result.modified_count)
+
+    async def claim_next(self, database) -> Optional[dict]:
+        """Reclama el trabajo en cola más antiguo, o None si no hay ninguno"""
+        return await database[MAINTENANCE_JOBS_COLLECTION].find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "stage": "starting", "progress": 5, "updated_at": datetime.utcnow()}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def run_worker(self, database, poll_interval: float = 2.0) -> None:
+        """
+        Bucle del proceso worker (modo worker): reclama los trabajos en cola y
+        ejecuta como mucho workers a la vez. Termina al cancelarlo.
+        """
+        slots = self._ensure_slots()
+
+        async def execute(job: dict) -> None:
+            try:
+                await self._execute(database, job)
+            finally:
+                slots.release()
+
+        logger.info(f"Worker de maintenance-ai en marcha ({self.workers} trabajos a la vez)")
+        while True:
+            await slots.acquire()
+            try:
+                job = await self.claim_next(database)
+            except Exception:
+                logger.exception("No se pudo reclamar un trabajo de maintenance-ai")
+                job = None
+            if job is None:
+                slots.release()
+                await asyncio.sleep(poll_interval)
+                continue
+            self._track(execute(job))
+
+    async def _run(self, database, job: dict) -> None:
+        """Modo tasks: espera un hueco, reclama el trabajo y lo ejecuta"""
+        slots = self._ensure_slots()
+        self._queued += 1
+        try:
+            await slots.acquire()
+        except asyncio.CancelledError:
+            await self._finish(database, job, "failed", error=INTERRUPTED_ERROR)
+            raise
+        finally:
+            self._queued -= 1
+
+        try:
+            if await self._claim(database, job):
+                await self._execute(database, job)
+        finally:
+            slots.release()
+
+    async def _execute(self, database, job: dict) -> None:
+        """Ejecuta un trabajo ya reclamado y guarda el resultado"""
+        self._running += 1
+        try:
+            async def progress(stage: str, percent: int) -> None:
+                await self._update(database, job, "running", stage, percent)
+
+            result = await analyze_manual(
+                database, gridfs_bucket(database), job["manual_key"], job["file_id"], progress
+            )
+        except asyncio.CancelledError:
+            # Parada del proceso (ver shutdown)
+            await self._finish(database, job, "failed", error=INTERRUPTED_ERROR)
+            raise
+        except ManualExtractionError as e:
+            await self._finish(database, job, "failed", error=f"Error al extraer texto del PDF: {str(e)}")
+        except Exception as e:
+            logger.exception(f"Error en el trabajo de maintenance-ai {job['_id']}")
+            await self._finish(database, job, "failed", error=f"Error inesperado: {str(e)}")
+        else:
+            if result.get("error"):
+                await self._finish(database, job, "failed", error=result["error"])
+            else:
+                await self._finish(database, job, "completed", result=result)
+        finally:
+            self._running -= 1
+
+    async def _update(self, database, job: dict, status: str, stage: str, percent: int) -> None:
+        await database[MAINTENANCE_JOBS_COLLECTION].update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": status, "stage": stage, "progress": percent, "updated_at": datetime.utcnow()}}
+        )
+
+    async def _finish(self, database, job: dict, status: str, result: Optional[dict] = None,
+                      error: Optional[str] = None, condition: Optional[dict] = None) -> None:
+        now = datetime.utcnow()
+        fields = {
+            "status": status,
+            "stage": status,
+            "updated_at": now,
+            "finished_at": now,
+            "expires_at": now + self.retention,
+        }
+        if status == "completed":
+            fields["progress"] = 100
+            fields["result"] = result
+            self.completed += 1
+        else:
+            fields["error"] = error
+            self.failed += 1
+        try:
+            await database[MAINTENANCE_JOBS_COLLECTION].update_one(
+                {"_id": job["_id"], **(condition or {})},
+                {"$set": fields, "$unset": {"active_key": ""}}
+            )
+        except Exception:
+            # Se queda activo hasta que get o submit lo den por perdido (stale_after)
+            logger.exception(f"No se pudo guardar el final del trabajo de maintenance-ai {job['_id']}")
+
+    async def shutdown(self, timeout: float = 5.0) -> None:
+        """Cancela los trabajos en marcha o en cola; quedan guardados como fallidos"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queued": self._queued,
+            "running": self._running,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+        }
+
+
+maintenance_jobs = MaintenanceJobQueue(
+    workers=int(os.getenv("MAINTENANCE_JOB_WORKERS", 2)),
+    stale_after=timedelta(minutes=float(os.getenv("MAINTENANCE_JOB_STALE_MINUTES", 15))),
+    retention=timedelta(hours=float(os.getenv("MAINTENANCE_JOB_RETENTION_HOURS", 24))),
+    mode=default_job_mode(),
+)
@@ -0,0 +1,40 @@
+"""
+Worker de los trabajos de maintenance-ai (MAINTENANCE_JOB_MODE=worker):
+
+    python -m utils.maintenance_worker
+
+Reclama los trabajos en cola de la colección maintenance_jobs y los ejecuta. Se
+pueden arrancar varios: cada trabajo lo reclama uno solo.
+"""
+import asyncio
+import logging
+import os
+
+from database import db
+from utils.llm_client import llm_client
+from utils.maintenance_jobs import maintenance_jobs
+from utils.pdf_pool import pdf_pool
+
+
+async def main() -> None:
+    db.connect_to_database()
+    if db.db is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    try:
+        await maintenance_jobs.run_worker(
+            db.db, poll_interval=float(os.getenv("MAINTENANCE_WORKER_POLL_SECONDS", 2))
+        )
+    finally:
+        # Los trabajos en marcha quedan como fallidos antes de cerrar la base de datos
+        await maintenance_jobs.shutdown()
+        pdf_pool.shutdown()
+        await llm_client.close()
+        db.close_database_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,132 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import UploadFile
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.gridfs_streaming import UPLOAD_READ_SIZE, upload_to_gridfs
+from utils.manual_text import forget_manual_text
+
+logger = logging.getLogger(__name__)
+
+# Cada PDF distinto se guarda una sola vez en GridFS: el _id es el SHA-256 del
+# contenido, file_id el fichero compartido y refcount cuántos vehículos lo usan
+MANUALS_COLLECTION = "manuals"
+
+
+async def hash_upload(upload: UploadFile) -> tuple:
+    """
+    SHA-256 y tamaño del fichero subido, leído por bloques. Deja el fichero al
+    principio para poder subirlo después.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        block = await upload.read(UPLOAD_READ_SIZE)
+        if not block:
+            break
+        digest.update(block)
+        size += len(block)
+    await upload.seek(0)
+    return digest.hexdigest(), size
+
+
+async def hash_grid_out(grid_out) -> str:
+    """SHA-256 de un fichero GridFS, chunk a chunk"""
+    digest = hashlib.sha256()
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def acquire_manual(database, digest: str) -> Optional[dict]:
+    """Suma una referencia al manual con ese hash. None si no está guardado"""
+    return await database[MANUALS_COLLECTION].find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"refcount": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def register_manual(database, bucket, digest: str, file_id, size: int) -> dict:
+    """
+    Registra un fichero GridFS recién subido como el manual de ese hash. Si otra
+    subida del mismo PDF se registró antes, se borra este fichero y se usa aquel.
+    """
+    manual = {
+        "_id": digest,
+        "file_id": file_id,
+        "length": size,
+        "refcount": 1,
+        "created_at": datetime.utcnow(),
+    }
+    while True:
+        try:
+            await database[MANUALS_COLLECTION].insert_one(manual)
+            return manual
+        except DuplicateKeyError:
+            existing = await acquire_manual(database, digest)
+            if existing is not None:
+                # Si apunta a este mismo fichero (la misma migración en dos procesos)
+                # es la única copia: no se borra
+                if existing["file_id"] != file_id:
+                    await bucket.delete(file_id)
+                return existing
+            # El otro se liberó entretanto: se vuelve a intentar con este fichero
+
+
+async def store_manual(database, bucket, upload: UploadFile, filename: str) -> dict:
+    """
+    Guarda el PDF subido y devuelve su documento en la colección manuals.
+
+    Primero se calcula el hash leyendo el fichero temporal de la subida: si ya hay
+    un manual idéntico solo se suma una referencia y no se escribe ningún chunk.
+    """
+    digest, size = await hash_upload(upload)
+    manual = await acquire_manual(database, digest)
+    if manual is not None:
+        logger.info(f"Manual {digest} ya guardado; se reutiliza ({manual['refcount']} referencias)")
+        return manual
+
+    file_id = await upload_to_gridfs(bucket, upload, filename, metadata={"sha256": digest})
+    return await register_manual(database, bucket, digest, file_id, size)
+
+
+async def release_manual(database, bucket, file_id) -> bool:
+    """
+    Quita una referencia al manual y borra el fichero de GridFS cuando ningún
+    vehículo lo usa. Los ficheros anteriores a la deduplicación no tienen documento
+    en manuals y se borran directamente.
+
+    Returns:
+        bool: True si se borró el fichero
+    """
+    file_id = ObjectId(file_id)
+    manual = await database[MANUALS_COLLECTION].find_one_and_update(
+        {"file_id": file_id},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if manual is not None:
+        if manual["refcount"] > 0:
+            return False
+        # Solo se borra si nadie ha vuelto a sumar una referencia entretanto
+        result = await database[MANUALS_COLLECTION].delete_one({"_id": manual["_id"], "refcount": {"$lte": 0}})
+        if not result.deleted_count:
+            return False
+
+    # El texto extraído se guarda con el hash o, sin él, con el id de GridFS
+    await forget_manual_text(database, manual["_id"] if manual is not None else str(file_id))
+    try:
+        await bucket.delete(file_id)
+    except NoFile:
+        logger.warning(f"El fichero {file_id} del manual ya no existe en GridFS")
+    return True
@@ -0,0 +1,364 @@
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from utils.pdf_pool import pdf_pool
+
+logger = logging.getLogger(__name__)
+
+# Texto extraído de cada manual y sus secciones de mantenimiento. El _id es el hash
+# del PDF (pdf_manual_hash) o, en manuales anteriores a la deduplicación, su id de GridFS
+MANUAL_TEXTS_COLLECTION = "manual_texts"
+
+# Se incrementa al cambiar la extracción o la limpieza: las entradas con otra
+# versión se vuelven a calcular
+EXTRACTION_VERSION = 2
+
+# El texto completo solo se guarda si cabe holgadamente en un documento de MongoDB
+# (16 MB); las secciones de mantenimiento se guardan siempre
+MAX_STORED_TEXT_CHARS = int(os.getenv("MANUAL_TEXT_MAX_CHARS", 4_000_000))
+
+# Texto que se envía al modelo: "tables" (tablas de las páginas candidatas, con
+# "sections" como respaldo si no se encuentra ninguna) o "sections"
+EXTRACTION_MODE = os.getenv("MAINTENANCE_EXTRACTION_MODE", "tables")
+
+# Páginas candidatas de las que se extraen tablas
+MAX_CANDIDATE_PAGES = int(os.getenv("MAINTENANCE_MAX_CANDIDATE_PAGES", 12))
+MIN_PAGE_SCORE = 3
+# Páginas de una entrada del índice que se consideran, como máximo
+MAX_TOC_SECTION_PAGES = 10
+
+_inflight: dict = {}
+
+
+def manual_text_key(vehicle: dict) -> Optional[str]:
+    """Clave en manual_texts del manual de un vehículo"""
+    return vehicle.get("pdf_manual_hash") or vehicle.get("pdf_manual_grid_fs_id")
+
+
+# Encabezados de las secciones de mantenimiento
+SECTION_HEADER_KEYWORDS = [
+    'programa de mantenimiento', 'maintenance schedule',
+    'tabla de mantenimiento', 'maintenance chart',
+    'mantenimiento periódico', 'periodic maintenance',
+    'intervalos de servicio', 'service intervals',
+    'plan de mantenimiento', 'maintenance plan'
+]
+
+# Palabras que marcan una línea como relacionada con mantenimiento
+MAINTENANCE_KEYWORDS = [
+    # Términos generales de mantenimiento
+    'mantenimiento', 'maintenance', 'servicio', 'service',
+    'revisión', 'inspection', 'inspección', 'check',
+    'intervalo', 'interval', 'periódico', 'periodic',
+    'programa', 'schedule', 'tabla', 'chart',
+
+    # Componentes específicos
+    'aceite', 'oil', 'filtro', 'filter', 'frenos', 'brake',
+    'neumáticos', 'tires', 'batería', 'battery',
+    'correa', 'belt', 'líquido', 'fluid',
+    'bujía', 'spark plug', 'embrague', 'clutch',
+    'válvula', 'valve', 'cadena', 'chain',
+    'tubo de escape', 'exhaust', 'silenciador', 'muffler',
+    'dirección', 'steering', 'suspensión', 'suspension',
+    'chasis', 'chassis', 'tuercas', 'nuts', 'tornillos', 'bolts',
+    'horquilla', 'fork',
+
+    # Intervalos y medidas
+    'cada', 'every', 'km', 'kilómetros', 'kilometers',
+    'meses', 'months', 'años', 'years',
+
+    # Acciones de mantenimiento
+    'cambiar', 'change', 'reemplazar', 'replace',
+    'ajustar', 'adjust', 'lubricar', 'lubricate',
+    'limpiar', 'clean', 'apretar', 'tighten',
+    'inspeccionar', 'inspect', 'comprobar', 'check'
+]
+
+# Patrones numéricos seguidos de km o similares
+NUMBER_PATTERNS = [
+    r'\d+\s*(?:km|kilómetros|kilometers|miles)',
+    r'cada\s+\d+',
+    r'every\s+\d+',
+    r'\d+\s*000\s*km',
+    r'\d+\s*(?:meses|months|años|years)'
+]
+
+
+def _literal_pattern(words) -> str:
+    """
+    Expresión regular que encuentra cualquiera de las palabras (como subcadena).
+    Las palabras se agrupan en un trie por prefijos comunes, así que en cada
+    posición del texto el motor descarta casi todas con una sola comparación.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        # Si una palabra termina aquí, sus continuaciones no cambian si hay coincidencia
+        if "" in node:
+            return ""
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return build(trie)
+
+
+# Se compilan una sola vez, al importar el módulo
+_SECTION_HEADER = re.compile(_literal_pattern(SECTION_HEADER_KEYWORDS))
+_MAINTENANCE_KEYWORD = re.compile(_literal_pattern(MAINTENANCE_KEYWORDS))
+
+# De NUMBER_PATTERNS solo hace falta comprobar las millas: el resto no puede
+# coincidir sin contener una palabra clave (km, kilómetros, cada, every, meses...)
+_MILES = re.compile(r'\d\s*miles')
+
+
+def _related(text_lower: str) -> bool:
+    return _MAINTENANCE_KEYWORD.search(text_lower) is not None or (
+        "miles" in text_lower and _MILES.search(text_lower) is not None
+    )
+
+def _classify_line(text: str) -> Tuple[bool, bool]:
+    """
+    Returns:
+        Tuple[bool, bool]: (es encabezado de sección, está relacionada con mantenimiento)
+    """
+    text_lower = text.lower()
+    if not _related(text_lower):
+        # Todo encabezado contiene alguna palabra clave de mantenimiento
+        return False, False
+    return _SECTION_HEADER.search(text_lower) is not None, True
+
+def _is_maintenance_section_header(text: str) -> bool:
+    """Detecta si una línea es un encabezado de sección de mantenimiento"""
+    return _SECTION_HEADER.search(text.lower()) is not None
+
+def _is_maintenance_related(text: str) -> bool:
+    """Determina si una línea de texto está relacionada con mantenimiento"""
+    return _related(text.lower())
+
+def _extract_maintenance_sections(text: str) -> str:
+    """Extrae solo las secciones relacionadas con mantenimiento"""
+    lines = text.split('\n')
+    maintenance_lines = []
+    in_maintenance_section = False
+    section_content = []
+    context_lines = []  # Para mantener algunas líneas de contexto
+    
+    print("\nBuscando secciones de mantenimiento...")
+    
+    for i, line in enumerate(lines):
+        current_line = line.strip()
+        
+        # Si la línea está vacía, mantenerla como separador
+        if not current_line:
+            if section_content:
+                section_content.append("")
+            continue
+            
+        # Una sola búsqueda por línea decide si es encabezado y si es de mantenimiento
+        is_header, is_related = _classify_line(current_line)
+            
+        # Si encontramos un encabezado de sección de mantenimiento
+        if is_header:
+            logger.debug(f"Encontrada sección de mantenimiento en línea {i+1}: {current_line[:50]}...")
+            in_maintenance_section = True
+            if context_lines:  # Incluir líneas de contexto previas
+                section_content.extend(context_lines)
+            section_content = [current_line]
+            context_lines = []
+            continue
+            
+        # Si estamos en una sección de mantenimiento
+        if in_maintenance_section:
+            # Si la línea tiene contenido relacionado con mantenimiento o es una tabla
+            if is_related or '|' in current_line or '\t' in current_line:
+                section_content.append(current_line)
+            # Si encontramos una línea que parece ser un nuevo encabezado no relacionado
+            elif current_line.isupper() and len(current_line.split()) > 3:
+                if section_content:
+                    maintenance_lines.extend(section_content)
+                    section_content = []
+                in_maintenance_section = False
+            # Si la línea parece ser parte del contenido actual
+            else:
+                section_content.append(current_line)
+        # Si no estamos en una sección pero la línea tiene información de mantenimiento
+        elif is_related:
+            logger.debug(f"Encontrada línea de mantenimiento fuera de sección en línea {i+1}: {current_line[:50]}...")
+            maintenance_lines.append(current_line)
+        else:
+            # Mantener algunas líneas de contexto
+            context_lines.append(current_line)
+            if len(context_lines) > 3:  # Mantener solo las últimas 3 líneas de contexto
+                context_lines.pop(0)
+    
+    # Añadir la última sección si existe
+    if section_content:
+        maintenance_lines.extend(section_content)
+    
+    result = '\n'.join(maintenance_lines)
+    print(f"\nEncontradas {len(maintenance_lines)} líneas relacionadas con mantenimiento")
+    return result
+
+
+# Intervalos: "15 000 km", "30.000 kilómetros", "12 meses", "2 years"... (no velocidades en km/h)
+_INTERVAL = re.compile(
+    r'\d(?:[\d.,]|\s(?=\d))*\s*(?:km|kilómetros|kilometers|miles|mes(?:es)?|months?|años?|years?)(?![/\w])'
+)
+_TOC_TITLE = re.compile(_literal_pattern([
+    'mantenimiento', 'maintenance', 'servicio', 'service', 'revisiones', 'intervalo', 'interval',
+]))
+
+
+def _toc_pages(toc: list, pages: int) -> set:
+    """Páginas (desde 0) de las entradas del índice que tratan de mantenimiento"""
+    selected = set()
+    for position, (level, title, page) in enumerate(toc):
+        if page < 1 or not _TOC_TITLE.search(title.lower()):
+            continue
+        # La entrada acaba donde empieza la siguiente del mismo nivel o superior
+        end = pages + 1
+        for next_level, _, next_page in toc[position + 1:]:
+            if next_level <= level and next_page >= page:
+                end = next_page
+                break
+        last = min(max(end - 1, page), page + MAX_TOC_SECTION_PAGES - 1, pages)
+        selected.update(range(page - 1, last))
+    return selected
+
+
+def select_candidate_pages(page_texts: List[str], toc: list) -> List[int]:
+    """
+    Páginas (desde 0) donde es más probable que esté la tabla de mantenimiento:
+    cada página puntúa por los intervalos que contiene, por tener un encabezado de
+    sección de mantenimiento y por estar en una entrada de mantenimiento del índice.
+    """
+    in_toc = _toc_pages(toc, len(page_texts))
+    scores = {}
+    for number, text in enumerate(page_texts):
+        text_lower = text.lower()
+        score = len(_INTERVAL.findall(text_lower))
+        if _SECTION_HEADER.search(text_lower):
+            score += MIN_PAGE_SCORE
+        if number in in_toc:
+            score += MIN_PAGE_SCORE
+        if score >= MIN_PAGE_SCORE:
+            scores[number] = score
+    best = sorted(scores, key=lambda number: (-scores[number], number))[:MAX_CANDIDATE_PAGES]
+    return sorted(best)
+
+
+def _cell_text(cell: str) -> str:
+    return " ".join(cell.split())
+
+
+def format_maintenance_tables(tables: Dict[int, list], page_texts: List[str]) -> str:
+    """
+    Filas con intervalos de las tablas de cada página candidata, una por línea con
+    las celdas separadas por " | " y precedidas de la cabecera de su tabla. Si en una
+    página no se detecta ninguna tabla (tablas sin líneas), se usan sus líneas con
+    intervalos.
+    """
+    blocks = []
+    for number in sorted(tables):
+        rows = []
+        for table in tables[number]:
+            lines = [" | ".join(c for c in map(_cell_text, row) if c) for row in table]
+            interval_rows = [line for line in lines[1:] if _INTERVAL.search(line.lower())]
+            if interval_rows:
+                rows.append(lines[0])
+                rows.extend(interval_rows)
+        if not rows and number < len(page_texts):
+            rows = [
+                _cell_text(line) for line in page_texts[number].split("\n")
+                if _INTERVAL.search(line.lower())
+            ]
+        if rows:
+            blocks.append(f"[Página {number + 1}]\n" + "\n".join(rows))
+    return "\n\n".join(blocks)
+
+
+def prompt_text(document: dict, mode: str = EXTRACTION_MODE) -> str:
+    """Texto del manual que se envía al modelo según el modo de extracción"""
+    if mode == "tables" and document.get("tables"):
+        return document["tables"]
+    return document["sections"]
+
+
+async def get_manual_text(database, bucket, key: str, file_id) -> dict:
+    """
+    Texto, secciones y tablas de mantenimiento del manual. Se extraen una sola vez
+    por contenido; las peticiones simultáneas del mismo manual comparten la extracción.
+
+    Returns:
+        dict: Documento de manual_texts (text, sections, tables, pages...)
+    """
+    cached = await database[MANUAL_TEXTS_COLLECTION].find_one({"_id": key, "version": EXTRACTION_VERSION})
+    if cached:
+        return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_extract_and_store(database, bucket, key, file_id))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: si se cancela una petición, la extracción sigue para las demás
+    return await asyncio.shield(task)
+
+
+async def prefetch_manual_text(database, bucket, key: str, file_id) -> None:
+    """Extrae el texto de un manual recién subido. Un fallo no afecta a la subida"""
+    try:
+        await get_manual_text(database, bucket, key, file_id)
+    except Exception as e:
+        logger.warning(f"No se pudo extraer el texto del manual {key}: {type(e).__name__}: {e}")
+
+
+async def _extract_and_store(database, bucket, key: str, file_id) -> dict:
+    grid_out = await bucket.open_download_stream(ObjectId(file_id))
+    pdf_bytes = await grid_out.read()
+
+    # PyMuPDF se ejecuta en el pool de procesos, fuera del event loop
+    page_texts, toc = await pdf_pool.extract_pages(pdf_bytes)
+    text = "".join(page + "\n" for page in page_texts)
+    pages = len(page_texts)
+    sections = await asyncio.to_thread(_extract_maintenance_sections, text)
+
+    # Tablas solo de las páginas candidatas (índice del PDF + intervalos por página)
+    candidates = select_candidate_pages(page_texts, toc)
+    tables = await pdf_pool.extract_tables(pdf_bytes, candidates) if candidates else {}
+    maintenance_tables = format_maintenance_tables(tables, page_texts)
+
+    document = {
+        "_id": key,
+        "version": EXTRACTION_VERSION,
+        "file_id": ObjectId(file_id),
+        "pages": pages,
+        "text": text if len(text) <= MAX_STORED_TEXT_CHARS else None,
+        "sections": sections,
+        "candidate_pages": [number + 1 for number in candidates],
+        "tables": maintenance_tables,
+        "extracted_at": datetime.utcnow(),
+    }
+    await database[MANUAL_TEXTS_COLLECTION].replace_one({"_id": key}, document, upsert=True)
+    logger.info(
+        f"Texto del manual {key} extraído: {pages} páginas, {len(sections)} caracteres de mantenimiento, "
+        f"{len(maintenance_tables)} de tablas en {len(candidates)} páginas candidatas"
+    )
+    return document
+
+
+async def forget_manual_text(database, key: str) -> None:
+    await database[MANUAL_TEXTS_COLLECTION].delete_one({"_id": key})
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+# Este módulo lo importan también los procesos del pool (arrancan con 'spawn'), así
+# que solo usa la biblioteca estándar; PyMuPDF se carga dentro de cada tarea
+
+logger = logging.getLogger(__name__)
+
+
+class PdfExtractionError(Exception):
+    """La extracción superó el tiempo o la memoria permitidos, o su proceso murió"""
+
+
+def _limit_worker_memory(memory_limit_mb: int) -> None:
+    """Inicializador de cada proceso: tope de memoria virtual (solo en sistemas POSIX)"""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"No se pudo limitar la memoria del proceso de extracción: {e}")
+
+
+def _open(source):
+    import pymupdf as fitz
+
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source, filetype="pdf")
+
+
+def _extract_page_range(source, start: int, end: int) -> Tuple[List[str], int]:
+    """
+    Texto de cada página de [start, end) de un PDF (ruta o bytes).
+
+    Returns:
+        Tuple[List[str], int]: Texto de cada página del rango y número total de páginas
+    """
+    with _open(source) as doc:
+        pages = len(doc)
+        texts = [doc[number].get_text() for number in range(start, min(end, pages))]
+    return texts, pages
+
+
+def _extract_first_range(source, end: int) -> Tuple[List[str], int, list]:
+    """Como _extract_page_range desde la primera página, junto con el índice (TOC) del PDF"""
+    with _open(source) as doc:
+        pages = len(doc)
+        texts = [doc[number].get_text() for number in range(min(end, pages))]
+        toc = doc.get_toc(simple=True)
+    return texts, pages, toc
+
+
+def _extract_tables(source, page_numbers: List[int]) -> Dict[int, list]:
+    """
+    Tablas detectadas por PyMuPDF en las páginas indicadas (empezando en 0).
+
+    Returns:
+        Dict[int, list]: Por página, lista de tablas; cada tabla es una lista de filas de celdas
+    """
+    tables = {}
+    with _open(source) as doc:
+        for number in page_numbers:
+            if 0 <= number < len(doc):
+                found = doc[number].find_tables()
+                tables[number] = [
+                    [[cell or "" for cell in row] for row in table.extract()]
+                    for table in found.tables
+                ]
+    return tables
+
+
+class PdfExtractionPool:
+    """
+    Extrae el texto de los PDF en un pool de procesos para no bloquear el event loop
+    (PyMuPDF retiene el GIL en cada página: en hilos no hay paralelismo y compite
+    con el event loop).
+
+    Los documentos grandes se reparten en rangos de pages_per_task páginas entre los
+    procesos y el texto se une en orden. Cada documento tiene un tiempo máximo y
+    cada proceso un tope de memoria; si se supera el tiempo, se matan los procesos
+    (es la única forma de parar a PyMuPDF) y el pool se vuelve a crear en la
+    siguiente extracción. Los demás documentos que estaban en ese pool se
+    reintentan una vez en el nuevo.
+
+    Con max_workers=0 la extracción se hace en un hilo, sin procesos.
+    """
+
+    def __init__(self, max_workers: int = 2, pages_per_task: int = 50,
+                 timeout: float = 120.0, memory_limit_mb: int = 1024):
+        self.max_workers = max_workers
+        self.pages_per_task = max(1, pages_per_task)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.pages = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 'spawn': hacer fork de un proceso con el event loop e hilos en marcha no es seguro
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_limit_worker_memory,
+                    initargs=(self.memory_limit_mb,),
+                )
+            return self._executor
+
+    def _restart(self, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """
+        Mata los procesos de executor (por defecto, el pool actual); si sigue siendo
+        el pool actual, se crea otro al siguiente uso
+        """
+        with self._lock:
+            if executor is None:
+                executor = self._executor
+            if self._executor is executor:
+                self._executor = None
+        if executor is None:
+            return
+        # ProcessPoolExecutor no puede cancelar tareas en marcha: se terminan sus procesos
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _replaced(self, executor: ProcessPoolExecutor) -> bool:
+        """Si executor ya no es el pool actual (otra extracción lo ha reiniciado)"""
+        with self._lock:
+            return self._executor is not executor
+
+    async def extract_pages(self, pdf_bytes: bytes) -> Tuple[List[str], list]:
+        """
+        Texto de cada página del PDF y su índice.
+
+        Returns:
+            Tuple[List[str], list]: Texto por página y TOC ([nivel, título, página], páginas desde 1)
+
+        Raises:
+            PdfExtractionError: Si se supera el tiempo o la memoria permitidos
+        """
+        texts, toc = await self._run(pdf_bytes, self._page_texts_job)
+        self.pages += len(texts)
+        return texts, toc
+
+    async def extract_text(self, pdf_bytes: bytes) -> Tuple[str, int]:
+        """
+        Texto de todas las páginas del PDF, cada una seguida de un salto de línea.
+
+        Returns:
+            Tuple[str, int]: Texto extraído y número de páginas
+        """
+        texts, _ = await self.extract_pages(pdf_bytes)
+        return "".join(text + "\n" for text in texts), len(texts)
+
+    async def extract_tables(self, pdf_bytes: bytes, page_numbers: List[int]) -> Dict[int, list]:
+        """Tablas de las páginas indicadas (ver _extract_tables)"""
+        async def job(source, submit):
+            return await submit(_extract_tables, source, list(page_numbers))
+
+        return await self._run(pdf_bytes, job)
+
+    async def _page_texts_job(self, source, submit) -> Tuple[List[str], list]:
+        # En un hilo no se gana nada partiendo el documento
+        step = self.pages_per_task if self.max_workers > 0 else 2 ** 31
+
+        # El primer rango también devuelve el número de páginas y el índice
+        texts, pages, toc = await submit(_extract_first_range, source, step)
+        rest = await asyncio.gather(*(
+            submit(_extract_page_range, source, start, start + step)
+            for start in range(step, pages, step)
+        ))
+        for more, _ in rest:
+            texts.extend(more)
+        return texts, toc
+
+    async def _run(self, pdf_bytes: bytes, job):
+        """
+        Ejecuta job(source, submit) con el tiempo máximo del pool. En procesos, source
+        es un fichero temporal con el PDF (no se serializan los bytes en cada tarea);
+        en modo hilo son los propios bytes.
+        """
+        started = time.perf_counter()
+        self._in_flight += 1
+        try:
+            if self.max_workers <= 0:
+                result = await asyncio.wait_for(job(pdf_bytes, asyncio.to_thread), timeout=self.timeout)
+            else:
+                path = await asyncio.to_thread(_write_temporary_pdf, pdf_bytes)
+                try:
+                    result = await self._run_in_processes(path, job)
+                finally:
+                    await asyncio.to_thread(os.unlink, path)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PdfExtractionError(f"La extracción del PDF superó el tiempo máximo ({self.timeout:g} s)")
+        except MemoryError as e:
+            # Lanzado dentro del proceso al chocar con el tope de RLIMIT_AS
+            self.failures += 1
+            raise PdfExtractionError(
+                f"La extracción del PDF superó el límite de memoria ({self.memory_limit_mb} MB)"
+            ) from e
+        except RuntimeError as e:
+            if not _pool_failed(e):
+                raise
+            self.failures += 1
+            raise PdfExtractionError(
+                f"El proceso de extracción del PDF terminó sin resultado: {type(e).__name__}"
+            ) from e
+        finally:
+            self._in_flight -= 1
+
+        elapsed = time.perf_counter() - started
+        self.completed += 1
+        self.total_seconds += elapsed
+        logger.info(f"Extracción de PDF completada en {elapsed:.2f} s")
+        return result
+
+    async def _run_in_processes(self, path: str, job):
+        """
+        job(path, submit) en el pool de procesos. Si falla porque otra extracción ha
+        reiniciado el pool (tiempo máximo superado o proceso muerto), se repite una
+        vez en el pool nuevo; si el fallo es suyo, reinicia el pool y lo propaga.
+        """
+        loop = asyncio.get_running_loop()
+        retried = False
+        while True:
+            executor = self._get_executor()
+
+            def submit(func, *args, executor=executor):
+                return loop.run_in_executor(executor, func, *args)
+
+            try:
+                return await asyncio.wait_for(job(path, submit), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self._restart(executor)
+                raise
+            except RuntimeError as e:
+                if not _pool_failed(e):
+                    raise
+                if self._replaced(executor) and not retried:
+                    retried = True
+                    self.retries += 1
+                    logger.info("Pool de extracción reiniciado por otra extracción; se reintenta el PDF")
+                    continue
+                self._restart(executor)
+                raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        avg = self.total_seconds / self.completed if self.completed else 0.0
+        return {
+            "max_workers": self.max_workers,
+            "pages_per_task": self.pages_per_task,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "pages": self.pages,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "retries": self.retries,
+            "avg_seconds": round(avg, 3),
+        }
+
+
+def _pool_failed(error: RuntimeError) -> bool:
+    """
+    Si el error es del pool y no de la tarea: un proceso murió (BrokenProcessPool) o
+    el pool se cerró antes de enviarla ("cannot schedule new futures after shutdown")
+    """
+    return isinstance(error, BrokenProcessPool) or "after shutdown" in str(error)
+
+
+def _write_temporary_pdf(pdf_bytes: bytes) -> str:
+    with tempfile.NamedTemporaryFile(prefix="manual-", suffix=".pdf", delete=False) as handle:
+        handle.write(pdf_bytes)
+        return handle.name
+
+
+pdf_pool = PdfExtractionPool(
+    max_workers=int(os.getenv("PDF_POOL_WORKERS", min(4, os.cpu_count() or 1))),
+    pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", 50)),
+    timeout=float(os.getenv("PDF_EXTRACTION_TIMEOUT_SECONDS", 120)),
+    memory_limit_mb=int(os.getenv("PDF_WORKER_MEMORY_MB", 1024)),
+)
@@ -0,0 +1,114 @@
+import threading
+from collections import deque
+
+from pymongo import monitoring
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Recoge métricas del pool de conexiones de pymongo/motor: conexiones abiertas y
+    en uso, tiempo de espera al obtener una conexión (checkout) y timeouts.
+
+    Los eventos llegan desde los hilos de motor, por eso se protege con un lock.
+    """
+
+    def __init__(self, sample_size: int = 1000):
+        self._lock = threading.Lock()
+        self._wait_samples = deque(maxlen=sample_size)
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.pools = 0
+            self.open_connections = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_timeouts = 0
+            self.pool_clears = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self._wait_samples.clear()
+
+    # --- Eventos del pool ---
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools = max(0, self.pools - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.checkout_timeouts += 1
+
+    def connection_checked_out(self, event):
+        duration = getattr(event, "duration", None)
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            if duration is not None:
+                self.total_wait += duration
+                self.max_wait = max(self.max_wait, duration)
+                self._wait_samples.append(duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    # --- Lectura ---
+
+    def stats(self) -> dict:
+        """Estado actual del pool y estadísticas de espera en checkout (en ms)"""
+        with self._lock:
+            samples = sorted(self._wait_samples)
+            return {
+                "pools": self.pools,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_timeouts": self.checkout_timeouts,
+                "pool_clears": self.pool_clears,
+                "checkout_wait_ms": {
+                    "avg": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                    "p50": round(_percentile(samples, 0.50) * 1000, 3),
+                    "p95": round(_percentile(samples, 0.95) * 1000, 3),
+                    "max": round(self.max_wait * 1000, 3),
+                },
+            }
+
+
+def _percentile(sorted_samples: list, fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+pool_metrics = PoolMetricsListener()
@@ -0,0 +1,44 @@
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, status
+
+VIEWS = ("summary", "full")
+
+
+def select_fields(view: str, fields: Optional[str], available: Iterable[str], heavy: Iterable[str]) -> set:
+    """
+    Campos de la respuesta de un listado.
+
+    - fields=a,b,c devuelve solo esos campos (el id siempre se incluye).
+    - view=summary devuelve todos menos los pesados (logos en base64, puntos GPS...).
+    - view=full devuelve todos.
+    """
+    available = set(available)
+    if view not in VIEWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Vista no válida: {view}. Usa 'summary' o 'full'"
+        )
+
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - available
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos no válidos: {', '.join(sorted(unknown))}"
+            )
+        return requested | {"id"}
+
+    if view == "summary":
+        return available - set(heavy)
+    return available
+
+
+def heavy_fields_projection(selected: set, heavy: Iterable[str]) -> Optional[dict]:
+    """
+    Proyección de MongoDB que excluye los campos pesados no pedidos, para que no
+    viajen desde la base de datos ni se decodifiquen. None si se piden todos.
+    """
+    excluded = {field: 0 for field in heavy if field not in selected}
+    return excluded or None